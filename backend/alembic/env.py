@@ -10,7 +10,7 @@ import sys
 import os
 sys.path.append(os.getcwd())
 from app.db.session import Base
-from app.models.user import User
+from app.models.user import User, TokenLedgerEntry
 from app.models.qbo import QBOConnection, Transaction
 from app.models.analytics import AnalyticsEvent
 from app.models.gamification import UserGamificationStats, GamificationEvent
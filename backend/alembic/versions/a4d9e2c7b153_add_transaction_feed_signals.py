@@ -0,0 +1,42 @@
+"""Add transaction feed signals
+
+Revision ID: a4d9e2c7b153
+Revises: f3c8d6a2b917
+Create Date: 2026-10-19 14:02:41.518305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4d9e2c7b153'
+down_revision: Union[str, Sequence[str], None] = 'f3c8d6a2b917'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('transactions', sa.Column('qbo_txn_type', sa.String(), nullable=True))
+    op.add_column('transactions', sa.Column('clr_status', sa.String(), nullable=True))
+    op.add_column('transactions', sa.Column('has_linked_txn', sa.Boolean(), nullable=True))
+    op.add_column('transactions', sa.Column('has_qbo_payee', sa.Boolean(), nullable=True))
+    op.add_column('transactions', sa.Column('has_qbo_category', sa.Boolean(), nullable=True))
+    op.add_column('transactions', sa.Column('feed_reason', sa.String(), nullable=True))
+    op.create_index('ix_transactions_feed_review', 'transactions', ['realm_id', 'is_qbo_matched', 'is_bank_feed_import'], unique=False)
+    op.create_index('ix_transactions_feed_signals', 'transactions', ['realm_id', 'qbo_txn_type', 'clr_status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_transactions_feed_signals', table_name='transactions')
+    op.drop_index('ix_transactions_feed_review', table_name='transactions')
+    op.drop_column('transactions', 'feed_reason')
+    op.drop_column('transactions', 'has_qbo_category')
+    op.drop_column('transactions', 'has_qbo_payee')
+    op.drop_column('transactions', 'has_linked_txn')
+    op.drop_column('transactions', 'clr_status')
+    op.drop_column('transactions', 'qbo_txn_type')
@@ -0,0 +1,28 @@
+"""Add connection data version
+
+Revision ID: b8e1f4d6a2c9
+Revises: a4d9e2c7b153
+Create Date: 2026-10-19 15:11:27.904116
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e1f4d6a2c9'
+down_revision: Union[str, Sequence[str], None] = 'a4d9e2c7b153'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('qbo_connections', sa.Column('data_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('qbo_connections', 'data_version')
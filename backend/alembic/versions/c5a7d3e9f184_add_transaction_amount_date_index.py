@@ -0,0 +1,28 @@
+"""Add transaction amount/date index
+
+Revision ID: c5a7d3e9f184
+Revises: b8e1f4d6a2c9
+Create Date: 2026-10-19 16:02:41.318507
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5a7d3e9f184'
+down_revision: Union[str, Sequence[str], None] = 'b8e1f4d6a2c9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_transactions_amount_date', 'transactions', ['realm_id', 'amount', 'date'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_transactions_amount_date', table_name='transactions')
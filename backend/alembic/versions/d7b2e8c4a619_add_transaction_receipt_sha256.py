@@ -0,0 +1,34 @@
+"""Add transaction receipt sha256
+
+Revision ID: d7b2e8c4a619
+Revises: c5a7d3e9f184
+Create Date: 2026-10-19 16:40:12.551093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7b2e8c4a619'
+down_revision: Union[str, Sequence[str], None] = 'c5a7d3e9f184'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('transactions', sa.Column('receipt_sha256', sa.String(length=64), nullable=True))
+    if op.get_bind().dialect.name == 'postgresql':
+        # Existing receipts; new ones are hashed on assignment (Transaction.receipt_content set event)
+        op.execute(
+            "UPDATE transactions SET receipt_sha256 = encode(sha256(receipt_content), 'hex') "
+            "WHERE receipt_content IS NOT NULL"
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('transactions', 'receipt_sha256')
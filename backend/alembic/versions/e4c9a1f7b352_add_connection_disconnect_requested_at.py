@@ -0,0 +1,28 @@
+"""Add qbo_connections disconnect_requested_at
+
+Revision ID: e4c9a1f7b352
+Revises: d7b2e8c4a619
+Create Date: 2026-10-19 18:05:37.214806
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4c9a1f7b352'
+down_revision: Union[str, Sequence[str], None] = 'd7b2e8c4a619'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('qbo_connections', sa.Column('disconnect_requested_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('qbo_connections', 'disconnect_requested_at')
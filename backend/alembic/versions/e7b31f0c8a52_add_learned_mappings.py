@@ -0,0 +1,41 @@
+"""Add learned mappings
+
+Revision ID: e7b31f0c8a52
+Revises: d2a7c9e41f63
+Create Date: 2026-10-19 11:02:47.190355
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7b31f0c8a52'
+down_revision: Union[str, Sequence[str], None] = 'd2a7c9e41f63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('learned_mappings',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('realm_id', sa.String(), nullable=True),
+    sa.Column('normalized_description', sa.String(), nullable=False),
+    sa.Column('category_id', sa.String(), nullable=True),
+    sa.Column('category_name', sa.String(), nullable=False),
+    sa.Column('hit_count', sa.Integer(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['realm_id'], ['qbo_connections.realm_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('realm_id', 'normalized_description', name='uq_learned_mapping_realm_key')
+    )
+    op.create_index(op.f('ix_learned_mappings_realm_id'), 'learned_mappings', ['realm_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_learned_mappings_realm_id'), table_name='learned_mappings')
+    op.drop_table('learned_mappings')
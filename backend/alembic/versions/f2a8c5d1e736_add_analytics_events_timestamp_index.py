@@ -0,0 +1,29 @@
+"""Add analytics_events timestamp index
+
+Revision ID: f2a8c5d1e736
+Revises: e4c9a1f7b352
+Create Date: 2026-10-19 19:22:08.640517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a8c5d1e736'
+down_revision: Union[str, Sequence[str], None] = 'e4c9a1f7b352'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # /analytics/events and /analytics/insights read the newest N events
+    op.create_index(op.f('ix_analytics_events_timestamp'), 'analytics_events', ['timestamp'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_analytics_events_timestamp'), table_name='analytics_events')
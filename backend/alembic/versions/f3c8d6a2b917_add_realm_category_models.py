@@ -0,0 +1,37 @@
+"""Add realm category models
+
+Revision ID: f3c8d6a2b917
+Revises: e7b31f0c8a52
+Create Date: 2026-10-19 12:26:05.734120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c8d6a2b917'
+down_revision: Union[str, Sequence[str], None] = 'e7b31f0c8a52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('realm_category_models',
+    sa.Column('realm_id', sa.String(), nullable=False),
+    sa.Column('feature_version', sa.String(), nullable=False),
+    sa.Column('weights', sa.LargeBinary(), nullable=False),
+    sa.Column('labels', sa.JSON(), nullable=False),
+    sa.Column('sample_count', sa.Integer(), nullable=True),
+    sa.Column('trained_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['realm_id'], ['qbo_connections.realm_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('realm_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('realm_category_models')
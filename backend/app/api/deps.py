@@ -1,7 +1,10 @@
 from fastapi import HTTPException, Depends, Header
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timezone
 from app.db.session import get_db
+from app.db.async_session import get_async_db
 from app.models.user import User
 from app.models.qbo import QBOConnection
 from typing import Optional
@@ -62,3 +65,35 @@ async def verify_subscription(realm_id: str, db: Session = Depends(get_db)):
         )
     
     return user
+
+async def verify_subscription_async(realm_id: str, db: AsyncSession = Depends(get_async_db)):
+    """
+    Async twin of verify_subscription for handlers running on AsyncSession.
+    Resolves connection + owner in a single joined query.
+    """
+    result = await db.execute(
+        select(QBOConnection.id, User)
+        .outerjoin(User, User.id == QBOConnection.user_id)
+        .where(QBOConnection.realm_id == realm_id)
+    )
+    row = result.first()
+    if not row:
+        raise HTTPException(status_code=404, detail="QBO Connection not found")
+
+    user = row.User
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    status = get_subscription_status(user)
+
+    if status in ['expired', 'no_plan']:
+        raise HTTPException(
+            status_code=402,
+            detail={
+                "error": "subscription_required",
+                "message": "Your trial has expired. Please upgrade to a paid plan to continue.",
+                "tier": user.subscription_tier
+            }
+        )
+
+    return user
@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
 from app.db.session import get_db
 from app.models.qbo import BankAccount, Category, Tag, Transaction, QBOConnection, Vendor
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 import uuid
 from app.services.qbo_client import QBOClient
+from app.services.data_version import get_data_version, response_cache
 
 router = APIRouter()
 
@@ -50,20 +51,33 @@ class VendorSchema(BaseModel):
     class Config:
         from_attributes = True
 
+def _cached_list(request: Request, db: Session, realm_id: str, key: str, schema, load):
+    """Conditional GET for a realm-scoped list: 304 / cached body / load() serialized through schema."""
+    version = get_data_version(db, realm_id)  # Read before the rows (see transactions list)
+    cached = response_cache.lookup(request, realm_id, version, key)
+    if cached:
+        return cached
+    adapter = TypeAdapter(List[schema])
+    body = adapter.dump_json(adapter.validate_python(load(), from_attributes=True))
+    return response_cache.respond(realm_id, version, key, body)
+
 # --- Endpoints ---
 
 @router.get("/accounts", response_model=List[BankAccountSchema])
-def get_bank_accounts(realm_id: str, db: Session = Depends(get_db)):
+def get_bank_accounts(realm_id: str, request: Request, db: Session = Depends(get_db)):
     """Returns list of Bank Accounts with Nicknames"""
-    # First try the new table
-    accounts = db.query(BankAccount).filter(BankAccount.realm_id == realm_id).all()
-    
-    # Fallback to Transaction distinct query if table is empty (migration safety)
-    if not accounts:
-        # TODO: Trigger background sync if empty? For now, return empty or fallback
-        pass
+    def load():
+        # First try the new table
+        accounts = db.query(BankAccount).filter(BankAccount.realm_id == realm_id).all()
         
-    return accounts
+        # Fallback to Transaction distinct query if table is empty (migration safety)
+        if not accounts:
+            # TODO: Trigger background sync if empty? For now, return empty or fallback
+            pass
+            
+        return accounts
+
+    return _cached_list(request, db, realm_id, "accounts", BankAccountSchema, load)
 
 @router.patch("/accounts/{account_id}", response_model=BankAccountSchema)
 def update_bank_nickname(realm_id: str, account_id: str, update: BankAccountUpdate, db: Session = Depends(get_db)):
@@ -82,9 +96,10 @@ def update_bank_nickname(realm_id: str, account_id: str, update: BankAccountUpda
     return account
 
 @router.get("/tags", response_model=List[TagSchema])
-def get_tags(realm_id: str, db: Session = Depends(get_db)):
+def get_tags(realm_id: str, request: Request, db: Session = Depends(get_db)):
     """Returns list of Tags"""
-    return db.query(Tag).filter(Tag.realm_id == realm_id).all()
+    return _cached_list(request, db, realm_id, "tags", TagSchema,
+                        lambda: db.query(Tag).filter(Tag.realm_id == realm_id).all())
 
 @router.post("/tags", response_model=TagSchema)
 def create_tag(realm_id: str, tag_in: TagCreate, db: Session = Depends(get_db)):
@@ -112,16 +127,16 @@ def create_tag(realm_id: str, tag_in: TagCreate, db: Session = Depends(get_db)):
     return new_tag
 
 @router.get("/categories", response_model=List[CategorySchema])
-def get_categories(realm_id: str, db: Session = Depends(get_db)):
+def get_categories(realm_id: str, request: Request, db: Session = Depends(get_db)):
     """Returns list of Expense Categories"""
-    return db.query(Category).filter(
+    return _cached_list(request, db, realm_id, "categories", CategorySchema, lambda: db.query(Category).filter(
         Category.realm_id == realm_id,
         Category.type.in_(['Expense', 'Cost of Goods Sold', 'Other Expense'])
-    ).order_by(Category.name).all()
+    ).order_by(Category.name).all())
 
 @router.get("/vendors", response_model=List[VendorSchema])
-def get_vendors(realm_id: str, db: Session = Depends(get_db)):
+def get_vendors(realm_id: str, request: Request, db: Session = Depends(get_db)):
     """Returns list of Vendors for Autocomplete"""
-    return db.query(Vendor).filter(
+    return _cached_list(request, db, realm_id, "vendors", VendorSchema, lambda: db.query(Vendor).filter(
         Vendor.realm_id == realm_id
-    ).order_by(Vendor.display_name).all()
+    ).order_by(Vendor.display_name).all())
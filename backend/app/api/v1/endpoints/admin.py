@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, Header, Body
 from sqlalchemy.orm import Session
 from app.api import deps
-from app.db.session import get_db
+from app.db.session import get_db, get_pool_status
 from app.models.user import User
 from app.core.config import settings
 from pydantic import BaseModel
@@ -60,3 +60,20 @@ async def set_user_tier(
         "new_tier": user.subscription_tier,
         "new_balance": user.token_balance
     }
+
+@router.get("/db-pool")
+async def get_db_pool_status(
+    x_user_id: str = Header(..., alias="X-User-Id"),
+):
+    """
+    Connection pool metrics for this container (size, overflow, checkout waits).
+    """
+    if x_user_id not in settings.ADMIN_USERS:
+        raise HTTPException(status_code=403, detail="Not authorized for God Mode.")
+
+    from app.db import async_session
+
+    status = {"sync": get_pool_status()}
+    if async_session._async_engine is not None:
+        status["async"] = get_pool_status(async_session._async_engine.sync_engine)
+    return status
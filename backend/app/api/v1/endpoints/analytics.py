@@ -6,20 +6,28 @@ from app.models.qbo import QBOConnection
 from app.services.analytics_service import AnalyticsService
 from app.services.ai_analyzer import AIAnalyzer
 from app.services.token_service import TokenService
+from app.services.data_version import get_data_version, response_cache
+from app.services.event_buffer import get_event_buffer
 from app.models.user import User
 from app.api.deps import get_current_user
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any, List
 import datetime
+import json
 
 router = APIRouter()
 
+MAX_BATCH_EVENTS = 500
+
 # --- Schema Definitions ---
 class TrackEventRequest(BaseModel):
     event_name: str
     properties: Optional[Dict[str, Any]] = None
     user_id: str 
 
+class TrackBatchRequest(BaseModel):
+    events: List[TrackEventRequest] = Field(..., max_length=MAX_BATCH_EVENTS)
+
 class AnalyticsEventSchema(BaseModel):
     id: str
     user_id: str
@@ -34,6 +42,7 @@ class AnalyticsEventSchema(BaseModel):
 
 @router.get("/")
 def get_dashboard_analytics(
+    request: Request,
     x_user_id: Optional[str] = Header(None, alias="X-User-Id"),
     realm_id: Optional[str] = None,
     db: Session = Depends(get_db)
@@ -56,32 +65,46 @@ def get_dashboard_analytics(
         # If we reach here, we expect a real connection.
         return {"error": "User not connected to QBO"}
 
+    # Stats cover the trailing 30 days, so the day is part of the key
+    version = get_data_version(db, target_realm)
+    cache_key = f"analytics:{datetime.date.today().isoformat()}"
+    cached = response_cache.lookup(request, target_realm, version, cache_key)
+    if cached:
+        return cached
+
     service = AnalyticsService(db, target_realm)
-    return service.get_dashboard_stats()
+    body = json.dumps(service.get_dashboard_stats(), default=str).encode()
+    return response_cache.respond(target_realm, version, cache_key, body)
 
 @router.post("/track")
 def track_event(
     event: TrackEventRequest,
     request: Request,
-    db: Session = Depends(get_db)
 ):
     """
-    Telemetry: Stores user actions permanently.
+    Telemetry: Stores user actions permanently (buffered, see event_buffer.py).
     """
-    ip = request.client.host
-    user_agent = request.headers.get("user-agent")
-
-    db_event = AnalyticsEvent(
+    event_id = get_event_buffer().add(
         user_id=event.user_id,
         event_name=event.event_name,
         properties=event.properties,
-        ip_address=ip,
-        user_agent=user_agent
+        ip_address=request.client.host,
+        user_agent=request.headers.get("user-agent"),
     )
-    db.add(db_event)
-    db.commit()
-    db.refresh(db_event)
-    return {"status": "success", "id": str(db_event.id)}
+    return {"status": "success", "id": event_id}
+
+@router.post("/track/batch")
+def track_events(batch: TrackBatchRequest, request: Request):
+    """
+    Telemetry: several events in one call (frontends flush their own queue here).
+    """
+    ip = request.client.host
+    user_agent = request.headers.get("user-agent")
+    ids = get_event_buffer().add_many([
+        dict(user_id=e.user_id, event_name=e.event_name, properties=e.properties, ip_address=ip, user_agent=user_agent)
+        for e in batch.events
+    ])
+    return {"status": "success", "ids": ids}
 
 @router.get("/events", response_model=List[AnalyticsEventSchema])
 def get_events(
@@ -113,25 +136,34 @@ def generate_insights(
     COST = 25
     token_service = TokenService(db)
     
-    if not token_service.has_sufficient_tokens(current_user.id, COST):
+    # Hold the tokens up front so concurrent reports can't overspend
+    reservation = token_service.reserve_tokens(current_user.id, COST, "AI Insights Report")
+    if not reservation:
         return {"error": "Insufficient tokens. Upgrade to Pro/Business."}
 
-    # 1. Fetch recent events
-    events = db.query(AnalyticsEvent).order_by(AnalyticsEvent.timestamp.desc()).limit(limit).all()
-    
-    if not events:
-        return {"error": "No events found to analyze"}
-        
-    # 2. Call AI Analyzer
-    analyzer = AIAnalyzer()
-    insights = analyzer.generate_insights(events)
-    
-    # 3. Deduct if successful
-    if "error" not in insights:
-         token_service.deduct_tokens(current_user.id, COST, "AI Insights Report")
-    
+    insights = {"error": "No events found to analyze"}
+    try:
+        # 1. Fetch recent events
+        events = db.query(AnalyticsEvent).order_by(AnalyticsEvent.timestamp.desc()).limit(limit).all()
+
+        if events:
+            # 2. Call AI Analyzer
+            analyzer = AIAnalyzer()
+            insights = analyzer.generate_insights(events)
+    finally:
+        # 3. Only charge if successful
+        token_service.settle_reservation(reservation, used=COST if "error" not in insights else 0)
+
     return insights
 
+@router.get("/sync-conflicts")
+def get_sync_conflicts(realm_id: str, days: int = 7, db: Session = Depends(get_db)):
+    """
+    QBO write-back health: write attempts vs stale SyncToken (5010) conflicts.
+    """
+    from app.services.sync_token_service import conflict_stats
+    return conflict_stats(db, realm_id, days=days)
+
 @router.get("/admin/usage")
 def get_all_usage(db: Session = Depends(get_db)):
     """
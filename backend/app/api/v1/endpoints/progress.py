@@ -0,0 +1,57 @@
+import asyncio
+import contextlib
+import json
+
+from fastapi import APIRouter, Request
+from fastapi.responses import StreamingResponse
+
+from app.api.deps import verify_subscription_async
+from app.core.config import settings
+from app.db.async_session import AsyncSessionLocal
+from app.services.progress_bus import get_progress_bus
+
+router = APIRouter()
+
+
+def _sse(event: dict) -> str:
+    return f"event: progress\ndata: {json.dumps(event)}\n\n"
+
+
+@router.get("/stream")
+async def stream_progress(realm_id: str, request: Request):
+    """
+    Server-sent events for the realm's sync / analysis / bulk-approval jobs.
+    Starts with the latest event of every recent job, then streams live updates
+    with a comment heartbeat so proxies keep the connection open.
+    """
+    # Short-lived session: the stream can stay open for minutes and must not hold a pooled connection
+    async with AsyncSessionLocal() as db:
+        await verify_subscription_async(realm_id, db)
+
+    bus = get_progress_bus()
+
+    async def events():
+        subscription = bus.subscribe(realm_id)
+        next_event = None
+        try:
+            while not await request.is_disconnected():
+                if next_event is None:
+                    next_event = asyncio.ensure_future(subscription.__anext__())
+                done, _ = await asyncio.wait({next_event}, timeout=settings.PROGRESS_HEARTBEAT_SECONDS)
+                if not done:
+                    yield ": heartbeat\n\n"
+                    continue
+                event, next_event = next_event.result(), None
+                yield _sse(event)
+        finally:
+            if next_event is not None:
+                next_event.cancel()
+                with contextlib.suppress(asyncio.CancelledError, StopAsyncIteration):
+                    await next_event  # The generator can only be closed once it's no longer running
+            await subscription.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
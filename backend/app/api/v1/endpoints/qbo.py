@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
 from fastapi.responses import RedirectResponse
 from sqlalchemy.orm import Session
-from app.db.session import get_db
-from app.api.deps import verify_subscription
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import get_db, SessionLocal
+from app.db.async_session import get_async_db
+from app.api.deps import verify_subscription, verify_subscription_async
 from app.models.qbo import QBOConnection
 from app.models.user import User
 from app.core.config import settings
@@ -87,6 +89,7 @@ def callback(code: str, state: str, realmId: str, db: Session = Depends(get_db))
         # Encrypt before saving due to Intuit compliance requirements
         connection.refresh_token = encrypt_token(auth_client.refresh_token)
         connection.access_token = encrypt_token(auth_client.access_token)
+        connection.disconnect_requested_at = None  # Reconnected: stops a pending purge
         db.add(connection)
         db.commit()
         
@@ -103,7 +106,8 @@ def callback(code: str, state: str, realmId: str, db: Session = Depends(get_db))
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
 
 from app.models.qbo import BankAccount
-from app.services.transaction_service import TransactionService
+from app.services.transaction_service import TransactionService, ACCOUNT_LIMITS
+from app.services.async_transaction_service import AsyncTransactionService
 from typing import List
 from pydantic import BaseModel
 
@@ -112,10 +116,11 @@ class AccountSelectionSchema(BaseModel):
     active_account_ids: List[str]
 
 @router.get("/accounts")
-async def get_accounts(realm_id: str, db: Session = Depends(get_db), user=Depends(verify_subscription)):
+async def get_accounts(realm_id: str, db: AsyncSession = Depends(get_async_db), user=Depends(verify_subscription_async)):
     print(f"🔍 [get_accounts] Starting for realm_id: {realm_id}")
     
-    connection = db.query(QBOConnection).filter(QBOConnection.realm_id == realm_id).first()
+    reader = AsyncTransactionService(db, realm_id)
+    connection = await reader.get_connection()
     if not connection:
         print(f"❌ [get_accounts] No connection found for realm_id: {realm_id}")
         return {"accounts": [], "limit": 0, "active_count": 0}
@@ -123,23 +128,26 @@ async def get_accounts(realm_id: str, db: Session = Depends(get_db), user=Depend
     print(f"✅ [get_accounts] Connection found for user: {connection.user_id}")
     
     # Ensure accounts are synced first (at least metadata)
-    service = TransactionService(db, connection)
-    try:
-        print(f"🔄 [get_accounts] Starting sync_bank_accounts...")
-        await service.sync_bank_accounts() # This syncs all without limit
-        print(f"✅ [get_accounts] sync_bank_accounts completed")
-    except Exception as e:
-        print(f"⚠️ [get_accounts] Sync failed: {e}")
-        import traceback
-        print(f"📋 [get_accounts] Traceback: {traceback.format_exc()}")
-        db.rollback()
-        # Continue to return what we have in DB
+    # The QBO refresh writes through SyncService, which still runs on the sync session.
+    with SessionLocal() as sync_db:
+        sync_connection = sync_db.query(QBOConnection).filter(QBOConnection.realm_id == realm_id).first()
+        service = TransactionService(sync_db, sync_connection)
+        try:
+            print(f"🔄 [get_accounts] Starting sync_bank_accounts...")
+            await service.sync_bank_accounts() # This syncs all without limit
+            print(f"✅ [get_accounts] sync_bank_accounts completed")
+        except Exception as e:
+            print(f"⚠️ [get_accounts] Sync failed: {e}")
+            import traceback
+            print(f"📋 [get_accounts] Traceback: {traceback.format_exc()}")
+            sync_db.rollback()
+            # Continue to return what we have in DB
     
-    accounts = db.query(BankAccount).filter(BankAccount.realm_id == realm_id).order_by(BankAccount.name).all()
+    accounts = await reader.list_bank_accounts()
     print(f"📊 [get_accounts] Found {len(accounts)} accounts in database")
     
-    # Determine limit
-    limit = service._get_account_limit()
+    # Determine limit (verify_subscription_async already resolved the realm owner)
+    limit = ACCOUNT_LIMITS.get(user.subscription_tier, 1)
     
     return {
         "accounts": [
@@ -155,7 +163,7 @@ async def get_accounts(realm_id: str, db: Session = Depends(get_db), user=Depend
         ],
         "limit": limit,
         "active_count": len([a for a in accounts if a.is_active]),
-        "tier": db.query(User).filter(User.id == connection.user_id).first().subscription_tier
+        "tier": user.subscription_tier
     }
 
 @router.post("/accounts/select")
@@ -208,9 +216,15 @@ async def update_account_selection(payload: AccountSelectionSchema, db: Session
     return {"status": "success", "message": f"Updated {updated_count} accounts"}
 
 @router.post("/accounts/preview")
-async def preview_account_sync(payload: AccountSelectionSchema, db: Session = Depends(get_db)):
+async def preview_account_sync(payload: AccountSelectionSchema, mode: str = "fast", db: Session = Depends(get_db)):
+    """
+    Transaction counts for a prospective account selection.
+    mode=fast (default) answers from the local mirror where possible; mode=full always asks QBO.
+    """
     realm_id = payload.realm_id
     selected_ids = payload.active_account_ids
+    if mode not in ("fast", "full"):
+        raise HTTPException(status_code=400, detail="mode must be 'fast' or 'full'")
     
     connection = db.query(QBOConnection).filter(QBOConnection.realm_id == realm_id).first()
     if not connection:
@@ -231,87 +245,9 @@ async def preview_account_sync(payload: AccountSelectionSchema, db: Session = De
 
     # Refresh token if needed is handled by QBOClient
     from app.services.qbo_client import QBOClient
+    from app.services.account_preview import AccountPreview
     qbo_client = QBOClient(db, connection) 
-
-    # Fetch Transactions (Mirroring sync logic)
-    total_count = 0
-    matched_count = 0
-    unmatched_count = 0
-    account_breakdown = {acc_id: 0 for acc_id in selected_ids}
-
-    queries = [
-        "SELECT * FROM Purchase MAXRESULTS 1000",
-        "SELECT * FROM Deposit MAXRESULTS 500",
-        "SELECT * FROM CreditCardCredit MAXRESULTS 500",
-        "SELECT * FROM JournalEntry MAXRESULTS 500",
-        "SELECT * FROM Transfer MAXRESULTS 500"
-    ]
-
-    all_txs = []
-    for q in queries:
-        try:
-            res = await qbo_client.query(q) # ASYNC await
-            entity = q.split()[3]
-            txs = res.get("QueryResponse", {}).get(entity, [])
-            all_txs.extend(txs)
-        except:
-            continue
-
-    for p in all_txs:
-        # Resolve Account ID (differs by type)
-        acc_id = None
-        if "AccountRef" in p:
-            acc_id = str(p["AccountRef"].get("value"))
-        elif "DepositToAccountRef" in p:
-            acc_id = str(p["DepositToAccountRef"].get("value"))
-        elif "FromAccountRef" in p:
-            acc_id = str(p["FromAccountRef"].get("value"))
-        
-        # Check if the primary account ID is selected
-        if acc_id and acc_id in selected_ids:
-            pass # We're good
-        else:
-            # Check secondary ID for Transfers (ToAccountRef)
-            to_acc_id = None
-            if "ToAccountRef" in p:
-                to_acc_id = str(p["ToAccountRef"].get("value"))
-            
-            if to_acc_id and to_acc_id in selected_ids:
-                acc_id = to_acc_id
-            else:
-                continue
-
-        total_count += 1
-        account_breakdown[acc_id] = account_breakdown.get(acc_id, 0) + 1
-        
-        # Determine Status
-        has_linked_txn = len(p.get("LinkedTxn", [])) > 0
-        
-        # Check for manual categorization via TxnType
-        is_manually_categorized = False
-        purchase_ex = p.get("PurchaseEx", {})
-        if "any" in purchase_ex:
-            for item in purchase_ex["any"]:
-                if item.get("value", {}).get("Name") == "TxnType":
-                    txn_type = item.get("value", {}).get("Value")
-                    # TxnType 54 = Manually added/categorized expense
-                    if txn_type == "54":
-                        is_manually_categorized = True
-                        break
-        
-        if has_linked_txn or is_manually_categorized:
-            matched_count += 1
-        else:
-            unmatched_count += 1
-
-    return {
-        "realm_id": realm_id,
-        "selected_count": len(selected_ids),
-        "total_transactions": total_count,
-        "already_matched": matched_count,
-        "to_analyze": unmatched_count,
-        "account_breakdown": account_breakdown
-    }
+    return await AccountPreview(db, connection, qbo_client).build(selected_ids, mode=mode)
 
 @router.get("/analyze")
 def force_analyze(realm_id: str, tx_id: str = None, db: Session = Depends(get_db)):
@@ -333,13 +269,15 @@ def force_analyze(realm_id: str, tx_id: str = None, db: Session = Depends(get_db
     return {"status": "success", "message": "AI analysis triggered"}
 
 @router.delete("/disconnect")
-def disconnect_qbo(realm_id: str, db: Session = Depends(get_db)):
+def disconnect_qbo(realm_id: str, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     """
     Disconnect from QuickBooks and delete all associated data.
-    This removes the connection, transactions, bank accounts, and sync logs.
+    Tokens are revoked here; the realm's data is purged by a background job
+    in short chunks (app/services/realm_purge.py), with progress on the
+    "disconnect" job of the progress stream.
     """
     print(f"🔌 [disconnect] Called with realm_id: {realm_id}")
-    from app.models.qbo import Transaction, BankAccount, SyncLog, Category, Customer
+    from datetime import datetime, timezone
     
     connection = db.query(QBOConnection).filter(QBOConnection.realm_id == realm_id).first()
     if not connection:
@@ -357,19 +295,10 @@ def disconnect_qbo(realm_id: str, db: Session = Depends(get_db)):
         except Exception as e:
             print(f"⚠️ [disconnect] Revocation failed during disconnect (continuing anyway): {e}")
 
-        # Delete all associated data
-        tx_count = db.query(Transaction).filter(Transaction.realm_id == realm_id).delete()
-        acc_count = db.query(BankAccount).filter(BankAccount.realm_id == realm_id).delete()
-        log_count = db.query(SyncLog).filter(SyncLog.realm_id == realm_id).delete()
-        
-        print(f"🗑️ [disconnect] Deleted: {tx_count} transactions, {acc_count} accounts, {log_count} logs")
-        
-        # Delete the connection itself
-        db.delete(connection)
-        db.commit()
-        
-        print(f"✅ [disconnect] Successfully disconnected realm_id: {realm_id}")
-        return {"status": "success", "message": "Disconnected from QuickBooks"}
+        # Stamp the purge; a crashed job is resumed from this by daily_maintenance
+        if connection.disconnect_requested_at is None:
+            connection.disconnect_requested_at = datetime.now(timezone.utc)
+            db.commit()
     except Exception as e:
         print(f"❌ [disconnect] Error: {e}")
         import traceback
@@ -377,6 +306,16 @@ def disconnect_qbo(realm_id: str, db: Session = Depends(get_db)):
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to disconnect: {str(e)}")
 
+    try:
+        from modal_app import purge_realm_modal
+        purge_realm_modal.spawn(realm_id)
+    except (ImportError, Exception):
+        from app.services.realm_purge import run_purge
+        background_tasks.add_task(run_purge, realm_id)
+
+    print(f"✅ [disconnect] Purge queued for realm_id: {realm_id}")
+    return {"status": "success", "message": "Disconnected from QuickBooks", "purge": "queued"}
+
 @router.get("/logs")
 def get_sync_logs(realm_id: str, db: Session = Depends(get_db)):
     """
@@ -1,16 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 import os
 import shutil
 from datetime import datetime
 
-from app.db.session import get_db
-from app.api.deps import verify_subscription
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.session import get_db, SessionLocal
+from app.db.async_session import get_async_db
+from app.api.deps import verify_subscription, verify_subscription_async
 from app.models.qbo import QBOConnection, Transaction, TransactionSplit, Category
 from app.services.transaction_service import TransactionService
+from app.services.async_transaction_service import AsyncTransactionService
 from app.services.analysis_service import AnalysisService
 from app.services.receipt_service import ReceiptService
+from app.services.data_version import get_data_version_async, response_cache
+from app.services import split_engine, transaction_projection
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -70,24 +76,58 @@ class TransactionSchema(BaseModel):
         from_attributes = True
 
 @router.get("/", response_model=List[TransactionSchema])
-def get_transactions(
+async def get_transactions(
     realm_id: str, 
+    request: Request,
     account_ids: Optional[str] = Query(None, description="Comma-separated list of account IDs"),
-    db: Session = Depends(get_db)
+    feed: Optional[str] = Query(None, description="Feed view, e.g. bank_feed_review, unreconciled_manual"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    query = db.query(Transaction).filter(Transaction.realm_id == realm_id)
-    
-    if account_ids:
-        acc_id_list = account_ids.split(",")
-        query = query.filter(Transaction.account_id.in_(acc_id_list))
-        
-    txs = query.all()
-    
-    return txs
+    # Version is read before the rows: a concurrent write can only make the cached body newer than its ETag
+    version = await get_data_version_async(db, realm_id)
+    cache_key = f"transactions:{account_ids or ''}:{feed or ''}"
+    cached = response_cache.lookup(request, realm_id, version, cache_key)
+    if cached:
+        return cached
+
+    service = AsyncTransactionService(db, realm_id)
+    acc_id_list = account_ids.split(",") if account_ids else None
+    try:
+        rows = await service.list_transaction_rows(acc_id_list, feed=feed)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Rows are already TransactionSchema-shaped; orjson skips per-row model validation
+    body = transaction_projection.dumps(rows)
+    return response_cache.respond(realm_id, version, cache_key, body)
+
+@router.get("/export")
+async def export_transactions(
+    realm_id: str,
+    account_ids: Optional[str] = Query(None, description="Comma-separated list of account IDs"),
+    feed: Optional[str] = Query(None, description="Feed view, e.g. bank_feed_review, unreconciled_manual"),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Whole list as NDJSON (one TransactionSchema object per line), streamed in keyset pages."""
+    service = AsyncTransactionService(db, realm_id)
+    acc_id_list = account_ids.split(",") if account_ids else None
+    try:
+        service.filter_criteria(acc_id_list, feed)  # Reject a bad feed before the 200 goes out
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def lines():
+        async for row in service.stream_transaction_rows(acc_id_list, feed=feed):
+            yield transaction_projection.dumps_ndjson_line(row)
+
+    return StreamingResponse(
+        lines(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="transactions-{realm_id}.ndjson"'},
+    )
 
 @router.post("/sync")
-async def sync_user_transactions(realm_id: str, db: Session = Depends(get_db), user=Depends(verify_subscription)):
-    connection = db.query(QBOConnection).filter(QBOConnection.realm_id == realm_id).first()
+async def sync_user_transactions(realm_id: str, db: AsyncSession = Depends(get_async_db), user=Depends(verify_subscription_async)):
+    connection = await AsyncTransactionService(db, realm_id).get_connection()
     if not connection:
         raise HTTPException(status_code=404, detail="QBO Connection not found")
     
@@ -96,10 +136,12 @@ async def sync_user_transactions(realm_id: str, db: Session = Depends(get_db), u
         sync_user_data.spawn(realm_id)
         return {"message": "Background sync triggered successfully"}
     except (ImportError, Exception):
-        # Fallback to local async sync
+        # Fallback to local async sync (SyncService still runs on the sync session)
         from app.services.sync_service import SyncService
-        service = SyncService(db, connection)
-        await service.sync_all()
+        with SessionLocal() as sync_db:
+            sync_connection = sync_db.query(QBOConnection).filter(QBOConnection.realm_id == realm_id).first()
+            service = SyncService(sync_db, sync_connection)
+            await service.sync_all()
         return {"message": "Sync completed (local async fallback)"}
 
 @router.post("/{tx_id}/split")
@@ -108,29 +150,17 @@ def split_transaction(realm_id: str, tx_id: str, splits: List[SplitSchema], db:
     if not tx:
         raise HTTPException(status_code=404, detail="Transaction not found")
     
-    # Calculate total and validate against tx.amount
-    total_split = sum(s.amount for s in splits)
-    if abs(total_split - tx.amount) > 0.01:
-        raise HTTPException(status_code=400, detail=f"Split total ({total_split}) must match transaction amount ({tx.amount})")
+    # Validates the total and resolves every split category in one query
+    try:
+        new_splits = split_engine.build_splits(db, realm_id, tx, splits)
+    except split_engine.SplitValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     # Clear existing splits
     db.query(TransactionSplit).filter(TransactionSplit.transaction_id == tx_id).delete()
     
-    # Create new splits
     tx.is_split = True
-    for s in splits:
-        split = TransactionSplit(
-            transaction_id=tx.id,
-            category_name=s.category_name,
-            amount=s.amount,
-            description=s.description or tx.description
-        )
-        # Resolve category ID if possible
-        cat = db.query(Category).filter(Category.name == s.category_name, Category.realm_id == realm_id).first()
-        if cat:
-            split.category_id = cat.id
-            
-        db.add(split)
+    db.add_all(new_splits)
     
     tx.status = 'pending_approval'
     db.commit()
@@ -157,18 +187,14 @@ def analyze_user_transactions(realm_id: str, tx_id: str = None, db: Session = De
         token_service = TokenService(db)
         
         # Estimate cost (1 token per tx)
+        # Deduct atomically BEFORE dispatch: prevents "free" spamming while the async task runs
+        # and parallel requests can't both pass a separate balance check.
         cost = 1
-        if not token_service.has_sufficient_tokens(connection.user_id, cost):
+        if not token_service.deduct_tokens(connection.user_id, cost, reason=f"AI Analysis Request: {tx_id}"):
             raise HTTPException(status_code=402, detail="Insufficient tokens. Please upgrade your plan.")
 
         from modal_app import process_ai_categorization
         process_ai_categorization.spawn(realm_id, tx_id=tx_id, allow_ai=True)
-        
-        # Deduct synchronously to update UI immediately? 
-        # Ideally the async task does it to ensure uniqueness, but doing it here prevents "free" spamming 
-        # while waiting for async. 
-        # Let's deduct here for the immediate endpoint usage (re-analyze).
-        token_service.deduct_tokens(connection.user_id, cost, reason=f"AI Analysis Request: {tx_id}")
 
         return {"message": f"AI categorization {'for ' + tx_id if tx_id else ''} triggered successfully"}
     except Exception as e:
@@ -207,15 +233,11 @@ def include_transaction(realm_id: str, tx_id: str, db: Session = Depends(get_db)
     return {"message": "Transaction included"}
 
 @router.post("/{tx_id}/approve")
-async def approve_transaction(realm_id: str, tx_id: str, db: Session = Depends(get_db), user=Depends(verify_subscription)):
-    connection = db.query(QBOConnection).filter(QBOConnection.realm_id == realm_id).first()
-    if not connection:
-        raise HTTPException(status_code=404, detail="QBO Connection not found")
-    
-    service = TransactionService(db, connection)
+async def approve_transaction(realm_id: str, tx_id: str, db: AsyncSession = Depends(get_async_db), user=Depends(verify_subscription_async)):
+    service = AsyncTransactionService(db, realm_id)
     try:
         # 1. Optimistic local update
-        result = await service.approve_transaction(tx_id, optimistic=True)
+        result = await service.approve_transaction(tx_id)
         
         # 2. Spawn background QBO sync
         try:
@@ -293,14 +315,12 @@ async def upload_receipt(
         token_service = TokenService(db)
         receipt_cost = 5
         
-        if not token_service.has_sufficient_tokens(connection.user_id, receipt_cost):
+        if not token_service.deduct_tokens(connection.user_id, receipt_cost, reason="Receipt Scan"):
             try:
                 os.remove(file_path)
             except:
                 pass
             raise HTTPException(status_code=402, detail="Insufficient tokens for receipt scan (Cost: 5 tokens)")
-        
-        token_service.deduct_tokens(connection.user_id, receipt_cost, reason="Receipt Scan")
 
         # Reuse content read above
         mime_type = file.content_type or "image/jpeg"
@@ -310,8 +330,8 @@ async def upload_receipt(
             print("🚀 [Upload] Triggering Modal analysis...")
             from modal_app import process_receipt_modal
             
-            # Note: calling remote() is blocking, but acceptable in this context given the architecture
-            result = process_receipt_modal.remote(realm_id, content, file.filename, mime_type=mime_type)
+            # .aio awaits the remote call instead of blocking the event loop
+            result = await process_receipt_modal.remote.aio(realm_id, content, file.filename, mime_type=mime_type)
             
             if "error" in result:
                  raise Exception(result["error"])
@@ -319,7 +339,7 @@ async def upload_receipt(
         except ImportError:
             print("⚠️ Modal not found, running locally")
             service = ReceiptService(db, realm_id)
-            result_obj = service.process_receipt(content, file.filename, mime_type=mime_type)
+            result_obj = await service.process_receipt_async(content, file.filename, mime_type=mime_type)
             match = result_obj.get('match')
             result = {
                 "extracted": result_obj.get('extracted'),
@@ -329,7 +349,7 @@ async def upload_receipt(
             print(f"❌ Serverless Receipt Error: {e}")
             # Fallback to local
             service = ReceiptService(db, realm_id)
-            result_obj = service.process_receipt(content, file.filename, mime_type=mime_type)
+            result_obj = await service.process_receipt_async(content, file.filename, mime_type=mime_type)
             match = result_obj.get('match')
             result = {
                 "extracted": result_obj.get('extracted'),
@@ -379,10 +399,8 @@ async def upload_receipt(
 
 
 @router.post("/bulk-approve")
-async def bulk_approve_transactions(realm_id: str, tx_ids: List[str], db: Session = Depends(get_db), user=Depends(verify_subscription)):
-    connection = db.query(QBOConnection).filter(QBOConnection.realm_id == realm_id).first()
-    if not connection:
-        raise HTTPException(status_code=404, detail="QBO Connection not found")
+async def bulk_approve_transactions(realm_id: str, tx_ids: List[str], db: AsyncSession = Depends(get_async_db), user=Depends(verify_subscription_async)):
+    service = AsyncTransactionService(db, realm_id)
     
     try:
         from modal_app import bulk_approve_modal
@@ -391,12 +409,10 @@ async def bulk_approve_transactions(realm_id: str, tx_ids: List[str], db: Sessio
         return {"message": "Bulk approval started in background", "count": len(tx_ids)}
     except ImportError:
         print("⚠️ Modal not found, falling back to local bulk approve")
-        service = TransactionService(db, connection)
         results = await service.bulk_approve(tx_ids)
         return {"results": results, "mode": "local_fallback"}
     except Exception as e:
         print(f"❌ Modal Spawn Error: {e}")
         # Fallback
-        service = TransactionService(db, connection)
         results = await service.bulk_approve(tx_ids)
         return {"results": results, "mode": "local_fallback_error"}
@@ -0,0 +1,182 @@
+import io
+import math
+import zlib
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.description_normalizer import normalize_description
+
+# Bump when featurization changes so stored models are retrained instead of misread
+FEATURE_VERSION = "hash-ngram-v1"
+FEATURE_DIM = 2 ** 12
+NGRAM_SIZES = (3, 4, 5)
+CALIBRATION_BINS = 10
+MIN_TRAINING_SAMPLES = 20
+TRAINING_CHUNK = 1000
+
+OUTBOUND_TYPES = {"Purchase", "Check", "CreditCard", "BillPayment"}
+INBOUND_TYPES = {"Deposit", "Payment", "CreditCardCredit"}
+
+
+def transaction_direction(t_type: str) -> str:
+    if t_type in OUTBOUND_TYPES:
+        return "out"
+    if t_type in INBOUND_TYPES:
+        return "in"
+    return "neutral"
+
+
+def _add_hashed(vec: np.ndarray, feature: str, weight: float):
+    # crc32, not hash(): Python's string hash is salted per process and
+    # the model is trained in one container and used in another.
+    h = zlib.crc32(feature.encode("utf-8"))
+    vec[h % FEATURE_DIM] += -weight if h & 0x80000000 else weight
+
+
+def featurize(description: str, payee: str, account: str, t_type: str) -> np.ndarray:
+    """
+    Signed hashed features, L2-normalized:
+      - char 3/4/5-grams of the normalized description and of the payee
+      - whole-value tokens for account and direction (lower weight)
+    """
+    vec = np.zeros(FEATURE_DIM, dtype=np.float32)
+    for tag, text in (("d", normalize_description(description)), ("p", (payee or "").lower().strip())):
+        if not text:
+            continue
+        padded = f" {text} "
+        for n in NGRAM_SIZES:
+            for i in range(len(padded) - n + 1):
+                _add_hashed(vec, f"{tag}:{padded[i:i + n]}", 1.0)
+    if account:
+        _add_hashed(vec, f"a:{account.lower()}", 2.0)
+    _add_hashed(vec, f"dir:{transaction_direction(t_type)}", 2.0)
+
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+def featurize_many(rows: Sequence[tuple]) -> np.ndarray:
+    """rows: (description, payee, account, transaction_type) tuples."""
+    matrix = np.zeros((len(rows), FEATURE_DIM), dtype=np.float32)
+    for i, row in enumerate(rows):
+        matrix[i] = featurize(*row)
+    return matrix
+
+
+class CategoryModel:
+    """
+    Nearest-centroid classifier over hashed n-gram features.
+
+    Confidence is calibrated with histogram binning on leave-one-out
+    predictions over the training set: the margin between the best and
+    second-best centroid similarity maps to the accuracy observed for
+    training samples with a similar margin.
+    """
+
+    def __init__(self, centroids: np.ndarray, labels: List[Tuple[str, str]],
+                 bin_edges: np.ndarray, bin_accuracy: np.ndarray, sample_count: int):
+        self.centroids = centroids.astype(np.float32)
+        self.labels = labels  # [(category_id, category_name)], row-aligned with centroids
+        self.bin_edges = bin_edges
+        self.bin_accuracy = bin_accuracy
+        self.sample_count = sample_count
+
+    @classmethod
+    def train(cls, features: Sequence[tuple], labels: Sequence[Tuple[str, str]]) -> Optional["CategoryModel"]:
+        """
+        features: (description, payee, account, transaction_type) per sample
+        labels:   (category_id, category_name) per sample
+        Returns None when there isn't enough history to learn from.
+        """
+        label_list = sorted(set(labels), key=lambda l: (l[1] or "", l[0] or ""))
+        if len(features) < MIN_TRAINING_SAMPLES or len(label_list) < 2:
+            return None
+        label_idx = {label: i for i, label in enumerate(label_list)}
+        y = np.array([label_idx[l] for l in labels], dtype=np.int64)
+
+        # Pass 1: per-category feature sums (chunked to bound memory)
+        sums = np.zeros((len(label_list), FEATURE_DIM), dtype=np.float32)
+        for start in range(0, len(features), TRAINING_CHUNK):
+            X = featurize_many(features[start:start + TRAINING_CHUNK])
+            np.add.at(sums, y[start:start + TRAINING_CHUNK], X)
+        centroids = _normalize_rows(sums)
+
+        # Pass 2: leave-one-out margins (sample removed from its own centroid)
+        margins = np.zeros(len(features), dtype=np.float32)
+        correct = np.zeros(len(features), dtype=bool)
+        for start in range(0, len(features), TRAINING_CHUNK):
+            X = featurize_many(features[start:start + TRAINING_CHUNK])
+            yc = y[start:start + TRAINING_CHUNK]
+            sims = X @ centroids.T
+            own = sums[yc] - X
+            own_norm = np.linalg.norm(own, axis=1)
+            own_sim = np.einsum("ij,ij->i", X, own) / np.where(own_norm > 0, own_norm, 1.0)
+            sims[np.arange(len(yc)), yc] = own_sim
+            pred, margin = _top_margin(sims)
+            margins[start:start + len(yc)] = margin
+            correct[start:start + len(yc)] = pred == yc
+
+        bin_edges, bin_accuracy = _calibrate(margins, correct)
+        return cls(centroids, label_list, bin_edges, bin_accuracy, len(features))
+
+    def predict_many(self, features: Sequence[tuple]) -> List[Tuple[str, str, float]]:
+        """Returns (category_id, category_name, calibrated_confidence) per row."""
+        if not len(features):
+            return []
+        sims = featurize_many(features) @ self.centroids.T
+        pred, margin = _top_margin(sims)
+        confidence = self.bin_accuracy[np.searchsorted(self.bin_edges, margin, side="right")]
+        return [
+            (self.labels[p][0], self.labels[p][1], float(c))
+            for p, c in zip(pred, confidence)
+        ]
+
+    def to_bytes(self) -> bytes:
+        buf = io.BytesIO()
+        np.savez_compressed(
+            buf,
+            centroids=self.centroids.astype(np.float16),  # Half precision is plenty for cosine ranking
+            bin_edges=self.bin_edges,
+            bin_accuracy=self.bin_accuracy,
+        )
+        return buf.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes, labels: List[Tuple[str, str]], sample_count: int) -> "CategoryModel":
+        arrays = np.load(io.BytesIO(data))
+        return cls(
+            arrays["centroids"],
+            [tuple(l) for l in labels],
+            arrays["bin_edges"],
+            arrays["bin_accuracy"],
+            sample_count,
+        )
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms > 0, norms, 1.0)
+
+
+def _top_margin(sims: np.ndarray):
+    if sims.shape[1] == 1:
+        return np.zeros(len(sims), dtype=np.int64), sims[:, 0]
+    top2 = np.argpartition(-sims, 1, axis=1)[:, :2]
+    first = np.take_along_axis(sims, top2, axis=1)
+    swap = first[:, 1] > first[:, 0]
+    pred = np.where(swap, top2[:, 1], top2[:, 0])
+    margin = np.abs(first[:, 0] - first[:, 1])
+    return pred, margin
+
+
+def _calibrate(margins: np.ndarray, correct: np.ndarray):
+    """Quantile bins over the margin; smoothed accuracy per bin, forced non-decreasing."""
+    bins = max(1, min(CALIBRATION_BINS, int(math.sqrt(len(margins)))))
+    bin_edges = np.unique(np.quantile(margins, np.linspace(0, 1, bins + 1)[1:-1]))
+    idx = np.searchsorted(bin_edges, margins, side="right")
+    totals = np.bincount(idx, minlength=len(bin_edges) + 1)
+    hits = np.bincount(idx, weights=correct.astype(np.float64), minlength=len(bin_edges) + 1)
+    accuracy = (hits + 1) / (totals + 2)  # Laplace smoothing so tiny bins can't claim 100%
+    accuracy = np.maximum.accumulate(accuracy)
+    return bin_edges.astype(np.float32), accuracy.astype(np.float32)
@@ -24,6 +24,15 @@ class Settings(BaseSettings):
             ssl_mode = "require" if self.POSTGRES_HOST != "localhost" else "prefer"
             self.DATABASE_URL = f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_HOST}/{self.POSTGRES_DB}?sslmode={ssl_mode}"
 
+    # Connection Pooling (see app/db/session.py)
+    # "api" = long-lived ASGI container (QueuePool), "worker" = ephemeral Modal function (NullPool)
+    DB_RUNTIME: str = os.getenv("DB_RUNTIME", "worker")
+    DB_POOL_MODE: str = os.getenv("DB_POOL_MODE", "auto")  # auto | queue | null
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", "10"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "300"))  # Under Neon's idle timeout
+
     # Security
     BACKEND_CORS_ORIGINS: list[str] = [
         "https://automatchbooksai.com",
@@ -42,6 +51,33 @@ class Settings(BaseSettings):
     # AI Settings
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
     GEMINI_MODEL: str = os.getenv("GEMINI_MODEL", "gemini-3-flash-preview")
+    AI_CALL_TIMEOUT_SECONDS: float = float(os.getenv("AI_CALL_TIMEOUT_SECONDS", "60"))
+    AI_MAX_CONCURRENT_CALLS: int = int(os.getenv("AI_MAX_CONCURRENT_CALLS", "4"))
+    AI_REPAIR_ATTEMPTS: int = int(os.getenv("AI_REPAIR_ATTEMPTS", "2"))  # Re-requests for missing/invalid ids
+    AI_BACKEND: str = os.getenv("AI_BACKEND", "gemini")  # gemini | fake (offline stand-in, see llm_backend.py)
+    AI_FAKE_LATENCY_MS: float = float(os.getenv("AI_FAKE_LATENCY_MS", "50"))
+    AI_FAKE_FAILURE_RATE: float = float(os.getenv("AI_FAKE_FAILURE_RATE", "0"))
+    AI_FAKE_CORRUPTION_RATE: float = float(os.getenv("AI_FAKE_CORRUPTION_RATE", "0"))
+
+    # Progress events (SSE). Without REDIS_URL events stay in-process.
+    REDIS_URL: str = os.getenv("REDIS_URL", "")
+    PROGRESS_MIN_INTERVAL_SECONDS: float = float(os.getenv("PROGRESS_MIN_INTERVAL_SECONDS", "0.5"))
+    PROGRESS_HEARTBEAT_SECONDS: float = float(os.getenv("PROGRESS_HEARTBEAT_SECONDS", "15"))
+
+    # Conditional GETs: in-memory JSON cache keyed by realm data_version
+    RESPONSE_CACHE_MAX_ENTRIES: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+    RESPONSE_CACHE_TTL_SECONDS: float = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))
+    PREVIEW_CACHE_TTL_SECONDS: float = float(os.getenv("PREVIEW_CACHE_TTL_SECONDS", "180"))  # /accounts/preview
+
+    # QBO write-back: batches at least this large refresh SyncTokens from CDC before writing
+    SYNC_TOKEN_CDC_MIN_BATCH: int = int(os.getenv("SYNC_TOKEN_CDC_MIN_BATCH", "10"))
+
+    # /analytics/track: events are buffered and bulk-inserted (see event_buffer.py)
+    ANALYTICS_BUFFER_MAX_EVENTS: int = int(os.getenv("ANALYTICS_BUFFER_MAX_EVENTS", "500"))
+    ANALYTICS_FLUSH_SECONDS: float = float(os.getenv("ANALYTICS_FLUSH_SECONDS", "2"))
+
+    # Auto-accept cron: wall-clock budget per run, shared by every realm (see auto_accept.py)
+    AUTO_ACCEPT_BUDGET_SECONDS: float = float(os.getenv("AUTO_ACCEPT_BUDGET_SECONDS", "480"))
     
     # Stripe Settings
     STRIPE_SECRET_KEY: str = os.getenv("STRIPE_SECRET_KEY", "")
@@ -0,0 +1,33 @@
+import re
+
+# Bank-feed boilerplate that says nothing about the merchant
+_NOISE_TOKENS = {
+    "pos", "purchase", "debit", "credit", "card", "visa", "mc", "mastercard", "dbt",
+    "chk", "checkcard", "recurring", "pmt", "payment", "ach", "web", "ppd", "id",
+    "store", "str", "no", "ref", "trx", "txn", "transaction", "online",
+}
+
+_CARD_SUFFIX = re.compile(r"(?:x{2,}|\*{2,})\s*\d*|\bcard\s*(?:ending\s*(?:in)?)?\s*#?\d{2,}\b")
+_STORE_NUMBER = re.compile(r"(?:#|\bno\.?|\bstore)\s*\d+\b")
+_SEPARATORS = re.compile(r"[^a-z0-9&]+")
+
+
+def normalize_description(description: str) -> str:
+    """
+    Collapses bank-feed descriptions of the same merchant onto one key:
+        "SQ *BLUE BOTTLE #0231 CARD 4412"  -> "sq blue bottle"
+        "AMAZON MKTP US*2K4 XXXX1234"      -> "amazon mktp us"
+    Numbers, reference codes (any token containing a digit), store numbers,
+    card suffixes and boilerplate tokens are stripped.
+    """
+    if not description:
+        return ""
+    text = description.lower()
+    text = _CARD_SUFFIX.sub(" ", text)
+    text = _STORE_NUMBER.sub(" ", text)
+    text = _SEPARATORS.sub(" ", text)
+    tokens = [
+        t for t in text.split()
+        if t not in _NOISE_TOKENS and not any(ch.isdigit() for ch in t)
+    ]
+    return " ".join(tokens)
@@ -6,19 +6,36 @@ The FERNET_KEY must be stored separately from the database
 (env var or secrets vault), per Intuit requirements.
 
 Generate a key:  python -c "from cryptography.fernet import Fernet; print(Fernet.generate_key().decode())"
+
+Key rotation: FERNET_KEY may hold several comma-separated keys. The first
+one encrypts; all of them decrypt (MultiFernet). Put the new key first,
+re-encrypt with rotate_token (migrate_encrypt_tokens.py), then drop the old one.
+
+The cipher is built once per process, and decrypted access tokens are kept
+for ACCESS_TOKEN_TTL seconds per realm so QBOClient does not pay a Fernet
+decrypt (HMAC + AES) on every API request.
 """
 import os
-from cryptography.fernet import Fernet, InvalidToken
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from cryptography.fernet import Fernet, MultiFernet, InvalidToken
 
 _FERNET_KEY = os.getenv("FERNET_KEY", "")
 
-def _get_fernet() -> Fernet:
+ACCESS_TOKEN_TTL = 300  # seconds; QBO access tokens live for an hour
+ACCESS_TOKEN_CACHE_SIZE = 512  # realms
+
+@lru_cache(maxsize=1)
+def _get_fernet() -> MultiFernet:
     if not _FERNET_KEY:
         raise RuntimeError(
             "FERNET_KEY environment variable is not set. "
             "Generate one with: python -c \"from cryptography.fernet import Fernet; print(Fernet.generate_key().decode())\""
         )
-    return Fernet(_FERNET_KEY.encode())
+    keys = [k.strip() for k in _FERNET_KEY.split(",") if k.strip()]
+    return MultiFernet([Fernet(k.encode()) for k in keys])
 
 
 def encrypt_token(plaintext: str) -> str:
@@ -40,3 +57,42 @@ def decrypt_token(ciphertext: str) -> str:
         # Token is likely still in plaintext (pre-migration).
         # Return as-is so the app doesn't crash during migration.
         return ciphertext
+
+
+def rotate_token(ciphertext: str) -> str:
+    """Re-encrypt a ciphertext under the primary key (no-op for empty tokens)."""
+    if not ciphertext:
+        return ciphertext
+    return _get_fernet().rotate(ciphertext.encode()).decode()
+
+
+# realm_id -> (ciphertext, plaintext, expires_at). Keyed on the ciphertext too,
+# so a token refreshed by another worker is never served stale.
+_access_tokens: "OrderedDict[str, tuple]" = OrderedDict()
+_access_tokens_lock = threading.Lock()
+
+
+def decrypt_access_token(realm_id: str, ciphertext: str) -> str:
+    """decrypt_token with a short-lived, bounded per-realm cache."""
+    if not ciphertext:
+        return ciphertext
+    now = time.monotonic()
+    with _access_tokens_lock:
+        entry = _access_tokens.get(realm_id)
+        if entry and entry[0] == ciphertext and entry[2] > now:
+            _access_tokens.move_to_end(realm_id)
+            return entry[1]
+
+    plaintext = decrypt_token(ciphertext)
+    with _access_tokens_lock:
+        _access_tokens[realm_id] = (ciphertext, plaintext, now + ACCESS_TOKEN_TTL)
+        _access_tokens.move_to_end(realm_id)
+        while len(_access_tokens) > ACCESS_TOKEN_CACHE_SIZE:
+            _access_tokens.popitem(last=False)
+    return plaintext
+
+
+def forget_access_token(realm_id: str):
+    """Drops the cached access token for a realm (call on refresh / disconnect)."""
+    with _access_tokens_lock:
+        _access_tokens.pop(realm_id, None)
@@ -1,4 +1,68 @@
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, Tuple, List, Iterable
+
+import numpy as np
+
+LEDGER_TXN_TYPES = {"54", "3"}
+LEDGER_SOURCES = {"RefundReceipt", "SalesReceipt", "CreditMemo", "Payment", "BillPayment"}
+CATEGORY_DETAIL_KEYS = (
+    "AccountBasedExpenseLineDetail", "JournalEntryLineDetail", "DepositLineDetail",
+    "SalesItemLineDetail", "ItemBasedExpenseLineDetail",
+)
+ENTITY_DETAIL_KEYS = ("DepositLineDetail", "JournalEntryLineDetail", "AccountBasedExpenseLineDetail")
+BAD_CATEGORY_KEYWORDS = ("uncategorized", "ask my accountant", "opening balance equity")
+
+# analyze_many: each payload's signals are packed into one bitmask
+ACCEPTED, BILL_PAYMENT, LEDGER_ITEM, LINKED, RECONCILED, SPECIFIC_CATEGORY, PAYEE, FRESH, DEPOSIT = (
+    1 << i for i in range(9)
+)
+
+# Decision codes -> (is_qbo_matched, reason), same strings as the scalar path.
+# UNRECONCILED is formatted with the row's ClrStatus.
+UNRECONCILED = 3
+RESULTS = (
+    (True, "Categorized (Found #Accepted marker)"),
+    (False, "BillPayment (User Verified Review Required)"),
+    (False, "Manual Entry with LinkedTxn (Auto-Match Review)"),
+    (False, "Unreconciled Manual Entry (Clr: {})"),
+    (True, "Categorized Manual Entry (Category + Payee)"),
+    (True, "Fresh Manual Entry (SyncToken 0)"),
+    (False, "Modified Manual Entry (No Category)"),
+    (False, "Auto-Match Suggestion (Needs User Verification)"),
+    (True, "Categorized Deposit (Category + Entity)"),
+    (True, "Categorized (Category + Payee)"),
+    (False, "Missing Specific Category"),
+    (False, "Missing Payee"),
+)
+
+
+def _build_decision_table() -> np.ndarray:
+    """Decision code for every possible signal mask, evaluated vectorized over all 512 masks."""
+    masks = np.arange(1 << 9)
+    bit = lambda flag: (masks & flag) != 0
+    ledger, cat, payee = bit(LEDGER_ITEM), bit(SPECIFIC_CATEGORY), bit(PAYEE)
+    # Conditions in the same order as the branches of FeedLogic.analyze(); first match wins
+    return np.select(
+        [
+            bit(ACCEPTED),
+            bit(BILL_PAYMENT),
+            ledger & bit(LINKED),
+            ledger & ~bit(RECONCILED),
+            ledger & cat & payee,
+            ledger & bit(FRESH),
+            ledger,
+            bit(LINKED),
+            bit(DEPOSIT) & cat & payee,
+            cat & payee,
+            ~cat,
+            ~payee,
+        ],
+        np.arange(12),
+        default=9,
+    )
+
+
+DECISION_TABLE = _build_decision_table()
+
 
 class FeedLogic:
     """
@@ -110,6 +174,25 @@ class FeedLogic:
 
         return True, "Categorized (Category + Payee)"
 
+    @staticmethod
+    def signals(data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        The raw_json signals analyze() decides on, as column values for the
+        Transaction row (stored at sync so filters are SQL predicates, not JSON walks).
+        """
+        source = data.get("_source_entity", "")
+        txn_type = FeedLogic._get_txn_type(data)
+        is_bill_payment = FeedLogic._is_bill_payment(data) or source == "BillPayment"
+        is_ledger_item = txn_type in LEDGER_TXN_TYPES or source in LEDGER_SOURCES
+        return {
+            "qbo_txn_type": txn_type,
+            "clr_status": FeedLogic._get_clr_status(data),
+            "has_linked_txn": FeedLogic._has_linked_txn(data),
+            "has_qbo_payee": FeedLogic._has_payee(data),
+            "has_qbo_category": FeedLogic._has_specific_category(data),
+            "is_bank_feed_import": not is_ledger_item and not is_bill_payment,
+        }
+
     @staticmethod
     def _get_txn_type(data: Dict[str, Any]) -> str:
         """Extracts TxnType from PurchaseEx or top-level fields."""
@@ -219,3 +302,109 @@ class FeedLogic:
                     return True
         
         return False
+
+    @staticmethod
+    def analyze_many(transactions: Iterable[Dict[str, Any]]) -> List[Tuple[bool, str]]:
+        """
+        Batch version of analyze() for whole-realm passes (sync, re-applying feed logic).
+
+        Each payload is walked once to pack its signals into a bitmask column;
+        the decision table (precomputed for all masks) is then applied to the
+        whole column at once. Output is identical to
+        [FeedLogic.analyze(t) for t in transactions].
+        """
+        clr_statuses = []
+        extract = FeedLogic._extract_signals
+        masks = np.fromiter(
+            (extract(t, clr_statuses) for t in transactions), dtype=np.int64
+        )
+        if not masks.size:
+            return []
+
+        codes = DECISION_TABLE[masks]
+        results = [RESULTS[code] for code in codes.tolist()]
+        for i in np.flatnonzero(codes == UNRECONCILED).tolist():
+            results[i] = (False, RESULTS[UNRECONCILED][1].format(clr_statuses[i]))
+        return results
+
+    @staticmethod
+    def _extract_signals(data: Dict[str, Any], clr_statuses: list) -> int:
+        """
+        Single pass over one payload (top level + each Line once) packing the
+        signals analyze() derives through its separate helpers into a bitmask.
+        Appends the row's ClrStatus to clr_statuses (only read for unreconciled
+        ledger rows). Signals that can't change the decision are not computed.
+        """
+        get = data.get
+        clr_status = get("ClrStatus", "Create")
+        clr_statuses.append(clr_status)
+
+        if "#Accepted" in get("PrivateNote", "") or "#Accepted" in get("Memo", ""):
+            return ACCEPTED
+        source = get("_source_entity", "")
+        if FeedLogic._is_bill_payment(data) or source == "BillPayment":
+            return BILL_PAYMENT
+
+        mask = LEDGER_ITEM if (
+            source in LEDGER_SOURCES or FeedLogic._get_txn_type(data) in LEDGER_TXN_TYPES
+        ) else 0
+        lines = get("Line", [])
+
+        # Structural signals (one cheap pass); these alone decide linked / unreconciled rows
+        clr_found = "ClrStatus" in data
+        linked = deposit = False
+        for line in lines:
+            if not linked and line.get("LinkedTxn"):
+                linked = True
+            if not deposit and "DepositLineDetail" in line:
+                deposit = True
+            if not clr_found and "ClrStatus" in line:
+                clr_found, clr_status = True, line["ClrStatus"]
+                clr_statuses[-1] = clr_status
+        if linked:
+            mask |= LINKED
+        if deposit:
+            mask |= DEPOSIT
+        if clr_status == "R":
+            mask |= RECONCILED
+        if mask & LINKED or (mask & LEDGER_ITEM and not mask & RECONCILED):
+            return mask
+
+        if int(get("SyncToken", "0")) == 0:
+            mask |= FRESH
+        for key in ("EntityRef", "VendorRef", "CustomerRef"):
+            if key in data and data[key].get("name"):
+                mask |= PAYEE
+                break
+
+        # Category / line-level payee pass, only for rows that reach those branches
+        for line in lines:
+            detail = None
+            for key in CATEGORY_DETAIL_KEYS:
+                if key in line:
+                    detail = line[key]
+                    break
+            if detail is None:
+                continue
+
+            if not mask & PAYEE:
+                for key in ENTITY_DETAIL_KEYS:
+                    if key in line:
+                        entity_detail = line[key]
+                        if "Entity" in entity_detail and entity_detail["Entity"].get("name"):
+                            mask |= PAYEE
+                            break
+
+            if not mask & SPECIFIC_CATEGORY:
+                if "AccountRef" in detail:
+                    category_name = detail["AccountRef"].get("name", "").lower()
+                    if category_name and not any(k in category_name for k in BAD_CATEGORY_KEYWORDS):
+                        mask |= SPECIFIC_CATEGORY
+                if "ItemRef" in detail:
+                    item_name = detail["ItemRef"].get("name", "").lower()
+                    if item_name and "uncategorized" not in item_name:
+                        mask |= SPECIFIC_CATEGORY
+
+            if mask & PAYEE and mask & SPECIFIC_CATEGORY:
+                break
+        return mask
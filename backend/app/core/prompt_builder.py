@@ -0,0 +1,215 @@
+"""
+Builds compact TRANSACTION_ANALYSIS_PROMPT calls for analyze_batch.
+
+Instead of embedding the whole chart of accounts, 100 entity names and 20
+history lines in every call, each chunk gets:
+  - the top-k categories for that chunk (BM25 over category names + the
+    learned descriptions that were approved into each category)
+  - the top entities for that chunk (rapidfuzz token match)
+  - only the history lines relevant to the chunk
+  - transactions as pipe-separated rows under a single header
+Chunk sizes adapt so each call stays inside the input/output token budget.
+"""
+import math
+import re
+from collections import Counter, defaultdict
+from typing import List, Sequence, Tuple
+
+from rapidfuzz import process, fuzz
+
+from app.core.category_model import transaction_direction
+from app.core.description_normalizer import normalize_description
+from app.core.prompts import TRANSACTION_ANALYSIS_PROMPT
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # ImportError, or no cached encoding in the container
+    _ENCODING = None
+
+INPUT_TOKEN_BUDGET = 6000
+OUTPUT_TOKENS_PER_TX = 220  # ~JSON object with the four reasoning fields
+OUTPUT_TOKEN_BUDGET = 8000
+MAX_CHUNK_SIZE = 40
+CATEGORY_SHORTLIST = 25
+ENTITY_SHORTLIST = 30
+ENTITY_MATCHES_PER_TX = 3
+HISTORY_LINES = 12
+
+TABLE_HEADER = "ID|Dir|Type|Desc|Payee|Account|Amt|Note|CurrentCategory"
+_DIRECTION_CODES = {"out": "OUT", "in": "IN", "neutral": "NEU"}
+_TOKEN_RE = re.compile(r"[a-z0-9&]+")
+
+
+def estimate_tokens(text: str) -> int:
+    """tiktoken count when available, otherwise the usual ~4 chars/token heuristic."""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return math.ceil(len(text) / 4)
+
+
+def _tokens(text: str) -> List[str]:
+    return _TOKEN_RE.findall((text or "").lower())
+
+
+def _cell(value) -> str:
+    if value is None:
+        return ""
+    return str(value).replace("|", "/").replace("\n", " ").strip()
+
+
+def encode_transaction_row(tx) -> str:
+    direction = _DIRECTION_CODES[transaction_direction(tx.transaction_type)]
+    amount = f"{tx.amount} {tx.currency}" if tx.currency else tx.amount
+    return "|".join(_cell(v) for v in (
+        tx.id, direction, tx.transaction_type, tx.description, tx.payee,
+        tx.account_name, amount, tx.note, tx.suggested_category_name,
+    ))
+
+
+class CategoryRanker:
+    """BM25 over one document per category: its name plus the learned descriptions mapped to it."""
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, categories: Sequence[str], history: Sequence[Tuple[str, str]] = ()):
+        self.categories = list(categories)
+        docs = {c: _tokens(c) * 2 for c in self.categories}  # Name terms count double
+        for description, category in history:
+            if category in docs:
+                docs[category].extend(_tokens(description))
+
+        self._tf = {c: Counter(terms) for c, terms in docs.items()}
+        self._len = {c: len(terms) or 1 for c, terms in docs.items()}
+        self._avg_len = (sum(self._len.values()) / len(self._len)) if self._len else 1.0
+        self._postings = defaultdict(list)
+        for c, tf in self._tf.items():
+            for term in tf:
+                self._postings[term].append(c)
+        n = len(self.categories) or 1
+        self._idf = {
+            term: math.log(1 + (n - len(cats) + 0.5) / (len(cats) + 0.5))
+            for term, cats in self._postings.items()
+        }
+        # Tie-breaker / filler: categories with the most approvals first
+        usage = Counter(category for _, category in history)
+        self._by_usage = sorted(self.categories, key=lambda c: -usage.get(c, 0))
+
+    def top(self, query_terms: Sequence[str], k: int, required: Sequence[str] = ()) -> List[str]:
+        if len(self.categories) <= k:
+            return list(self.categories)
+
+        scores = defaultdict(float)
+        for term, qtf in Counter(query_terms).items():
+            idf = self._idf.get(term)
+            if idf is None:
+                continue
+            for c in self._postings[term]:
+                tf = self._tf[c][term]
+                norm = tf + self.K1 * (1 - self.B + self.B * self._len[c] / self._avg_len)
+                scores[c] += qtf * idf * tf * (self.K1 + 1) / norm
+
+        shortlist = [c for c in required if c in self._tf]
+        for c in sorted(scores, key=lambda c: -scores[c]):
+            if len(shortlist) >= k:
+                break
+            if c not in shortlist:
+                shortlist.append(c)
+        for c in self._by_usage:
+            if len(shortlist) >= k:
+                break
+            if c not in shortlist:
+                shortlist.append(c)
+        return shortlist
+
+
+class AnalysisPromptBuilder:
+
+    def __init__(self, category_list: Sequence[str], entity_vocabulary: Sequence[str] = (),
+                 history: Sequence[Tuple[str, str]] = (), input_budget: int = INPUT_TOKEN_BUDGET,
+                 category_k: int = CATEGORY_SHORTLIST, entity_k: int = ENTITY_SHORTLIST):
+        self.category_ranker = CategoryRanker(category_list, history)
+        self.entity_vocabulary = [e for e in dict.fromkeys(entity_vocabulary) if e]
+        self.history = [(d, c) for d, c in history if d and c]
+        self.input_budget = input_budget
+        self.category_k = category_k
+        self.entity_k = entity_k
+        self._base_tokens = estimate_tokens(TRANSACTION_ANALYSIS_PROMPT.format(
+            category_list="", entity_vocabulary="", history_str="", tx_list_str=TABLE_HEADER
+        ))
+        self.max_chunk = max(1, min(MAX_CHUNK_SIZE, OUTPUT_TOKEN_BUDGET // OUTPUT_TOKENS_PER_TX))
+
+    def _query_terms(self, chunk) -> List[str]:
+        terms = []
+        for tx in chunk:
+            terms += _tokens(normalize_description(tx.description))
+            terms += _tokens(tx.payee)
+            terms += _tokens(tx.note)
+        return terms
+
+    def _entities(self, chunk) -> List[str]:
+        if len(self.entity_vocabulary) <= self.entity_k:
+            return self.entity_vocabulary
+        picked = []
+        for tx in chunk:
+            query = " ".join(filter(None, [normalize_description(tx.description), (tx.payee or "").lower()]))
+            if not query:
+                continue
+            for name, _, _ in process.extract(query, self.entity_vocabulary, scorer=fuzz.token_set_ratio,
+                                              processor=str.lower, limit=ENTITY_MATCHES_PER_TX, score_cutoff=60):
+                if name not in picked:
+                    picked.append(name)
+        return picked[:self.entity_k]
+
+    def _history_lines(self, query_terms) -> List[str]:
+        terms = set(query_terms)
+        relevant = [(d, c) for d, c in self.history if terms & set(d.split())]
+        return [f"{d} => {c}" for d, c in relevant[:HISTORY_LINES]]
+
+    def build(self, chunk) -> Tuple[str, int]:
+        """Returns (prompt, estimated_input_tokens) for one chunk."""
+        query_terms = self._query_terms(chunk)
+        required = [tx.suggested_category_name for tx in chunk if tx.suggested_category_name]
+        categories = self.category_ranker.top(query_terms, self.category_k, required)
+        prompt = TRANSACTION_ANALYSIS_PROMPT.format(
+            category_list=", ".join(categories),
+            entity_vocabulary=", ".join(self._entities(chunk)) or "None",
+            history_str="\n".join(self._history_lines(query_terms)) or "None",
+            tx_list_str="\n".join([TABLE_HEADER] + [encode_transaction_row(tx) for tx in chunk]),
+        )
+        return prompt, estimate_tokens(prompt)
+
+    def chunk_prompts(self, transactions) -> List[Tuple[list, str, int]]:
+        """
+        Splits transactions into chunks that fit the token budgets.
+        Rows are packed greedily on their own estimates (leaving room for the
+        shortlists), then each built prompt is measured and halved if still over.
+        """
+        shortlist_reserve = 8 * (self.category_k + self.entity_k) + 12 * HISTORY_LINES  # ~tokens per name/line
+        row_budget = max(1, self.input_budget - self._base_tokens - shortlist_reserve)
+
+        chunks, current, used = [], [], 0
+        for tx in transactions:
+            row_tokens = estimate_tokens(encode_transaction_row(tx)) + 1
+            if current and (used + row_tokens > row_budget or len(current) >= self.max_chunk):
+                chunks.append(current)
+                current, used = [], 0
+            current.append(tx)
+            used += row_tokens
+        if current:
+            chunks.append(current)
+
+        results = []
+        pending = list(reversed(chunks))
+        while pending:
+            chunk = pending.pop()
+            prompt, tokens = self.build(chunk)
+            if tokens > self.input_budget and len(chunk) > 1:
+                mid = len(chunk) // 2
+                pending.extend([chunk[mid:], chunk[:mid]])
+                continue
+            results.append((chunk, prompt, tokens))
+        return results
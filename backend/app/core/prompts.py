@@ -3,16 +3,16 @@ TRANSACTION_ANALYSIS_PROMPT = """
 Role: Senior Certified Public Accountant (CPA) & QuickBooks ProAdvisor.
 Goal: Provide high-precision categorization and professional accounting insights for bank transactions. 
 
-Available Categories (Chart of Accounts):
+Candidate Categories (most relevant accounts from the Chart of Accounts):
 {category_list}
 
 Known Entities (Customers & Vendors):
 {entity_vocabulary}
 
-Historic Context:
+Historic Context (past description => approved category):
 {history_str}
 
-Transactions to Analyze:
+Transactions to Analyze (one per line, pipe-separated, columns named in the first line):
 {tx_list_str}
 
 Instructions for Reasoning Fields:
@@ -31,7 +31,7 @@ Rules:
 - HIERARCHIES: 'Payee' names like 'A:B' indicate a Parent:Child relationship (Entity:Project/Property). PRIORITIZE 'A' (the parent entity) for the primary merchant category. 'B' is only the job/location context.
 - MERCHANT KNOWLEDGE: Use your internal training data to identify the core business of known brands (e.g., 'Freeman Sporting Goods' is clearly Sport/Supplies, NOT maintenance).
 - SUSPICIOUS CONFLICTS: If a 'Note' or 'CurrentCategory' contradicts the known nature of a Merchant (e.g. Note says 'Maintenance' for a Sporting Goods store), mention this discrepancy in 'note_reasoning' and prioritize the Merchant's nature unless the project context is overwhelming.
-- DIRECTION: 'Direction' tells you the money flow. 'OUTBOUND' is usually a Debit (Expense/Asset Purchase). 'INBOUND' is usually a Credit (Income/Refund/Liability Reduction). Handle these distinctly in your reasoning.
+- DIRECTION: 'Dir' tells you the money flow. 'OUT' is usually a Debit (Expense/Asset Purchase). 'IN' is usually a Credit (Income/Refund/Liability Reduction). 'NEU' is a transfer/neutral movement. Handle these distinctly in your reasoning.
 - CONTEXT: 'Type' tells you if it's an Expense/Check/Journal. 'Account' tells you which bank/CC was used.
 - CRITICAL: The 'id' field in the output JSON must EXACTLY match the 'ID' provided in the input list. Do NOT generate new IDs.
 
@@ -0,0 +1,77 @@
+"""
+Async variant of app/db/session.py.
+
+FastAPI handlers are `async def`, so every call on the synchronous SessionLocal
+blocks the event loop. Hot request paths use AsyncSession instead:
+  - Postgres  -> asyncpg   (postgresql+asyncpg://)
+  - SQLite    -> aiosqlite (sqlite+aiosqlite://, used by tests/local dev)
+
+The engine is created lazily so importing this module never requires the
+async drivers to be installed (Modal workers keep using the sync engine).
+"""
+from typing import AsyncGenerator
+
+from sqlalchemy.engine import make_url, URL
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from app.core.config import settings
+from app.db.session import engine_options, resolve_pool_mode
+
+_ASYNC_DRIVERS = {
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+_async_engine = None
+_async_sessionmaker = None
+
+
+def to_async_url(database_url: str) -> tuple[URL, dict]:
+    """
+    Maps a sync DATABASE_URL onto its async driver.
+    asyncpg doesn't understand libpq query options (sslmode, channel_binding),
+    so they are translated into connect_args.
+    """
+    url = make_url(database_url)
+    connect_args = {}
+    drivername = _ASYNC_DRIVERS.get(url.drivername, url.drivername)
+
+    if drivername == "postgresql+asyncpg":
+        sslmode = url.query.get("sslmode")
+        url = url.difference_update_query(["sslmode", "channel_binding"])
+        if sslmode and sslmode != "disable":
+            connect_args["ssl"] = sslmode
+        connect_args["timeout"] = 10  # Same 10 second connect timeout as the sync engine
+
+    return url.set(drivername=drivername), connect_args
+
+
+def get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        url, connect_args = to_async_url(settings.DATABASE_URL)
+        # Same runtime-aware pooling strategy as the sync engine
+        _async_engine = create_async_engine(
+            url,
+            connect_args=connect_args,
+            **engine_options(settings.DATABASE_URL, resolve_pool_mode(), is_async=True),
+        )
+    return _async_engine
+
+
+def AsyncSessionLocal() -> AsyncSession:
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        _async_sessionmaker = async_sessionmaker(
+            bind=get_async_engine(),
+            autoflush=False,
+            expire_on_commit=False,  # Objects stay readable after commit without a lazy (sync) refresh
+        )
+    return _async_sessionmaker()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
+        yield db
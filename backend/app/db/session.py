@@ -1,22 +1,147 @@
-from sqlalchemy import create_engine
+import threading
+import time
+import weakref
+from itertools import chain
+from sqlalchemy import create_engine, event, inspect, update
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import NullPool
+from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import NullPool, QueuePool, AsyncAdaptedQueuePool
 from app.core.config import settings
 
-# CRITICAL: Use NullPool for serverless compatibility
-# External PgBouncer (or cloud provider's pooler) handles connection pooling
-# This prevents connection exhaustion from ephemeral Modal functions
-engine = create_engine(
-    settings.DATABASE_URL,
-    poolclass=NullPool,  # Disable SQLAlchemy's internal pooling
-    connect_args={
-        "connect_timeout": 10,  # 10 second connection timeout
-        # NOTE: statement_timeout removed - Neon pooler doesn't support it in startup options
-        # Set timeouts per-session or per-query if needed
-    },
-    echo=False,  # Set to True for SQL debugging
-)
+
+class PoolCheckoutStats:
+    """Thread-safe counters for connection checkouts (wait time + timeouts)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, waited: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+            }
+
+
+class _CheckoutTimingMixin:
+    """Times how long each checkout waits for a connection (queueing + connect)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_stats = PoolCheckoutStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except Exception:
+            self.checkout_stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.checkout_stats.record(time.perf_counter() - start)
+        return conn
+
+
+class InstrumentedQueuePool(_CheckoutTimingMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_CheckoutTimingMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+class InstrumentedNullPool(_CheckoutTimingMixin, NullPool):
+    pass
+
+
+def resolve_pool_mode() -> str:
+    """
+    "queue" for the long-lived API container (min_containers=1): reuse connections.
+    "null"  for ephemeral Modal workers: external PgBouncer/Neon pooler does the pooling
+            and idle connections would otherwise pile up across short-lived containers.
+    DB_POOL_MODE forces a mode; "auto" picks from DB_RUNTIME.
+    """
+    mode = (settings.DB_POOL_MODE or "auto").lower()
+    if mode in ("queue", "null"):
+        return mode
+    return "queue" if settings.DB_RUNTIME == "api" else "null"
+
+
+def engine_options(database_url: str, pool_mode: str, is_async: bool = False) -> dict:
+    """Keyword arguments for create_engine/create_async_engine for the given pool mode."""
+    options = {"echo": False}  # Set echo to True for SQL debugging
+
+    if pool_mode == "queue":
+        options.update(
+            poolclass=InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,  # Stay under the pooler's idle timeout
+            pool_pre_ping=True,  # Drop connections the pooler closed while idle
+            pool_use_lifo=True,  # Let surplus idle connections age out
+        )
+    else:
+        # CRITICAL: Use NullPool for serverless compatibility
+        # External PgBouncer (or cloud provider's pooler) handles connection pooling
+        # This prevents connection exhaustion from ephemeral Modal functions
+        # (NullPool can't be subclassed for asyncio engines, so async workers use the stock one)
+        options["poolclass"] = NullPool if is_async else InstrumentedNullPool
+
+    if not is_async and make_url(database_url).get_backend_name() == "postgresql":
+        options["connect_args"] = {
+            "connect_timeout": 10,  # 10 second connection timeout
+            # NOTE: statement_timeout removed - Neon pooler doesn't support it in startup options
+            # Set timeouts per-session or per-query if needed
+        }
+    return options
+
+
+def create_db_engine(database_url: str = None, pool_mode: str = None):
+    """Runtime-aware engine factory (see resolve_pool_mode)."""
+    database_url = database_url or settings.DATABASE_URL
+    pool_mode = pool_mode or resolve_pool_mode()
+    return create_engine(database_url, **engine_options(database_url, pool_mode))
+
+
+def get_pool_status(target_engine=None) -> dict:
+    """Pool size/overflow/checkout-wait metrics for the given (default: sync) engine."""
+    target_engine = target_engine or engine
+    pool = target_engine.pool
+    status = {
+        "runtime": settings.DB_RUNTIME,
+        "pool_class": type(pool).__name__,
+    }
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            max_overflow=settings.DB_MAX_OVERFLOW,
+        )
+    stats = getattr(pool, "checkout_stats", None)
+    if stats:
+        status.update(stats.snapshot())
+    return status
+
+
+engine = create_db_engine()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -28,3 +153,56 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# --- Realm data version ---
+# QBOConnection.data_version is bumped in the same transaction as any write to
+# realm-scoped rows; read endpoints turn it into ETags (app/services/data_version.py).
+# ORM writes are collected automatically. Bulk UPDATE/DELETE statements bypass the
+# unit of work, so their callers use mark_realm_changed().
+
+_CHANGED_REALMS = "changed_realms"
+_versioned_binds = weakref.WeakKeyDictionary()  # engine -> has qbo_connections (partial test schemas don't)
+
+
+def mark_realm_changed(session: Session, realm_id: str):
+    """Queues a data_version bump for realm_id on the session's next commit."""
+    session.info.setdefault(_CHANGED_REALMS, set()).add(realm_id)
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_changed_realms(session, flush_context, instances):
+    from app.models.qbo import QBOConnection
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, QBOConnection):
+            continue  # Token refreshes don't change what the read endpoints return
+        realm_id = getattr(obj, "realm_id", None)
+        if realm_id:
+            mark_realm_changed(session, realm_id)
+
+
+@event.listens_for(Session, "before_commit")
+def _bump_changed_realms(session):
+    from app.models.qbo import QBOConnection
+    session.flush()  # Collect anything still pending before reading the set
+    realms = session.info.pop(_CHANGED_REALMS, None)
+    if realms and _has_version_table(session):
+        session.execute(
+            update(QBOConnection)
+            .where(QBOConnection.realm_id.in_(realms))
+            .values(data_version=QBOConnection.data_version + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def _has_version_table(session) -> bool:
+    bind = session.get_bind()
+    engine = getattr(bind, "engine", bind)
+    if engine not in _versioned_binds:
+        _versioned_binds[engine] = inspect(session.connection()).has_table("qbo_connections")
+    return _versioned_binds[engine]
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_realms(session):
+    session.info.pop(_CHANGED_REALMS, None)
@@ -58,6 +58,10 @@ async def lifespan(app: FastAPI):
     
     yield
 
+    # Shutdown: write out buffered analytics events
+    from app.services.event_buffer import get_event_buffer
+    get_event_buffer().flush()
+
 app = FastAPI(
     title="Automatch Books AI",
     lifespan=lifespan
@@ -10,7 +10,7 @@ class AnalyticsEvent(Base):
     user_id = Column(String, index=True, nullable=False)
     event_name = Column(String, index=True, nullable=False)
     properties = Column(JSON, nullable=True)
-    timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    timestamp = Column(DateTime(timezone=True), server_default=func.now(), index=True) # Recent-first reads (events list, insights)
     
     # Context (optional but useful for robustness)
     ip_address = Column(String, nullable=True)
@@ -1,6 +1,9 @@
-from sqlalchemy import Column, String, DateTime, ForeignKey, Numeric, JSON, UUID, Boolean, LargeBinary
+from sqlalchemy import Column, String, DateTime, ForeignKey, Numeric, JSON, UUID, Boolean, LargeBinary, Integer, UniqueConstraint, Index
+from sqlalchemy import event
+from sqlalchemy.orm import deferred
 from sqlalchemy.sql import func
 from app.db.session import Base
+import hashlib
 import uuid
 
 
@@ -13,6 +16,8 @@ class QBOConnection(Base):
     access_token = Column(String)
     expires_at = Column(DateTime(timezone=True))
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    data_version = Column(Integer, nullable=False, default=0, server_default="0") # Bumped on every realm write (ETags)
+    disconnect_requested_at = Column(DateTime(timezone=True), nullable=True) # Set while the realm purge runs (realm_purge.py)
 
 from sqlalchemy.orm import relationship
 
@@ -63,6 +68,13 @@ class Tag(Base):
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Feed filters (AsyncTransactionService.FEED_FILTERS) run on these instead of raw_json
+        Index("ix_transactions_feed_review", "realm_id", "is_qbo_matched", "is_bank_feed_import"),
+        Index("ix_transactions_feed_signals", "realm_id", "qbo_txn_type", "clr_status"),
+        # Amount + date window lookups: Guardian replacement search (GhostFinder), duplicate detection
+        Index("ix_transactions_amount_date", "realm_id", "amount", "date"),
+    )
     id = Column(String, primary_key=True) # QBO Id
     realm_id = Column(String, ForeignKey("qbo_connections.realm_id", ondelete="CASCADE"), index=True)
     date = Column(DateTime(timezone=True))
@@ -77,6 +89,14 @@ class Transaction(Base):
     is_excluded = Column(Boolean, default=False)
     is_bank_feed_import = Column(Boolean, default=True)  # False if TxnType=54 (manual entry)
     forced_review = Column(Boolean, default=False)
+
+    # FeedLogic signals extracted from raw_json at sync (see FeedLogic.signals)
+    qbo_txn_type = Column(String) # PurchaseEx TxnType: 1 = bank feed, 54 = manual entry, ...
+    clr_status = Column(String) # R, C or Create (uncleared)
+    has_linked_txn = Column(Boolean, default=False)
+    has_qbo_payee = Column(Boolean, default=False)
+    has_qbo_category = Column(Boolean, default=False) # Specific (not Uncategorized/AMA) category in QBO
+    feed_reason = Column(String) # FeedLogic.analyze reason
     transaction_type = Column(String) # Expense, Check, CreditCard, etc.
     note = Column(String) # User editable note (initially from Memo)
     payee = Column(String, nullable=True) # Vendor or Customer name
@@ -84,7 +104,7 @@ class Transaction(Base):
     suggested_tags = Column(JSON, default=[]) # AI suggested tags
     status = Column(String, default="unmatched") # unmatched, pending_approval, approved
     sync_token = Column(String) # QBO SyncToken for optimistic locking
-    matching_method = Column(String, default="none") # none, ai, history, rule
+    matching_method = Column(String, default="none") # none, ai, history, rule, local_model
     
     # AI Suggestions (Main / Single)
     suggested_category_id = Column(String)
@@ -110,11 +130,17 @@ class Transaction(Base):
     
     # Receipt Mirroring
     receipt_url = Column(String, nullable=True)
-    receipt_content = Column(LargeBinary, nullable=True) # Binary data for serverless persistence
+    receipt_content = deferred(Column(LargeBinary, nullable=True)) # Binary data for serverless persistence; loaded on access only
+    receipt_sha256 = Column(String(64), nullable=True) # Hex digest of receipt_content, kept in sync on assignment
     receipt_data = Column(JSON, nullable=True) # AI extracted info
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+@event.listens_for(Transaction.receipt_content, "set")
+def _hash_receipt_content(target, value, oldvalue, initiator):
+    # Lets receipt uploads check for an identical QBO attachable without reading the blob
+    target.receipt_sha256 = hashlib.sha256(value).hexdigest() if value else None
+
 class TransactionSplit(Base):
     __tablename__ = "transaction_splits"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -145,6 +171,31 @@ class VendorAlias(Base):
     vendor_id = Column(String, ForeignKey("vendors.id", ondelete="CASCADE"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+class LearnedMapping(Base):
+    """
+    History-learning index: one row per normalized description the user has
+    approved, so history matching never has to rescan approved transactions.
+    """
+    __tablename__ = "learned_mappings"
+    __table_args__ = (UniqueConstraint("realm_id", "normalized_description", name="uq_learned_mapping_realm_key"),)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    realm_id = Column(String, ForeignKey("qbo_connections.realm_id", ondelete="CASCADE"), index=True)
+    normalized_description = Column(String, nullable=False)
+    category_id = Column(String, nullable=True)
+    category_name = Column(String, nullable=False)
+    hit_count = Column(Integer, default=1)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class RealmCategoryModel(Base):
+    """Local category recommender (app/core/category_model.py), one per realm."""
+    __tablename__ = "realm_category_models"
+    realm_id = Column(String, ForeignKey("qbo_connections.realm_id", ondelete="CASCADE"), primary_key=True)
+    feature_version = Column(String, nullable=False)
+    weights = Column(LargeBinary, nullable=False)  # np.savez_compressed centroids + calibration
+    labels = Column(JSON, nullable=False)  # [[category_id, category_name], ...] aligned with centroids
+    sample_count = Column(Integer, default=0)
+    trained_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
 class ClassificationRule(Base):
     __tablename__ = "classification_rules"
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Integer, Boolean
+from sqlalchemy import Column, String, DateTime, Integer, Boolean, ForeignKey
 from sqlalchemy.sql import func
 from app.db.session import Base
 
@@ -20,3 +20,15 @@ class User(Base):
     monthly_token_allowance = Column(Integer, default=50)
     last_refill_date = Column(DateTime(timezone=True), server_default=func.now())
 
+
+class TokenLedgerEntry(Base):
+    """Append-only record of every token balance change (negative = spend)."""
+    __tablename__ = "token_ledger"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    delta = Column(Integer, nullable=False)
+    balance_after = Column(Integer, nullable=True)
+    entry_type = Column(String, nullable=False)  # 'deduct', 'reserve', 'refund', 'refill'
+    reason = Column(String, nullable=True)
+    reservation_id = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
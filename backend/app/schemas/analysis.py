@@ -0,0 +1,65 @@
+from pydantic import BaseModel, field_validator
+from typing import List, Optional, Any
+
+
+class TransactionAnalysis(BaseModel):
+    """One item of the TRANSACTION_ANALYSIS_PROMPT output list."""
+    id: str
+    category: Optional[str] = None
+    payee: Optional[str] = None
+    reasoning: Optional[str] = None
+    vendor_reasoning: Optional[str] = None
+    category_reasoning: Optional[str] = None
+    note_reasoning: Optional[str] = None
+    tax_deduction_note: Optional[str] = None
+    tags: List[str] = []
+    confidence: float = 0.0
+    is_split: bool = False
+    splits: List[Any] = []
+
+    @field_validator("id", mode="before")
+    @classmethod
+    def id_as_string(cls, v):
+        if v is None or str(v).strip() == "":
+            raise ValueError("id is required")
+        return str(v).strip()
+
+    @field_validator("confidence", mode="before")
+    @classmethod
+    def clamp_confidence(cls, v):
+        v = float(v if v is not None else 0.0)
+        return min(max(v, 0.0), 1.0)
+
+    @field_validator("tags", mode="before")
+    @classmethod
+    def tags_as_list(cls, v):
+        if v is None:
+            return []
+        if isinstance(v, str):
+            return [v]
+        return [str(t) for t in v]
+
+
+class ReceiptExtraction(BaseModel):
+    """RECEIPT_ANALYSIS_PROMPT output."""
+    merchant: Optional[str] = None
+    date: Optional[str] = None  # YYYY-MM-DD
+    total: float = 0.0
+    currency: Optional[str] = None
+    items: List[Any] = []
+
+    @field_validator("total", mode="before")
+    @classmethod
+    def parse_total(cls, v):
+        if v is None or v == "":
+            return 0.0
+        if isinstance(v, str):
+            v = v.replace("$", "").replace(",", "").strip()
+        return float(v)
+
+
+class InsightsReport(BaseModel):
+    """ANALYTICS_INSIGHTS_PROMPT output."""
+    patterns: List[str] = []
+    suggestions: List[str] = []
+    anomalies: List[str] = []
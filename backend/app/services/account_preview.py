@@ -0,0 +1,157 @@
+"""
+Account selection preview: how many transactions each selected account has
+and how many are already categorized in QBO.
+
+Answers come from the cheapest source that has them:
+
+  - accounts already in the local mirror (synced while active) are counted
+    with one GROUP BY over transactions; is_qbo_matched is FeedLogic's verdict
+    from that sync
+  - for the others, a SELECT COUNT(*) per entity type tells which types have
+    rows at all; only those are fetched, concurrently, and classified with
+    FeedLogic.analyze_many (same rules as the sync)
+
+Results are cached per (realm, data_version, mode, selection) for
+PREVIEW_CACHE_TTL_SECONDS, so re-toggling a checkbox back and forth does not
+go back to QBO.
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.feed_logic import FeedLogic
+from app.models.qbo import QBOConnection, Transaction
+from app.services.data_version import get_data_version
+
+# Entity types the preview fetches, newest rows first, with their row caps (as before)
+FETCH_LIMITS = {
+    "Purchase": 1000,
+    "Deposit": 500,
+    "CreditCardCredit": 500,
+    "JournalEntry": 500,
+    "Transfer": 500,
+}
+ACCOUNT_KEYS = ("AccountRef", "DepositToAccountRef", "FromAccountRef")
+CACHE_MAX_ENTRIES = 256
+
+_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _account_of(payload: dict, selected: set) -> Optional[str]:
+    """The selected account a payload belongs to: its primary account ref, else a Transfer's ToAccountRef."""
+    for key in ACCOUNT_KEYS:
+        if key in payload:
+            acc_id = str(payload[key].get("value"))
+            return acc_id if acc_id in selected else _to_account(payload, selected)
+    return _to_account(payload, selected)
+
+
+def _to_account(payload: dict, selected: set) -> Optional[str]:
+    if "ToAccountRef" in payload:
+        acc_id = str(payload["ToAccountRef"].get("value"))
+        if acc_id in selected:
+            return acc_id
+    return None
+
+
+class AccountPreview:
+    def __init__(self, db: Session, connection: QBOConnection, client):
+        self.db = db
+        self.connection = connection
+        self.client = client
+
+    def local_counts(self, account_ids: List[str]) -> Dict[str, tuple]:
+        """account_id -> (total, matched) for accounts the local mirror has rows for."""
+        if not account_ids:
+            return {}
+        rows = self.db.query(
+            Transaction.account_id,
+            func.count(Transaction.id),
+            func.sum(case((Transaction.is_qbo_matched == True, 1), else_=0)),
+        ).filter(
+            Transaction.realm_id == self.connection.realm_id,
+            Transaction.account_id.in_(account_ids),
+        ).group_by(Transaction.account_id)
+        return {acc_id: (total, int(matched or 0)) for acc_id, total, matched in rows}
+
+    async def _count(self, entity: str) -> Optional[int]:
+        try:
+            res = await self.client.query(f"SELECT COUNT(*) FROM {entity}")
+            return res.get("QueryResponse", {}).get("totalCount", 0)
+        except Exception as e:
+            print(f"⚠️ [Preview] COUNT failed for {entity}: {e}")
+            return None  # Unknown: fetch anyway
+
+    async def _fetch(self, entity: str, limit: int) -> list:
+        try:
+            res = await self.client.query(f"SELECT * FROM {entity} ORDERBY TxnDate DESC MAXRESULTS {limit}")
+        except Exception as e:
+            print(f"⚠️ [Preview] Fetch failed for {entity}: {e}")
+            return []
+        rows = res.get("QueryResponse", {}).get(entity, [])
+        for row in rows:
+            row["_source_entity"] = entity
+        return rows
+
+    async def remote_counts(self, account_ids: List[str]) -> Dict[str, tuple]:
+        """account_id -> (total, matched) from QBO, fetching only entity types that have rows."""
+        counts = {acc_id: (0, 0) for acc_id in account_ids}
+        if not account_ids:
+            return counts
+        entities = list(FETCH_LIMITS)
+        totals = await asyncio.gather(*(self._count(entity) for entity in entities))
+        wanted = [(entity, min(FETCH_LIMITS[entity], total or FETCH_LIMITS[entity]))
+                  for entity, total in zip(entities, totals) if total != 0]
+        pages = await asyncio.gather(*(self._fetch(entity, limit) for entity, limit in wanted))
+
+        selected = set(account_ids)
+        payloads, owners = [], []
+        for rows in pages:
+            for row in rows:
+                acc_id = _account_of(row, selected)
+                if acc_id:
+                    payloads.append(row)
+                    owners.append(acc_id)
+        for acc_id, (is_matched, _) in zip(owners, FeedLogic.analyze_many(payloads)):
+            total, matched = counts[acc_id]
+            counts[acc_id] = (total + 1, matched + int(is_matched))
+        return counts
+
+    async def build(self, selected_ids: List[str], mode: str = "fast") -> dict:
+        """mode "fast" answers from the local mirror where it can; "full" always asks QBO."""
+        selected_ids = list(dict.fromkeys(selected_ids))
+        key = (self.connection.realm_id, get_data_version(self.db, self.connection.realm_id), mode, tuple(sorted(selected_ids)))
+        with _cache_lock:
+            entry = _cache.get(key)
+            if entry and time.monotonic() - entry[0] < settings.PREVIEW_CACHE_TTL_SECONDS:
+                _cache.move_to_end(key)
+                return entry[1]
+
+        counts = self.local_counts(selected_ids) if mode == "fast" else {}
+        remote = [acc_id for acc_id in selected_ids if acc_id not in counts]
+        counts.update(await self.remote_counts(remote))
+
+        total = sum(t for t, _ in counts.values())
+        matched = sum(m for _, m in counts.values())
+        result = {
+            "realm_id": self.connection.realm_id,
+            "selected_count": len(selected_ids),
+            "total_transactions": total,
+            "already_matched": matched,
+            "to_analyze": total - matched,
+            "account_breakdown": {acc_id: counts[acc_id][0] for acc_id in selected_ids},
+            "sources": {acc_id: "qbo" if acc_id in remote else "local" for acc_id in selected_ids},
+        }
+        with _cache_lock:
+            _cache[key] = (time.monotonic(), result)
+            _cache.move_to_end(key)
+            while len(_cache) > CACHE_MAX_ENTRIES:
+                _cache.popitem(last=False)
+        return result
@@ -1,133 +1,215 @@
-try:
-    import google.generativeai as genai
-except ImportError:
-    genai = None
-
+import asyncio
 import json
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception
+import threading
+from typing import Iterator, List, Tuple
+from pydantic import ValidationError
 from app.core.config import settings
-from app.core.prompts import TRANSACTION_ANALYSIS_PROMPT, RECEIPT_ANALYSIS_PROMPT, ANALYTICS_INSIGHTS_PROMPT
-from rapidfuzz import process, fuzz
+from app.core.prompt_builder import AnalysisPromptBuilder
+from app.core.prompts import RECEIPT_ANALYSIS_PROMPT, ANALYTICS_INSIGHTS_PROMPT
+from app.schemas.analysis import TransactionAnalysis, ReceiptExtraction, InsightsReport
+from app.services.llm_backend import ModelBackend, get_model_backend
+
+
+def _strip_fences(raw_text: str) -> str:
+    return raw_text.replace('```json', '').replace('```', '').strip()
+
+
+def iter_json_items(raw_text: str) -> Iterator[object]:
+    """
+    Yields the elements of a JSON array one at a time, stopping cleanly at the
+    first element that can't be decoded. A response truncated mid-list (output
+    token limit) still yields every complete item before the cut.
+    """
+    decoder = json.JSONDecoder()
+    text = _strip_fences(raw_text)
+    pos = text.find("[")
+    if pos < 0:
+        # Single object instead of a list
+        try:
+            obj, _ = decoder.raw_decode(text)
+            if isinstance(obj, dict):
+                yield obj
+        except ValueError:
+            pass
+        return
+    pos += 1
+    while True:
+        while pos < len(text) and text[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(text) or text[pos] == "]":
+            return
+        try:
+            item, pos = decoder.raw_decode(text, pos)
+        except ValueError:
+            return
+        yield item
+
+
+def validate_analyses(raw_text: str, expected_ids) -> Tuple[List[dict], List[str]]:
+    """
+    Validates each item against TransactionAnalysis as it is decoded.
+    Returns (valid analyses for expected ids, ids still missing or invalid).
+    """
+    expected = {str(i) for i in expected_ids}
+    valid = {}
+    for item in iter_json_items(raw_text):
+        try:
+            analysis = TransactionAnalysis.model_validate(item)
+        except ValidationError as e:
+            print(f"⚠️ [AIAnalyzer] Invalid analysis item skipped: {e.errors()[:1]}")
+            continue
+        if analysis.id in expected and analysis.id not in valid:
+            valid[analysis.id] = analysis.model_dump()
+    missing = [i for i in expected_ids if str(i) not in valid]
+    return list(valid.values()), missing
+
+
+def _run_sync(coro):
+    """Runs a coroutine from sync code, even when the calling thread already has a running loop."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    result = {}
+
+    def runner():
+        try:
+            result["value"] = asyncio.run(coro)
+        except BaseException as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=runner)
+    thread.start()
+    thread.join()
+    if "error" in result:
+        raise result["error"]
+    return result["value"]
+
 
 class AIAnalyzer:
-    def __init__(self):
-        if genai and settings.GEMINI_API_KEY:
-            genai.configure(api_key=settings.GEMINI_API_KEY)
-            self.model = genai.GenerativeModel(settings.GEMINI_MODEL)
-        else:
+    """
+    Model calls are async-native with a per-call timeout; cancelling the
+    awaiting task cancels the request. The sync methods are thin wrappers
+    kept for the sync services and Modal workers.
+    The model itself is a pluggable backend (app/services/llm_backend.py).
+    """
+
+    def __init__(self, backend: ModelBackend = None):
+        self.backend = backend or get_model_backend()
+        if not self.backend:
             print("⚠️ [AIAnalyzer] Generative AI not available (Missing lib or Key)")
-            self.model = None
+        self.timeout = settings.AI_CALL_TIMEOUT_SECONDS
+
+    async def _generate(self, content, json_mode: bool = True) -> str:
+        """One model call bounded by the per-call timeout (TimeoutError cancels it)."""
+        return await asyncio.wait_for(self.backend.generate(content, json_mode=json_mode), timeout=self.timeout)
 
-    @retry(
-        wait=wait_exponential(multiplier=1, min=4, max=10),
-        stop=stop_after_attempt(5),
-        reraise=True
-    )
     def analyze_batch(self, transactions, context):
+        return _run_sync(self.analyze_batch_async(transactions, context))
+
+    async def analyze_batch_async(self, transactions, context):
         """
-        Analyzes a batch of transactions using Gemini Pro.
+        Analyzes a batch of transactions using Gemini.
         context: {
             "category_list": [...],
             "history_str": "...",
-            "entity_vocabulary": [...]
+            "entity_vocabulary": [...],
+            "history": [(normalized_description, category), ...]
         }
+        Chunks run concurrently (bounded); each chunk only re-requests the
+        ids that came back missing or invalid.
         """
-        if not self.model:
-            return {"error": "Gemini API Key missing"}
+        if not self.backend:
+            print("⚠️ [AIAnalyzer] Gemini API Key missing")
+            return []
+
+        # Shortlisted categories/entities + tabular rows, chunked to the token budget
+        builder = AnalysisPromptBuilder(
+            context['category_list'],
+            context.get('entity_vocabulary', []),
+            context.get('history', []),
+        )
+        semaphore = asyncio.Semaphore(settings.AI_MAX_CONCURRENT_CALLS)
 
-        def get_direction(t_type):
-            if t_type in ["Purchase", "Check", "CreditCard", "BillPayment"]:
-                return "OUTBOUND (Spending/Expense)"
-            if t_type in ["Deposit", "Payment", "CreditCardCredit"]:
-                return "INBOUND (Income/Refund/Credit)"
-            return "NEUTRAL/TRANSFERRED"
+        async def run_chunk(chunk, prompt, est_tokens):
+            async with semaphore:
+                print(f"🧠 [AIAnalyzer] Chunk of {len(chunk)} tx (~{est_tokens} input tokens)")
+                return await self._analyze_chunk_async(builder, chunk, prompt)
 
-        tx_list_str = "\n".join([
-            f"ID:{tx.id}|Direction:{get_direction(tx.transaction_type)}|Type:{tx.transaction_type}|Desc:{tx.description}|Payee:{tx.payee}|Account:{tx.account_name}|Amt:{tx.amount} {tx.currency}|Note:{tx.note}|CurrentCategory:{tx.suggested_category_name or 'None'}" 
-            for tx in transactions
+        chunk_results = await asyncio.gather(*[
+            run_chunk(chunk, prompt, est_tokens)
+            for chunk, prompt, est_tokens in builder.chunk_prompts(transactions)
         ])
+        return [analysis for results in chunk_results for analysis in results]
+
+    async def _analyze_chunk_async(self, builder, chunk, prompt) -> List[dict]:
+        by_id = {str(tx.id): tx for tx in chunk}
+        pending = list(by_id)
+        analyses = []
+
+        for attempt in range(settings.AI_REPAIR_ATTEMPTS + 1):
+            if attempt:
+                # Re-request only what is still missing/invalid, with a prompt shortlisted for just those rows
+                prompt, _ = builder.build([by_id[i] for i in pending])
+                print(f"🔁 [AIAnalyzer] Re-requesting {len(pending)} missing/invalid ids (attempt {attempt})")
+            try:
+                raw_text = await self._generate(prompt)
+            except asyncio.TimeoutError:
+                print(f"⏱️ [AIAnalyzer] Call timed out after {self.timeout}s ({len(pending)} tx)")
+                continue
+            except Exception as e:
+                print(f"❌ Batch AI Error: {str(e)}")
+                continue
 
-        prompt = TRANSACTION_ANALYSIS_PROMPT.format(
-            category_list=', '.join(context['category_list']),
-            entity_vocabulary=', '.join(context.get('entity_vocabulary', [])[:100]), # Limit vocabulary for prompt length
-            history_str=context['history_str'],
-            tx_list_str=tx_list_str
-        )
-        
-        try:
-            # Force JSON mode
-            response = self.model.generate_content(
-                prompt,
-                generation_config={"response_mime_type": "application/json"}
-            )
-            raw_text = response.text.replace('```json', '').replace('```', '').strip()
             print(f"🧠 [AIAnalyzer] Raw AI Response Length: {len(raw_text)}")
-            if len(raw_text) > 0:
-                print(f"🧠 [AIAnalyzer] Raw AI Response (First 1000 chars): {raw_text[:1000]}")
-            
-            analyses = json.loads(raw_text)
-            
-            # Basic validation of expected fields
-            if isinstance(analyses, list) and len(analyses) > 0:
-                first = analyses[0]
-                missing = [f for f in ["vendor_reasoning", "category_reasoning", "tax_deduction_note"] if f not in first]
-                if missing:
-                    print(f"⚠️ [AIAnalyzer] Missing reasoning fields in AI output: {missing}")
-                else:
-                    print(f"✅ [AIAnalyzer] All reasoning fields present in AI output.")
-            
-            return analyses
-        except Exception as e:
-            print(f"❌ Batch AI Error: {str(e)}")
-            # Fallback: return empty list to avoid crashing app
-            return []
+            valid, pending = validate_analyses(raw_text, pending)
+            analyses.extend(valid)
+            if not pending:
+                break
+
+        if pending:
+            print(f"⚠️ [AIAnalyzer] Giving up on {len(pending)} ids: {pending[:10]}")
+        return analyses
 
-    @retry(
-        wait=wait_exponential(multiplier=1, min=4, max=10),
-        stop=stop_after_attempt(5),
-        reraise=True
-    )
     def process_receipt(self, file_content: bytes, mime_type: str = "image/jpeg"):
+        return _run_sync(self.process_receipt_async(file_content, mime_type=mime_type))
+
+    async def process_receipt_async(self, file_content: bytes, mime_type: str = "image/jpeg"):
         """
         Extracts data from receipt image using Gemini Vision.
         """
-        if not self.model:
+        if not self.backend:
             raise ValueError("Gemini API Key missing")
 
-        prompt = RECEIPT_ANALYSIS_PROMPT
-        
-        vision_result = self.model.generate_content(
-            [prompt, {"mime_type": mime_type, "data": file_content}],
-            generation_config={"response_mime_type": "application/json"}
-        )
-        
-        try:
-            # Clean possible markdown artifacts even if response_mime_type is set (safety)
-            raw_text = vision_result.text.strip()
-            if raw_text.startswith("```"):
-                raw_text = raw_text.split("\n", 1)[1] if "\n" in raw_text else raw_text
-                raw_text = raw_text.rsplit("\n", 1)[0] if "\n" in raw_text else raw_text
-                raw_text = raw_text.replace("json", "", 1).strip()
-            
-            print(f"📊 [AIAnalyzer] Extracted Receipt: {raw_text[:500]}...")
-            extracted = json.loads(raw_text)
-            return extracted
-        except Exception as e:
-            print(f"❌ AI Receipt Error: {str(e)}")
-            if 'vision_result' in locals() and hasattr(vision_result, 'text'):
-                 print(f"❌ Raw text that failed: {vision_result.text}")
-            raise ValueError("Could not parse receipt data from AI")
-
-    @retry(
-        wait=wait_exponential(multiplier=1, min=4, max=10),
-        stop=stop_after_attempt(5),
-        reraise=True
-    )
+        last_error = None
+        for attempt in range(settings.AI_REPAIR_ATTEMPTS + 1):
+            raw_text = ""
+            try:
+                raw_text = await self._generate([RECEIPT_ANALYSIS_PROMPT, {"mime_type": mime_type, "data": file_content}])
+                item = next(iter_json_items(raw_text), None)
+                extracted = ReceiptExtraction.model_validate(item).model_dump()
+                print(f"📊 [AIAnalyzer] Extracted Receipt: {str(extracted)[:500]}...")
+                return extracted
+            except asyncio.TimeoutError as e:
+                last_error = e
+                print(f"⏱️ [AIAnalyzer] Receipt call timed out after {self.timeout}s (attempt {attempt + 1})")
+            except (ValidationError, ValueError, TypeError) as e:
+                last_error = e
+                print(f"❌ AI Receipt Error: {str(e)}")
+                if raw_text:
+                    print(f"❌ Raw text that failed: {raw_text}")
+
+        raise ValueError(f"Could not parse receipt data from AI: {last_error}")
+
     def generate_insights(self, events):
+        return _run_sync(self.generate_insights_async(events))
+
+    async def generate_insights_async(self, events):
         """
         Analyzes user event logs to provide strategic insights.
         """
-        if not self.model:
+        if not self.backend:
             return {"error": "Gemini API Key missing"}
 
         events_str = "\\n".join([
@@ -138,9 +220,9 @@ class AIAnalyzer:
         prompt = ANALYTICS_INSIGHTS_PROMPT.format(events_str=events_str)
         
         try:
-            response = self.model.generate_content(prompt)
-            raw_text = response.text.replace('```json', '').replace('```', '').strip()
-            return json.loads(raw_text)
+            raw_text = await self._generate(prompt)
+            item = next(iter_json_items(raw_text), None)
+            return InsightsReport.model_validate(item).model_dump()
         except Exception as e:
             print(f"❌ AI Insights Error: {str(e)}")
             return {"error": "Failed to generate insights"}
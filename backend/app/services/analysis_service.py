@@ -2,13 +2,19 @@ from sqlalchemy.orm import Session
 from rapidfuzz import process, fuzz
 from app.models.qbo import Transaction, Category, Customer, TransactionSplit, SyncLog, QBOConnection, VendorAlias, ClassificationRule
 from app.services.ai_analyzer import AIAnalyzer
+from app.services.learned_mapping_service import LearnedMappingIndex
+from app.services.category_model_service import CategoryRecommender
+from app.services.progress_bus import ProgressReporter
 import json
 
 class AnalysisService:
-    def __init__(self, db: Session, realm_id: str):
+    def __init__(self, db: Session, realm_id: str, analyzer: AIAnalyzer = None):
         self.db = db
         self.realm_id = realm_id
-        self.analyzer = AIAnalyzer()
+        self.analyzer = analyzer or AIAnalyzer()
+        self.history_index = LearnedMappingIndex(db, realm_id)
+        self.recommender = CategoryRecommender(db, realm_id)
+        self.progress = ProgressReporter(realm_id, "analysis")
 
     def _log(self, operation: str, entity_type: str, count: int, status: str, details: dict = None):
         log = SyncLog(
@@ -36,19 +42,8 @@ class AnalysisService:
         for v in vendors:
             entity_vocabulary.append(v.fully_qualified_name or v.display_name)
         
-        # Vendor history context
-        history = self.db.query(
-            Transaction.description, 
-            Transaction.suggested_category_name
-        ).filter(
-            Transaction.realm_id == self.realm_id,
-            Transaction.status == 'approved'
-        ).all()
-        
-        vendor_mapping = {}
-        for desc, cat in history:
-            if desc and desc not in vendor_mapping:
-                vendor_mapping[desc] = cat
+        # Vendor history context (learned index, not a scan of every approved transaction)
+        vendor_mapping = self.history_index.top_mappings()
 
         return {
             "categories": [c.name for c in categories],
@@ -61,7 +56,24 @@ class AnalysisService:
         """
         Orchestrates hybrid intelligence with Rule-based logic and Gemini.
         allow_ai: If False, only runs deterministic rules and history matching (Free).
+        Publishes stage progress for the realm's SSE stream.
         """
+        try:
+            results = self._analyze_transactions(limit, tx_id, allow_ai)
+        except Exception as e:
+            self.progress.failed(str(e))
+            raise
+        if isinstance(results, list):
+            methods = {}
+            for r in results:
+                method = r["analysis"].get("method")
+                methods[method] = methods.get(method, 0) + 1
+            self.progress.done(analyzed=len(results), **methods)
+        else:
+            self.progress.done(analyzed=0, message=results.get("message"))
+        return results
+
+    def _analyze_transactions(self, limit: int, tx_id: str, allow_ai: bool):
         print(f"🔍 [AnalysisService] Starting analysis for realm {self.realm_id} (AI Enabled: {allow_ai})...")
         if tx_id:
             query = self.db.query(Transaction).filter(Transaction.id == tx_id, Transaction.realm_id == self.realm_id)
@@ -76,6 +88,8 @@ class AnalysisService:
         if not unmatched:
             return {"message": "No unmatched transactions found"}
 
+        total = len(unmatched)
+        self.progress.update("deterministic", done=0, total=total)
         context = self.get_ai_context()
         categories_obj = context['category_objs']
         category_list = context['categories']
@@ -100,13 +114,15 @@ class AnalysisService:
                 # We might want to re-check history with the new vendor name?
                 # For now, let it flow to History/AI with the better Payee.
             
-            # 1. History Match
+            # 1. History Match (normalized exact key, then fuzzy token-set match)
             # Skip history match if we are explicitly analyzing a specific transaction (User Request)
-            if not tx_id and tx.description in vendor_mapping:
-                suggested_cat = vendor_mapping[tx.description]
-                print(f"✅ [Deterministic] Matched '{tx.description}' to '{suggested_cat}'")
+            learned = self.history_index.lookup(tx.description) if not tx_id else None
+            if learned:
+                suggested_cat = learned["category_name"]
+                confidence = 1.0 if learned["score"] >= 100 else round(learned["score"] / 100 * 0.95, 2)
+                print(f"✅ [Deterministic] Matched '{tx.description}' to '{suggested_cat}' (key '{learned['key']}', score {learned['score']:.0f})")
                 reasoning = "Antigravity learned this from your past actions! Your manual categorizations are actively training the system."
-                self._apply_suggestion(tx, suggested_cat, reasoning, 1.0, "history", list(categories_obj.values()))
+                self._apply_suggestion(tx, suggested_cat, reasoning, confidence, "history", list(categories_obj.values()))
                 results.append({"id": tx.id, "analysis": {"category": suggested_cat, "method": "history"}})
             else:
                 to_analyze_with_ai.append(tx)
@@ -121,58 +137,94 @@ class AnalysisService:
             self.db.commit()
             return results
 
+        # --- Rule 1.5: Local recommender (offline pre-filter, no tokens) ---
+        # Only low-confidence predictions go on to Gemini. Skipped for explicit single-tx requests.
+        if not tx_id:
+            self.progress.update("local_model", done=len(results), total=total)
+            try:
+                predictions = self.recommender.recommend(to_analyze_with_ai)
+            except Exception as e:
+                print(f"⚠️ [LocalModel] Prediction failed, falling back to AI: {e}")
+                predictions = {}
+
+            remaining = []
+            for tx in to_analyze_with_ai:
+                pred = predictions.get(tx.id)
+                if not pred:
+                    remaining.append(tx)
+                    continue
+                reasoning = "Predicted from your approved transactions with similar descriptions, payees and accounts."
+                self._apply_suggestion(tx, pred["category_name"], reasoning, round(pred["confidence"], 2), "local_model", list(categories_obj.values()))
+                results.append({"id": tx.id, "analysis": {"category": pred["category_name"], "confidence": pred["confidence"], "method": "local_model"}})
+
+            if predictions:
+                print(f"🧮 [LocalModel] Resolved {len(predictions)}/{len(to_analyze_with_ai)} transactions without Gemini")
+            to_analyze_with_ai = remaining
+            if not to_analyze_with_ai:
+                self.db.commit()
+                return results
+
         history_str = "\n".join([f"HISTORIC: '{desc}' -> Category: {cat}" for desc, cat in list(vendor_mapping.items())[:20]])
         ai_context = {
             "category_list": category_list, 
             "history_str": history_str,
-            "entity_vocabulary": context.get('entity_vocabulary', [])
+            "entity_vocabulary": context.get('entity_vocabulary', []),
+            "history": self.history_index.pairs()  # Per-chunk shortlisting in the prompt builder
         }
 
         from app.services.token_service import TokenService
         token_service = TokenService(self.db)
         
         user_id = self.db.query(QBOConnection).filter(QBOConnection.realm_id == self.realm_id).first().user_id
-        cost = len(to_analyze_with_ai)
-        
-        if not token_service.has_sufficient_tokens(user_id, cost):
-            available = token_service.get_balance(user_id)
-            to_analyze_with_ai = to_analyze_with_ai[:available]
-            cost = available
-            if cost == 0: return results
+        reservation = None
 
+        # Only charge if this is a bulk run. If tx_id is set, API endpoint paid for it.
+        if not tx_id:
+            # Reserve once for the whole run (atomic, so parallel runs can't oversubscribe)
+            # and refund whatever the AI didn't actually analyze.
+            reservation = token_service.reserve_tokens(
+                user_id, len(to_analyze_with_ai), reason="AI Analysis", allow_partial=True
+            )
+            if not reservation:
+                self.db.commit()
+                return results
+            to_analyze_with_ai = to_analyze_with_ai[:reservation.amount]
+        else:
+            print(f"🎟️ [Token] Skipping deduction for interactive analysis (Paid by API)")
+
+        analyzed = 0
         try:
-            # Only deduct if this is a bulk run. If tx_id is set, API endpoint paid for it.
-            if not tx_id:
-                token_service.deduct_tokens(user_id, cost, reason=f"AI Analysis")
-            else:
-                print(f"🎟️ [Token] Skipping deduction for interactive analysis (Paid by API)")
-            
+            self.progress.update("ai", done=len(results), total=total, pending=len(to_analyze_with_ai))
             analyses = self.analyzer.analyze_batch(to_analyze_with_ai, ai_context)
             
             analysis_map = {str(a.get('id')): a for a in analyses if a.get('id')}
 
+            from app.models.user import User
+            user = self.db.query(User).filter(User.id == user_id).first()
+
             for tx in to_analyze_with_ai:
                 analysis = analysis_map.get(str(tx.id))
                 if analysis:
+                    analyzed += 1
                     self._apply_ai_suggestion(tx, analysis, categories_obj, category_list)
                     results.append({"id": tx.id, "analysis": {**analysis, "method": "ai"}})
                     
                     # --- Rule 3: Auto-Approve High Confidence (Founder/Empire Tier) ---
-                    from app.models.user import User
-                    user = self.db.query(User).filter(User.id == user_id).first()
                     if tx.confidence and tx.confidence >= 0.95 and user and user.subscription_tier in ['business', 'corporate', 'founder', 'empire']:
                         print(f"🚀 [Auto-Approve] High confidence ({tx.confidence}) for {tx.id} (Tier: {user.subscription_tier})")
                         tx.status = 'pending_approval'
                     elif tx.confidence and tx.confidence >= 0.8:
                         tx.status = 'pending_approval'
                 
-            self.db.commit()
             return results
         except Exception as e:
             print(f"❌ Batch AI Error: {str(e)}")
             # Even on error, we might want to commit what we have
-            self.db.commit()
             return results
+        finally:
+            if reservation:
+                token_service.settle_reservation(reservation, used=analyzed, commit=False)
+            token_service.commit()
 
     def _apply_suggestion(self, tx, suggested_cat, reasoning, confidence, method, categories_obj):
         tx.suggested_category_name = suggested_cat
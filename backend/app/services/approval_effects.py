@@ -0,0 +1,122 @@
+"""
+Side effects of pushing approvals to QBO, deferred and batched.
+
+sync_approved_to_qbo used to run the receipt upload, a get_purchase re-read
+for zero amounts, a SyncLog insert (own commit) and an XP award (own commit
+and refresh) inline after every QBO write. Now the approval only performs the
+QBO write and its own commit and records what is left here:
+
+  - receipt uploads start as background tasks right away and overlap with the
+    next approvals (bounded by MAX_CONCURRENT_UPLOADS)
+  - zero amounts the write response didn't fill are re-read concurrently
+  - one SyncLog row per outcome and one XP award (hence one streak update)
+    per batch, written in a single commit. The first row also carries the
+    batch's QBO write / SyncToken conflict counts (sync_token_service.conflict_stats)
+
+flush() runs once the batch's approvals have committed (see
+TransactionService.approval_batch). Like before, none of this can fail an
+approval: errors are logged and dropped.
+"""
+import asyncio
+from types import SimpleNamespace
+from typing import List
+
+from app.models.qbo import Transaction
+
+MAX_CONCURRENT_UPLOADS = 4
+
+# Everything TransactionService._upload_receipt reads from the transaction (the content itself is streamed from the DB)
+RECEIPT_FIELDS = ("id", "realm_id", "date", "transaction_type", "receipt_url", "receipt_sha256")
+
+
+class ApprovalEffects:
+    def __init__(self, service, max_concurrent_uploads: int = MAX_CONCURRENT_UPLOADS):
+        self.service = service
+        self.approved: List[dict] = []
+        self.failed: List[dict] = []
+        self.amount_refresh: List[str] = []
+        self.writes = 0  # QBO write attempts, retries included
+        self.conflicts = 0  # ...that failed with a stale SyncToken
+        self._uploads: List[asyncio.Task] = []
+        self._upload_slots = asyncio.Semaphore(max_concurrent_uploads)
+
+    def upload_receipt(self, tx: Transaction):
+        if not tx.receipt_url and not tx.receipt_sha256:
+            return
+        # Snapshot: the task runs after the approval commit has expired tx
+        receipt = SimpleNamespace(**{field: getattr(tx, field) for field in RECEIPT_FIELDS})
+        self._uploads.append(asyncio.create_task(self._upload(receipt)))
+
+    async def _upload(self, receipt):
+        async with self._upload_slots:
+            await self.service._upload_receipt(receipt)
+
+    def refresh_amount(self, tx_id: str):
+        self.amount_refresh.append(tx_id)
+
+    def record_success(self, tx_id: str, is_split: bool):
+        self.approved.append({"tx_id": tx_id, "is_split": bool(is_split)})
+
+    def record_failure(self, tx_id: str, error: str):
+        self.failed.append({"tx_id": tx_id, "error": error})
+
+    async def flush(self) -> dict:
+        if self._uploads:
+            await asyncio.gather(*self._uploads, return_exceptions=True)
+        if self.amount_refresh:
+            await self._refresh_amounts()
+
+        db = self.service.db
+        counters = {"writes": self.writes, "conflicts": self.conflicts}
+        try:
+            if self.approved:
+                self.service._log("approve", "transaction", len(self.approved), "success", {
+                    "tx_ids": [a["tx_id"] for a in self.approved],
+                    "splits": sum(a["is_split"] for a in self.approved),
+                    **counters,
+                }, commit=False)
+                counters = {}
+            if self.failed:
+                self.service._log("approve", "transaction", len(self.failed), "error",
+                                  {"errors": self.failed, **counters}, commit=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"⚠️ [ApprovalEffects] Failed to write sync log: {e}")
+
+        xp_result = None
+        if self.approved:
+            # [Gamification] One award (and streak update) for the whole batch
+            try:
+                from app.services.gamification_service import GamificationService
+                user_id = self.service.connection.user_id
+                xp_result = GamificationService(db).add_xp(
+                    user_id, "categorize", {"tx_ids": [a["tx_id"] for a in self.approved]}, count=len(self.approved)
+                )
+                print(f"🎮 [Gamification] {user_id} gained XP for {len(self.approved)} approvals: {xp_result}")
+            except Exception as gx:
+                db.rollback()
+                print(f"⚠️ [Gamification] Failed to award XP: {gx}")
+
+        return {"approved": len(self.approved), "failed": len(self.failed), "receipts": len(self._uploads), "xp": xp_result}
+
+    async def _refresh_amounts(self):
+        """Re-reads TotalAmt for approvals whose write response didn't carry one."""
+        async def fetch(tx_id):
+            try:
+                qbo_tx = await self.service.client.get_purchase(tx_id)
+                return tx_id, qbo_tx.get("Purchase", {}).get("TotalAmt")
+            except Exception as e:
+                print(f"⚠️ [SyncToQBO] Failed to fetch amount for {tx_id}: {e}")
+                return tx_id, None
+
+        db = self.service.db
+        amounts = dict(await asyncio.gather(*(fetch(tx_id) for tx_id in self.amount_refresh)))
+        amounts = {tx_id: amount for tx_id, amount in amounts.items() if amount}
+        if not amounts:
+            return
+        for tx in db.query(Transaction).filter(
+            Transaction.realm_id == self.service.connection.realm_id, Transaction.id.in_(list(amounts))
+        ):
+            tx.amount = amounts[tx.id]
+        db.commit()
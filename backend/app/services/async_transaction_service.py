@@ -0,0 +1,140 @@
+from typing import AsyncIterator, List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.core.feed_logic import LEDGER_TXN_TYPES
+from app.db.session import mark_realm_changed
+from app.models.qbo import Transaction, TransactionSplit, QBOConnection, BankAccount
+from app.services.progress_bus import ProgressReporter
+from app.services import transaction_projection as projection
+
+# Named feed views over the FeedLogic signal columns written at sync.
+# Each is a plain indexed predicate; none of them reads raw_json.
+FEED_FILTERS = {
+    "for_review": (Transaction.is_qbo_matched.is_(False),),
+    "categorized": (Transaction.is_qbo_matched.is_(True),),
+    "bank_feed_review": (Transaction.is_qbo_matched.is_(False), Transaction.is_bank_feed_import.is_(True)),
+    "unreconciled_manual": (Transaction.qbo_txn_type.in_(LEDGER_TXN_TYPES), Transaction.clr_status != "R"),
+    "auto_match": (Transaction.is_qbo_matched.is_(False), Transaction.has_linked_txn.is_(True)),
+    "missing_category": (Transaction.is_qbo_matched.is_(False), Transaction.has_qbo_category.is_(False)),
+    "missing_payee": (Transaction.is_qbo_matched.is_(False), Transaction.has_qbo_payee.is_(False)),
+}
+
+
+class AsyncTransactionService:
+    """
+    AsyncSession versions of the TransactionService paths hit on every request
+    (listing, optimistic approval). QBO write-back stays in
+    TransactionService, which runs inside the background workers.
+    """
+
+    def __init__(self, db: AsyncSession, realm_id: str):
+        self.db = db
+        self.realm_id = realm_id
+
+    async def get_connection(self) -> Optional[QBOConnection]:
+        result = await self.db.execute(
+            select(QBOConnection).where(QBOConnection.realm_id == self.realm_id)
+        )
+        return result.scalars().first()
+
+    def filter_criteria(self, account_ids: Optional[List[str]], feed: Optional[str]) -> list:
+        """feed: one of FEED_FILTERS (ValueError otherwise)."""
+        if feed and feed not in FEED_FILTERS:
+            raise ValueError(f"Unknown feed filter '{feed}'. Expected one of: {', '.join(FEED_FILTERS)}")
+        criteria = []
+        if account_ids:
+            criteria.append(Transaction.account_id.in_(account_ids))
+        if feed:
+            criteria.extend(FEED_FILTERS[feed])
+        return criteria
+
+    async def list_transactions(self, account_ids: Optional[List[str]] = None, feed: Optional[str] = None) -> List[Transaction]:
+        """feed: one of FEED_FILTERS (ValueError otherwise)."""
+        criteria = self.filter_criteria(account_ids, feed)
+        stmt = select(Transaction).where(Transaction.realm_id == self.realm_id, *criteria).options(
+            selectinload(Transaction.splits)  # Async sessions can't lazy-load relationships
+        )
+        result = await self.db.execute(stmt)
+        return list(result.scalars().all())
+
+    async def list_transaction_rows(self, account_ids: Optional[List[str]] = None, feed: Optional[str] = None) -> List[dict]:
+        """
+        list_transactions shaped as TransactionSchema dicts, ready for orjson.
+        Selects only the schema's columns (no raw_json / receipt bytes) and
+        loads all splits in a second query instead of hydrating ORM objects.
+        """
+        criteria = self.filter_criteria(account_ids, feed)
+        rows = (await self.db.execute(projection.list_statement(self.realm_id, *criteria))).all()
+        split_rows = (await self.db.execute(projection.splits_statement(self.realm_id, *criteria))).all() if rows else ()
+        return projection.project_rows(rows, split_rows)
+
+    async def stream_transaction_rows(self, account_ids: Optional[List[str]] = None, feed: Optional[str] = None,
+                                      chunk_size: int = 1000) -> AsyncIterator[dict]:
+        """
+        Same rows as list_transaction_rows, ordered by id and fetched in keyset
+        pages of chunk_size, so an export never holds the whole realm in memory.
+        """
+        criteria = self.filter_criteria(account_ids, feed)
+        after = None
+        while True:
+            page_criteria = criteria + ([Transaction.id > after] if after is not None else [])
+            rows = (await self.db.execute(
+                projection.list_statement(self.realm_id, *page_criteria).order_by(Transaction.id).limit(chunk_size)
+            )).all()
+            if not rows:
+                return
+            ids = [row[0] for row in rows]
+            split_rows = (await self.db.execute(
+                projection.splits_statement(self.realm_id, TransactionSplit.transaction_id.in_(ids))
+            )).all()
+            splits = projection.group_splits(split_rows)
+            for row in rows:
+                yield projection.project_row(row, splits.get(row[0], ()))
+            if len(rows) < chunk_size:
+                return
+            after = ids[-1]
+
+    async def approve_transaction(self, tx_id: str) -> dict:
+        """Optimistic approval: single UPDATE marking the tx for the QBO worker."""
+        result = await self.db.execute(
+            update(Transaction)
+            .where(Transaction.id == tx_id, Transaction.realm_id == self.realm_id)
+            .values(status='pending_qbo', forced_review=False)
+            .returning(Transaction.id)
+        )
+        if result.first() is None:
+            await self.db.rollback()
+            raise ValueError(f"Transaction {tx_id} not found")
+        mark_realm_changed(self.db, self.realm_id)  # Bulk UPDATE: not seen by the ORM hooks
+        await self.db.commit()
+
+        print(f"🚀 [Approve] Transaction {tx_id} marked as 'pending_qbo'. Returning optimistically.")
+        return {"status": "success", "message": "Transaction queued for approval", "tx_id": tx_id}
+
+    async def bulk_approve(self, tx_ids: List[str]) -> List[dict]:
+        """Marks every tx in one UPDATE instead of one round trip (and commit) per id."""
+        result = await self.db.execute(
+            update(Transaction)
+            .where(Transaction.id.in_(tx_ids), Transaction.realm_id == self.realm_id)
+            .values(status='pending_qbo', forced_review=False)
+            .returning(Transaction.id)
+        )
+        updated = {row.id for row in result}
+        mark_realm_changed(self.db, self.realm_id)
+        await self.db.commit()
+        ProgressReporter(self.realm_id, "bulk_approve").done(queued=len(updated), missing=len(tx_ids) - len(updated))
+
+        return [
+            {"id": tx_id, "status": "success"} if tx_id in updated
+            else {"id": tx_id, "status": "error", "message": f"Transaction {tx_id} not found"}
+            for tx_id in tx_ids
+        ]
+
+    async def list_bank_accounts(self) -> List[BankAccount]:
+        result = await self.db.execute(
+            select(BankAccount).where(BankAccount.realm_id == self.realm_id).order_by(BankAccount.name)
+        )
+        return list(result.scalars().all())
@@ -0,0 +1,154 @@
+"""
+Auto-accept of high-confidence matches, fanned out per realm.
+
+pending_work finds every eligible (realm, transaction) pair in one query
+(premium tier, auto-accept enabled, unmatched, confidence >= MIN_CONFIDENCE,
+not forced to review). Each realm is then processed on its own, through
+Modal starmap in production (modal_app.auto_accept_worker) or a local
+process pool (run_local), so one slow QBO company can't hold every other
+realm past the cron timeout.
+
+Inside a realm, candidates are claimed CHUNK_SIZE at a time: one conditional
+UPDATE moves them to pending_qbo and, in the same commit, a checkpoint
+SyncLog row (operation "auto_accept", status "in_progress") records their
+ids. The chunk is written with TransactionService.sync_approved_batch and
+the checkpoint is closed. A run killed mid-chunk leaves the checkpoint open;
+the next run resumes those ids before claiming new ones. The per-run budget
+is a wall-clock deadline, checked between chunks; unclaimed candidates stay
+unmatched for the next run.
+"""
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+from sqlalchemy.orm import Session
+
+from app.models.qbo import QBOConnection, SyncLog, Transaction
+from app.models.user import User
+
+ELIGIBLE_TIERS = ("business", "corporate", "founder", "empire")
+MIN_CONFIDENCE = 0.95
+CHUNK_SIZE = 25
+CHECKPOINT_OPERATION = "auto_accept"
+
+
+def _candidate_criteria():
+    return (
+        Transaction.status == 'unmatched',
+        Transaction.confidence >= MIN_CONFIDENCE,
+        Transaction.forced_review == False,
+    )
+
+
+def pending_work(db: Session) -> Dict[str, List[str]]:
+    """realm_id -> candidate ids, plus realms that only have open checkpoints to resume."""
+    rows = db.query(Transaction.realm_id, Transaction.id).join(
+        QBOConnection, QBOConnection.realm_id == Transaction.realm_id
+    ).join(
+        User, User.id == QBOConnection.user_id
+    ).filter(
+        User.subscription_tier.in_(ELIGIBLE_TIERS),
+        User.auto_accept_enabled == True,
+        *_candidate_criteria(),
+    ).order_by(Transaction.realm_id, Transaction.id)
+
+    work: Dict[str, List[str]] = {}
+    for realm_id, tx_id in rows:
+        work.setdefault(realm_id, []).append(tx_id)
+    for (realm_id,) in _open_checkpoints(db).with_entities(SyncLog.realm_id).distinct():
+        work.setdefault(realm_id, [])
+    return work
+
+
+def _open_checkpoints(db: Session, realm_id: str = None):
+    query = db.query(SyncLog).filter(SyncLog.operation == CHECKPOINT_OPERATION, SyncLog.status == "in_progress")
+    return query.filter(SyncLog.realm_id == realm_id) if realm_id else query
+
+
+def _claim(db: Session, realm_id: str, tx_ids: List[str]) -> SyncLog:
+    """Moves the still-eligible ids to pending_qbo and opens their checkpoint, in one commit."""
+    db.query(Transaction).filter(
+        Transaction.realm_id == realm_id, Transaction.id.in_(tx_ids), *_candidate_criteria()
+    ).update({Transaction.status: 'pending_qbo', Transaction.forced_review: False}, synchronize_session=False)
+    claimed = [tx_id for (tx_id,) in db.query(Transaction.id).filter(
+        Transaction.realm_id == realm_id, Transaction.id.in_(tx_ids), Transaction.status == 'pending_qbo'
+    )]
+    checkpoint = SyncLog(realm_id=realm_id, operation=CHECKPOINT_OPERATION, entity_type="transaction",
+                         count=len(claimed), status="in_progress", details={"tx_ids": claimed})
+    db.add(checkpoint)
+    db.commit()
+    return checkpoint
+
+
+async def _write(service, checkpoint: SyncLog, summary: dict):
+    tx_ids = [tx_id for (tx_id,) in service.db.query(Transaction.id).filter(
+        Transaction.realm_id == checkpoint.realm_id,
+        Transaction.id.in_(checkpoint.details.get("tx_ids", [])),
+        Transaction.status == 'pending_qbo',
+    )]
+    results = await service.sync_approved_batch(tx_ids) if tx_ids else []
+    approved = sum(1 for r in results if r["status"] == "success")
+    summary["approved"] += approved
+    summary["failed"] += len(results) - approved
+
+    checkpoint.status = "success" if approved == len(results) else "partial_failure"
+    checkpoint.details = {**checkpoint.details, "approved": approved, "failed": len(results) - approved}
+    service.db.add(checkpoint)
+    service.db.commit()
+
+
+async def accept_realm(db: Session, realm_id: str, tx_ids: List[str], deadline: float) -> dict:
+    """Resumes open checkpoints, then claims and writes tx_ids chunk by chunk until deadline (epoch seconds)."""
+    from app.services.transaction_service import TransactionService
+
+    summary = {"realm_id": realm_id, "approved": 0, "failed": 0, "resumed": 0, "remaining": 0}
+    connection = db.query(QBOConnection).filter(QBOConnection.realm_id == realm_id).first()
+    if not connection:
+        summary["remaining"] = len(tx_ids)
+        return summary
+    service = TransactionService(db, connection)
+
+    for checkpoint in _open_checkpoints(db, realm_id).order_by(SyncLog.timestamp).all():
+        if time.time() >= deadline:
+            break
+        summary["resumed"] += 1
+        await _write(service, checkpoint, summary)
+
+    for start in range(0, len(tx_ids), CHUNK_SIZE):
+        if time.time() >= deadline:
+            summary["remaining"] = len(tx_ids) - start
+            print(f"⏱️ [Auto-Accept] Budget spent for realm {realm_id}, {summary['remaining']} candidates left for the next run")
+            break
+        await _write(service, _claim(db, realm_id, tx_ids[start:start + CHUNK_SIZE]), summary)
+    return summary
+
+
+def run_realm(realm_id: str, tx_ids: List[str], deadline: float) -> dict:
+    """accept_realm on its own session and event loop (one realm per worker process / container)."""
+    from app.db.session import SessionLocal
+
+    db = SessionLocal()
+    try:
+        return asyncio.run(accept_realm(db, realm_id, tx_ids, deadline))
+    finally:
+        db.close()
+
+
+def run_local(budget_seconds: float, max_workers: int = 4) -> List[dict]:
+    """Fan-out without Modal: one process per realm, at most max_workers at a time."""
+    from app.db.session import SessionLocal
+
+    with SessionLocal() as db:
+        work = pending_work(db)
+    deadline = time.time() + budget_seconds
+    summaries = []
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {realm_id: pool.submit(run_realm, realm_id, tx_ids, deadline) for realm_id, tx_ids in work.items()}
+        for realm_id, future in futures.items():
+            try:
+                summaries.append(future.result())
+            except Exception as e:
+                print(f"⚠️ [Auto-Accept] Realm {realm_id} failed: {e}")
+                summaries.append({"realm_id": realm_id, "error": str(e)})
+    return summaries
@@ -0,0 +1,92 @@
+from typing import Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.core.category_model import CategoryModel, FEATURE_VERSION
+from app.models.qbo import RealmCategoryModel, Transaction
+
+
+class CategoryRecommender:
+    """
+    Offline pre-filter between history matching and Gemini: predicts a
+    category from the realm's approved transactions so only low-confidence
+    items are sent to the LLM.
+    """
+
+    MIN_CONFIDENCE = 0.9  # Calibrated accuracy required to skip the LLM
+    RETRAIN_EVERY = 25  # New approvals before the stored model is rebuilt
+    MAX_TRAINING_ROWS = 5000  # Most recent approvals only
+
+    def __init__(self, db: Session, realm_id: str):
+        self.db = db
+        self.realm_id = realm_id
+        self._model = None
+
+    def _approved_filter(self):
+        return (
+            Transaction.realm_id == self.realm_id,
+            Transaction.status == 'approved',
+            func.coalesce(Transaction.category_name, Transaction.suggested_category_name).isnot(None),
+        )
+
+    def get_model(self) -> Optional[CategoryModel]:
+        if self._model is not None:
+            return self._model
+
+        approved = self.db.query(func.count(Transaction.id)).filter(*self._approved_filter()).scalar() or 0
+        stored = self.db.query(RealmCategoryModel).filter(RealmCategoryModel.realm_id == self.realm_id).first()
+
+        if stored and stored.feature_version == FEATURE_VERSION and \
+                approved - (stored.sample_count or 0) < self.RETRAIN_EVERY:
+            self._model = CategoryModel.from_bytes(stored.weights, stored.labels, stored.sample_count)
+            return self._model
+
+        self._model = self._train(stored)
+        return self._model
+
+    def _train(self, stored: Optional[RealmCategoryModel]) -> Optional[CategoryModel]:
+        rows = self.db.query(
+            Transaction.description,
+            Transaction.payee,
+            Transaction.account_name,
+            Transaction.transaction_type,
+            func.coalesce(Transaction.category_id, Transaction.suggested_category_id),
+            func.coalesce(Transaction.category_name, Transaction.suggested_category_name),
+        ).filter(*self._approved_filter()).order_by(Transaction.date.desc()).limit(self.MAX_TRAINING_ROWS).all()
+
+        model = CategoryModel.train(
+            [(r[0], r[1], r[2], r[3]) for r in rows],
+            [(r[4], r[5]) for r in rows],
+        )
+        if not model:
+            return None
+
+        # sample_count tracks total approvals so the retrain check compares like with like
+        # (training itself is capped at MAX_TRAINING_ROWS)
+        total = self.db.query(func.count(Transaction.id)).filter(*self._approved_filter()).scalar() or 0
+        if not stored:
+            stored = RealmCategoryModel(realm_id=self.realm_id)
+            self.db.add(stored)
+        stored.feature_version = FEATURE_VERSION
+        stored.weights = model.to_bytes()
+        stored.labels = [list(l) for l in model.labels]
+        stored.sample_count = total
+        self.db.flush()
+        print(f"🧮 [LocalModel] Trained on {len(rows)} approvals ({len(model.labels)} categories) for realm {self.realm_id}")
+        return model
+
+    def recommend(self, transactions: List[Transaction]) -> Dict[str, dict]:
+        """Returns {tx_id: {"category_id", "category_name", "confidence"}} for confident predictions only."""
+        model = self.get_model()
+        if not model or not transactions:
+            return {}
+
+        predictions = model.predict_many([
+            (tx.description, tx.payee, tx.account_name, tx.transaction_type) for tx in transactions
+        ])
+        return {
+            tx.id: {"category_id": cat_id, "category_name": cat_name, "confidence": confidence}
+            for tx, (cat_id, cat_name, confidence) in zip(transactions, predictions)
+            if confidence >= self.MIN_CONFIDENCE
+        }
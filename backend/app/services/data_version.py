@@ -0,0 +1,105 @@
+"""
+Conditional GET support for realm-scoped read endpoints.
+
+The version comes from QBOConnection.data_version, which the session hooks in
+app/db/session.py bump on every committed write to the realm. Responses carry
+a weak ETag derived from (realm, version, request key). A matching
+If-None-Match gets a 304, and other repeat requests are served from an
+in-memory cache keyed by the version.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import Request, Response
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.qbo import QBOConnection
+
+
+def get_data_version(db: Session, realm_id: str) -> Optional[int]:
+    return db.execute(
+        select(QBOConnection.data_version).where(QBOConnection.realm_id == realm_id)
+    ).scalar()
+
+
+async def get_data_version_async(db, realm_id: str) -> Optional[int]:
+    result = await db.execute(
+        select(QBOConnection.data_version).where(QBOConnection.realm_id == realm_id)
+    )
+    return result.scalar()
+
+
+class ResponseCache:
+    """
+    LRU of serialized JSON bodies keyed by (realm_id, data_version, key).
+
+    A version bump makes older entries unreachable, so nothing is ever
+    invalidated explicitly; the LRU bound and TTL just reclaim the memory.
+    """
+
+    def __init__(self, max_entries: int = None, ttl_seconds: float = None):
+        self.max_entries = max_entries or settings.RESPONSE_CACHE_MAX_ENTRIES
+        self.ttl_seconds = ttl_seconds or settings.RESPONSE_CACHE_TTL_SECONDS
+        self._entries = OrderedDict()  # (realm_id, version, key) -> (stored_at, body)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def etag(realm_id: str, version: int, key: str) -> str:
+        digest = hashlib.blake2s(f"{realm_id}:{version}:{key}".encode(), digest_size=8).hexdigest()
+        return f'W/"{digest}"'
+
+    @staticmethod
+    def _matches(request: Request, etag: str) -> bool:
+        header = request.headers.get("if-none-match")
+        if not header:
+            return False
+        if header.strip() == "*":
+            return True
+        # Weak comparison: W/"x" and "x" match
+        wanted = etag.removeprefix("W/")
+        return any(tag.strip().removeprefix("W/") == wanted for tag in header.split(","))
+
+    @staticmethod
+    def _headers(etag: str) -> dict:
+        return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    def lookup(self, request: Request, realm_id: str, version: Optional[int], key: str) -> Optional[Response]:
+        """304 if the client's copy is current, the cached 200 if we have it, else None."""
+        if version is None:
+            return None
+        etag = self.etag(realm_id, version, key)
+        if self._matches(request, etag):
+            return Response(status_code=304, headers=self._headers(etag))
+
+        cache_key = (realm_id, version, key)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry and time.monotonic() - entry[0] < self.ttl_seconds:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return Response(content=entry[1], media_type="application/json", headers=self._headers(etag))
+            self.misses += 1
+        return None
+
+    def respond(self, realm_id: str, version: Optional[int], key: str, body: bytes) -> Response:
+        """Stores body under the current version and returns it with its ETag."""
+        if version is None:
+            return Response(content=body, media_type="application/json")
+
+        with self._lock:
+            self._entries[(realm_id, version, key)] = (time.monotonic(), body)
+            self._entries.move_to_end((realm_id, version, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        etag = self.etag(realm_id, version, key)
+        return Response(content=body, media_type="application/json", headers=self._headers(etag))
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,153 @@
+"""
+Per-realm entity resolution cache.
+
+SyncService and TransactionService used to query Vendor/Customer once per
+transaction. Instead, each realm's lookups are loaded in a single pass
+(ID -> FullyQualifiedName, normalized name -> ref) and reused for the whole
+sync or approval batch.
+
+In the long-lived API container the loaded caches stay warm across requests
+in a bounded LRU. A cheap version stamp (row counts + latest updated_at of
+vendors/customers) is checked on every checkout, so any sync or write that
+touches the entity tables invalidates the cached copy.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models.qbo import Vendor, Customer
+
+MAX_CACHED_REALMS = 64
+NEGATIVE_TTL_SECONDS = 300  # Remote "not found" answers are trusted for 5 minutes
+
+
+def normalize_entity_name(name: Optional[str]) -> str:
+    """Case- and whitespace-insensitive key for display name lookups."""
+    if not name:
+        return ""
+    return " ".join(name.split()).casefold()
+
+
+class RealmEntityCache:
+    """In-memory view of one realm's vendors and customers."""
+
+    def __init__(self, realm_id: str, version: Tuple = None):
+        self.realm_id = realm_id
+        self.version = version
+        self.fqn_by_id: Dict[str, str] = {}
+        self.vendor_by_name: Dict[str, dict] = {}
+        self.customer_by_name: Dict[str, dict] = {}
+        self._misses: Dict[Tuple[str, str], float] = {}
+
+    def load(self, db: Session):
+        """Loads both entity tables with two column-only queries."""
+        customers = db.query(
+            Customer.id, Customer.display_name, Customer.fully_qualified_name
+        ).filter(Customer.realm_id == self.realm_id).all()
+        vendors = db.query(
+            Vendor.id, Vendor.display_name, Vendor.fully_qualified_name
+        ).filter(Vendor.realm_id == self.realm_id).all()
+
+        # Customers first so Vendors win on ID collisions (same precedence as the old per-row lookup)
+        for c in customers:
+            self.add_customer(c.id, c.display_name, c.fully_qualified_name)
+        for v in vendors:
+            self.add_vendor(v.id, v.display_name, v.fully_qualified_name)
+        return self
+
+    # --- Lookups ---
+
+    def fully_qualified_name(self, entity_id) -> Optional[str]:
+        if entity_id is None:
+            return None
+        return self.fqn_by_id.get(str(entity_id))
+
+    def vendor_ref(self, name: str) -> Optional[dict]:
+        return self.vendor_by_name.get(normalize_entity_name(name))
+
+    def customer_ref(self, name: str) -> Optional[dict]:
+        return self.customer_by_name.get(normalize_entity_name(name))
+
+    # --- Writes (keep the cache in step with local inserts) ---
+
+    def add_vendor(self, entity_id, display_name: str, fully_qualified_name: str = None):
+        entity_id = str(entity_id)
+        if fully_qualified_name:
+            self.fqn_by_id[entity_id] = fully_qualified_name
+        key = normalize_entity_name(display_name)
+        if key:
+            self.vendor_by_name[key] = {"value": entity_id, "name": display_name}
+            self._misses.pop(("vendor", key), None)
+
+    def add_customer(self, entity_id, display_name: str, fully_qualified_name: str = None):
+        entity_id = str(entity_id)
+        if fully_qualified_name:
+            self.fqn_by_id[entity_id] = fully_qualified_name
+        key = normalize_entity_name(display_name)
+        if key:
+            self.customer_by_name[key] = {"value": entity_id, "name": display_name}
+            self._misses.pop(("customer", key), None)
+
+    # --- Negative cache for remote QBO lookups ---
+
+    def mark_missing(self, kind: str, name: str, ttl: float = NEGATIVE_TTL_SECONDS):
+        self._misses[(kind, normalize_entity_name(name))] = time.monotonic() + ttl
+
+    def is_known_missing(self, kind: str, name: str) -> bool:
+        key = (kind, normalize_entity_name(name))
+        expires_at = self._misses.get(key)
+        if expires_at is None:
+            return False
+        if expires_at < time.monotonic():
+            del self._misses[key]
+            return False
+        return True
+
+
+_cache: "OrderedDict[str, RealmEntityCache]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _version_stamp(db: Session, realm_id: str) -> Tuple:
+    """Single round trip: counts + latest updated_at for both entity tables."""
+    stmt = select(
+        select(func.count(Vendor.id)).where(Vendor.realm_id == realm_id).scalar_subquery(),
+        select(func.max(Vendor.updated_at)).where(Vendor.realm_id == realm_id).scalar_subquery(),
+        select(func.count(Customer.id)).where(Customer.realm_id == realm_id).scalar_subquery(),
+        select(func.max(Customer.updated_at)).where(Customer.realm_id == realm_id).scalar_subquery(),
+    )
+    return tuple(db.execute(stmt).one())
+
+
+def get_entity_cache(db: Session, realm_id: str) -> RealmEntityCache:
+    """
+    Returns a warm cache for the realm, reloading it when the version stamp moved.
+    Call once per sync/approval batch and keep the returned object for the batch.
+    """
+    version = _version_stamp(db, realm_id)
+    with _lock:
+        cached = _cache.get(realm_id)
+        if cached and cached.version == version:
+            _cache.move_to_end(realm_id)
+            return cached
+
+    fresh = RealmEntityCache(realm_id, version).load(db)
+    with _lock:
+        _cache[realm_id] = fresh
+        _cache.move_to_end(realm_id)
+        while len(_cache) > MAX_CACHED_REALMS:
+            _cache.popitem(last=False)
+    return fresh
+
+
+def invalidate_entity_cache(realm_id: str = None):
+    """Drops one realm (or everything) from the process-wide cache."""
+    with _lock:
+        if realm_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(realm_id, None)
@@ -0,0 +1,107 @@
+"""
+Buffered analytics event writer.
+
+/analytics/track used to insert and commit one AnalyticsEvent per request.
+Events are now queued in memory and written with one multi-row INSERT when
+the buffer reaches ANALYTICS_BUFFER_MAX_EVENTS or every
+ANALYTICS_FLUSH_SECONDS, whichever comes first, and again on shutdown.
+
+Ids and timestamps are assigned when the event is queued, so responses can
+return the id and ordering reflects when the event happened, not when it
+was flushed. The trade-off is durability: a container killed between
+flushes loses at most one interval of telemetry.
+"""
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from sqlalchemy import insert
+
+from app.core.config import settings
+from app.models.analytics import AnalyticsEvent
+
+EVENT_FIELDS = ("user_id", "event_name", "properties", "ip_address", "user_agent")
+MAX_PENDING = 10_000  # Events kept while the database is unreachable; older ones are dropped
+
+
+class EventBuffer:
+    def __init__(self, session_factory=None, max_events: int = None, flush_seconds: float = None):
+        self._session_factory = session_factory
+        self.max_events = max_events or settings.ANALYTICS_BUFFER_MAX_EVENTS
+        self.flush_seconds = flush_seconds or settings.ANALYTICS_FLUSH_SECONDS
+        self._pending: List[dict] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # One writer at a time
+        self._timer: Optional[threading.Timer] = None
+        self.flushed = 0
+
+    def _sessions(self):
+        if self._session_factory is None:
+            from app.db.session import SessionLocal
+            self._session_factory = SessionLocal
+        return self._session_factory
+
+    def _schedule(self):
+        """Arms the interval flush (caller holds _lock)."""
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_seconds, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def add(self, user_id: str, event_name: str, properties: dict = None,
+            ip_address: str = None, user_agent: str = None) -> str:
+        return self.add_many([dict(user_id=user_id, event_name=event_name, properties=properties,
+                                   ip_address=ip_address, user_agent=user_agent)])[0]
+
+    def add_many(self, events: List[dict]) -> List[str]:
+        """Queues events (AnalyticsEvent column values); returns their ids."""
+        now = datetime.now(timezone.utc)
+        # Same keys on every row, so the flush stays a single executemany
+        rows = [{**{field: event.get(field) for field in EVENT_FIELDS}, "id": uuid.uuid4(), "timestamp": event.get("timestamp") or now}
+                for event in events]
+        with self._lock:
+            self._pending.extend(rows)
+            full = len(self._pending) >= self.max_events
+            if not full:
+                self._schedule()
+        if full:
+            self.flush()
+        return [str(row["id"]) for row in rows]
+
+    def flush(self) -> int:
+        """Writes everything queued so far in one INSERT. Returns the number of events written."""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._pending = self._pending, []
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if not rows:
+                return 0
+            try:
+                with self._sessions()() as db:
+                    db.execute(insert(AnalyticsEvent), rows)
+                    db.commit()
+            except Exception as e:
+                print(f"⚠️ [Analytics] Flush of {len(rows)} events failed, keeping them for the next one: {e}")
+                with self._lock:
+                    self._pending[:0] = rows
+                    del self._pending[:-MAX_PENDING]
+                    self._schedule()
+                return 0
+            self.flushed += len(rows)
+            return len(rows)
+
+
+_buffer: Optional[EventBuffer] = None
+_buffer_lock = threading.Lock()
+
+
+def get_event_buffer() -> EventBuffer:
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = EventBuffer()
+    return _buffer
@@ -40,12 +40,13 @@ class GamificationService:
             self.db.refresh(stats)
         return stats
 
-    def add_xp(self, user_id: str, action_type: str, metadata: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    def add_xp(self, user_id: str, action_type: str, metadata: Optional[Dict[str, Any]] = None, count: int = 1) -> Dict[str, Any]:
         """
         Adds XP to user, checks for level up, and logs the event.
+        count: number of actions awarded at once (one event, one streak update).
         """
         stats = self.get_user_stats(user_id)
-        xp_amount = self.XP_VALUES.get(action_type, 0)
+        xp_amount = self.XP_VALUES.get(action_type, 0) * count
         
         if xp_amount == 0:
             return {"success": False, "message": "Invalid action type"}
@@ -0,0 +1,86 @@
+"""
+Replacement search for "ghosted" transactions (Guardian recovery).
+
+When QBO answers a write with Object Not Found (610), the entity was deleted
+or re-created under a new Id, usually by a bank-feed re-match. The
+replacement is the same-type entity with the same amount within
+GHOST_WINDOW_DAYS.
+
+  1. local mirror: the synced transactions table, via
+     ix_transactions_amount_date (realm_id, amount, date). This costs no QBO call.
+  2. QBO fallback: a query bounded by TxnDate and capped at one page
+
+Purchases (incl. Expense/Check/CreditCard), Deposits and Transfers are
+supported. Transfers carry their total in Amount instead of TotalAmt.
+"""
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.models.qbo import QBOConnection, Transaction
+from app.services.sync_token_service import QUERY_ENTITY, query_entity
+
+GHOST_WINDOW_DAYS = 4
+REMOTE_MAX_RESULTS = 100
+
+AMOUNT_FIELD = {"Transfer": "Amount"}
+SUPPORTED_ENTITIES = ("Purchase", "Deposit", "Transfer")
+
+
+def _same_entity_types(entity: str) -> list:
+    """Local transaction_type values stored for one QBO entity."""
+    return [entity] + [t for t, e in QUERY_ENTITY.items() if e == entity]
+
+
+class GhostFinder:
+    def __init__(self, db: Session, connection: QBOConnection, client):
+        self.db = db
+        self.connection = connection
+        self.client = client
+
+    async def find(self, tx: Transaction) -> Optional[dict]:
+        """{"Id", "SyncToken", "TxnDate", "source"} of the closest replacement, or None."""
+        entity = query_entity(tx.transaction_type)
+        if entity not in SUPPORTED_ENTITIES or tx.date is None or tx.amount is None:
+            return None
+        return self.find_local(tx, entity) or await self.find_remote(tx, entity)
+
+    def _window(self, tx: Transaction):
+        day = tx.date.date() if isinstance(tx.date, datetime) else tx.date
+        return day, day - timedelta(days=GHOST_WINDOW_DAYS), day + timedelta(days=GHOST_WINDOW_DAYS)
+
+    def find_local(self, tx: Transaction, entity: str) -> Optional[dict]:
+        day, start, end = self._window(tx)
+        candidates = self.db.query(Transaction.id, Transaction.sync_token, Transaction.date).filter(
+            Transaction.realm_id == self.connection.realm_id,
+            Transaction.amount == tx.amount,
+            Transaction.date >= datetime.combine(start, datetime.min.time()),
+            Transaction.date < datetime.combine(end + timedelta(days=1), datetime.min.time()),
+            Transaction.id != tx.id,
+            Transaction.transaction_type.in_(_same_entity_types(entity)),
+            Transaction.status != "approved",  # Already written back: a live entity, not a replacement
+            Transaction.sync_token.isnot(None),
+        ).all()
+        if not candidates:
+            return None
+        best = min(candidates, key=lambda c: (abs((c.date.date() - day).days), c.id))
+        return {"Id": best.id, "SyncToken": best.sync_token, "TxnDate": best.date.strftime("%Y-%m-%d"), "source": "local"}
+
+    async def find_remote(self, tx: Transaction, entity: str) -> Optional[dict]:
+        day, start, end = self._window(tx)
+        amount_field = AMOUNT_FIELD.get(entity, "TotalAmt")
+        query = (
+            f"select * from {entity} where {amount_field} = '{tx.amount}' "
+            f"and TxnDate >= '{start.isoformat()}' and TxnDate <= '{end.isoformat()}' "
+            f"maxresults {REMOTE_MAX_RESULTS}"
+        )
+        result = await self.client.query(query)
+        candidates = [
+            c for c in result.get("QueryResponse", {}).get(entity, [])
+            if c.get("TxnDate") and str(c.get("Id")) != tx.id
+        ]
+        if not candidates:
+            return None
+        best = min(candidates, key=lambda c: abs((datetime.strptime(c["TxnDate"], "%Y-%m-%d").date() - day).days))
+        return {"Id": str(best["Id"]), "SyncToken": best.get("SyncToken"), "TxnDate": best["TxnDate"], "source": "qbo"}
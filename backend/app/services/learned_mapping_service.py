@@ -0,0 +1,157 @@
+from collections import defaultdict
+from typing import Optional
+
+from rapidfuzz import process, fuzz
+from sqlalchemy.orm import Session
+
+from app.core.description_normalizer import normalize_description
+from app.models.qbo import LearnedMapping, Transaction
+
+# token_set_ratio scores 100 whenever one token set contains the other, so the
+# cutoff is high and candidates must share a token with the query to be scored.
+FUZZY_SCORE_CUTOFF = 90
+
+
+class LearnedMappingIndex:
+    """
+    Per-realm description -> category index learned from approvals.
+
+    Lookups try the exact normalized key first, then a token_set_ratio match
+    over the keys sharing at least one token with the query (inverted index),
+    so neither path touches the transactions table.
+    """
+
+    def __init__(self, db: Session, realm_id: str):
+        self.db = db
+        self.realm_id = realm_id
+        self._mappings = None  # normalized_description -> (category_id, category_name, hit_count)
+        self._token_index = defaultdict(set)
+
+    def _load(self):
+        if self._mappings is not None:
+            return
+        self._mappings = {}
+        self._token_index = defaultdict(set)
+
+        rows = self.db.query(
+            LearnedMapping.normalized_description,
+            LearnedMapping.category_id,
+            LearnedMapping.category_name,
+            LearnedMapping.hit_count,
+        ).filter(LearnedMapping.realm_id == self.realm_id).all()
+
+        if not rows:
+            rows = self._backfill()
+
+        for key, cat_id, cat_name, hits in rows:
+            self._index(key, cat_id, cat_name, hits or 1)
+
+    def _index(self, key, category_id, category_name, hit_count):
+        self._mappings[key] = (category_id, category_name, hit_count)
+        for token in key.split():
+            self._token_index[token].add(key)
+
+    def _backfill(self):
+        """One-time seed from already-approved transactions (realms approved before the index existed)."""
+        history = self.db.query(
+            Transaction.description,
+            Transaction.category_id,
+            Transaction.category_name,
+            Transaction.suggested_category_id,
+            Transaction.suggested_category_name,
+        ).filter(
+            Transaction.realm_id == self.realm_id,
+            Transaction.status == 'approved'
+        ).yield_per(1000)
+
+        seeded = {}
+        for desc, cat_id, cat_name, sug_id, sug_name in history:
+            key = normalize_description(desc)
+            name = cat_name or sug_name
+            if not key or not name:
+                continue
+            if key in seeded:
+                seeded[key]["hit_count"] += 1
+            else:
+                seeded[key] = {
+                    "realm_id": self.realm_id,
+                    "normalized_description": key,
+                    "category_id": cat_id or sug_id,
+                    "category_name": name,
+                    "hit_count": 1,
+                }
+
+        if seeded:
+            self.db.bulk_insert_mappings(LearnedMapping, list(seeded.values()))
+            self.db.flush()
+            print(f"🧠 [LearnedMappings] Backfilled {len(seeded)} mappings for realm {self.realm_id}")
+
+        return [
+            (m["normalized_description"], m["category_id"], m["category_name"], m["hit_count"])
+            for m in seeded.values()
+        ]
+
+    def lookup(self, description: str, score_cutoff: int = FUZZY_SCORE_CUTOFF) -> Optional[dict]:
+        """Returns {"category_id", "category_name", "score", "key"} or None."""
+        self._load()
+        key = normalize_description(description)
+        if not key:
+            return None
+
+        exact = self._mappings.get(key)
+        if exact:
+            return {"category_id": exact[0], "category_name": exact[1], "score": 100.0, "key": key}
+
+        candidates = set()
+        for token in key.split():
+            candidates |= self._token_index.get(token, set())
+        if not candidates:
+            return None
+
+        match = process.extractOne(key, candidates, scorer=fuzz.token_set_ratio, score_cutoff=score_cutoff)
+        if not match:
+            return None
+        matched_key, score = match[0], match[1]
+        cat_id, cat_name, _ = self._mappings[matched_key]
+        return {"category_id": cat_id, "category_name": cat_name, "score": score, "key": matched_key}
+
+    def learn(self, description: str, category_id: str, category_name: str):
+        """
+        Incremental update on approval. Last approval wins the category;
+        hit_count tracks how often the key was confirmed. Caller commits.
+        """
+        key = normalize_description(description)
+        if not key or not category_name:
+            return
+
+        mapping = self.db.query(LearnedMapping).filter(
+            LearnedMapping.realm_id == self.realm_id,
+            LearnedMapping.normalized_description == key
+        ).first()
+
+        if mapping:
+            mapping.hit_count = (mapping.hit_count or 0) + 1
+            mapping.category_id = category_id
+            mapping.category_name = category_name
+        else:
+            mapping = LearnedMapping(
+                realm_id=self.realm_id,
+                normalized_description=key,
+                category_id=category_id,
+                category_name=category_name,
+                hit_count=1,
+            )
+            self.db.add(mapping)
+
+        if self._mappings is not None:
+            self._index(key, category_id, category_name, mapping.hit_count)
+
+    def pairs(self) -> list:
+        """(normalized_description, category_name) for every mapping, most-confirmed first."""
+        self._load()
+        ranked = sorted(self._mappings.items(), key=lambda item: item[1][2], reverse=True)
+        return [(key, cat_name) for key, (_, cat_name, _) in ranked]
+
+    def top_mappings(self, limit: int = 20) -> dict:
+        """Most-confirmed mappings, used as few-shot history in the AI prompt."""
+        return dict(self.pairs()[:limit])
@@ -0,0 +1,165 @@
+"""
+Pluggable model backends for AIAnalyzer.
+
+  - GeminiBackend: google-generativeai (production)
+  - FakeBackend:   deterministic offline stand-in with configurable latency,
+                   failure rate and output corruption, for benchmarks/tests
+
+AI_BACKEND=fake selects the fake without touching any caller.
+"""
+import asyncio
+import json
+import random
+import re
+import zlib
+
+try:
+    import google.generativeai as genai
+except ImportError:
+    genai = None
+
+from app.core.config import settings
+from app.core.prompt_builder import TABLE_HEADER, estimate_tokens
+
+JSON_CONFIG = {"response_mime_type": "application/json"}
+
+
+class ModelBackend:
+    """Interface: one async text generation call. Tracks usage for cost reporting."""
+
+    name = "base"
+
+    def __init__(self):
+        self.usage = {"calls": 0, "failures": 0, "input_tokens": 0, "output_tokens": 0}
+
+    async def generate(self, content, json_mode: bool = True) -> str:
+        raise NotImplementedError
+
+    def _record(self, input_tokens: int, output_tokens: int):
+        self.usage["calls"] += 1
+        self.usage["input_tokens"] += input_tokens or 0
+        self.usage["output_tokens"] += output_tokens or 0
+
+
+class GeminiBackend(ModelBackend):
+    name = "gemini"
+
+    def __init__(self, model_name: str = None):
+        super().__init__()
+        genai.configure(api_key=settings.GEMINI_API_KEY)
+        self.model = genai.GenerativeModel(model_name or settings.GEMINI_MODEL)
+
+    async def generate(self, content, json_mode: bool = True) -> str:
+        kwargs = {"generation_config": JSON_CONFIG} if json_mode else {}
+        try:
+            response = await self.model.generate_content_async(content, **kwargs)
+        except Exception:
+            self.usage["failures"] += 1
+            raise
+        meta = getattr(response, "usage_metadata", None)
+        self._record(
+            getattr(meta, "prompt_token_count", 0),
+            getattr(meta, "candidates_token_count", 0),
+        )
+        return response.text
+
+
+class FakeBackend(ModelBackend):
+    """
+    Answers the three prompts in this app without a network call:
+      - transaction analysis: one valid item per table row, category picked
+        deterministically (crc32 of the description) from the candidate list
+      - receipts / insights: fixed, schema-valid payloads
+    Randomness (failures, corruption, jitter) comes from a seeded RNG so runs repeat.
+    """
+
+    name = "fake"
+    _CATEGORY_LINE = re.compile(r"Candidate Categories[^\n]*:\n(.*)\n")
+
+    def __init__(self, latency_ms: float = 50, jitter_ms: float = 0, failure_rate: float = 0.0,
+                 corruption_rate: float = 0.0, seed: int = 7):
+        super().__init__()
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.corruption_rate = corruption_rate
+        self._rng = random.Random(seed)
+
+    async def generate(self, content, json_mode: bool = True) -> str:
+        delay = self.latency_ms + self._rng.uniform(0, self.jitter_ms)
+        await asyncio.sleep(delay / 1000)
+
+        if self._rng.random() < self.failure_rate:
+            self.usage["failures"] += 1
+            raise RuntimeError("FakeBackend: simulated model failure")
+
+        prompt = content if isinstance(content, str) else str(content[0])
+        if TABLE_HEADER in prompt:
+            text = self._analyze(prompt)
+        elif "receipt" in prompt.lower():
+            text = json.dumps({"merchant": "Fake Merchant", "date": "2026-01-15", "total": 42.5,
+                               "currency": "USD", "items": []})
+        else:
+            text = json.dumps({"patterns": ["synthetic"], "suggestions": ["synthetic"], "anomalies": []})
+
+        if self._rng.random() < self.corruption_rate:
+            text = self._corrupt(text)
+
+        self._record(estimate_tokens(prompt), estimate_tokens(text))
+        return text
+
+    def _analyze(self, prompt: str) -> str:
+        match = self._CATEGORY_LINE.search(prompt)
+        categories = [c.strip() for c in match.group(1).split(",")] if match else ["Uncategorized Expense"]
+        rows = prompt.split(TABLE_HEADER, 1)[1].split("\n\n", 1)[0].strip().splitlines()
+
+        items = []
+        for row in rows:
+            cells = row.split("|")
+            if len(cells) < 5:
+                continue
+            tx_id, description, payee = cells[0], cells[3], cells[4]
+            pick = zlib.crc32((description or tx_id).encode("utf-8"))
+            items.append({
+                "id": tx_id,
+                "category": categories[pick % len(categories)],
+                "payee": payee or (description.split(" ")[0].title() if description else None),
+                "reasoning": "Synthetic analysis.",
+                "vendor_reasoning": "Synthetic vendor reasoning.",
+                "category_reasoning": "Synthetic category reasoning.",
+                "note_reasoning": "",
+                "tax_deduction_note": "Synthetic tax note.",
+                "tags": [],
+                "confidence": round(0.5 + (pick % 50) / 100, 2),
+                "is_split": False,
+                "splits": [],
+            })
+        return json.dumps(items)
+
+    def _corrupt(self, text: str) -> str:
+        mode = self._rng.choice(["truncate", "drop_item", "bad_field"])
+        if mode == "truncate":
+            return text[: max(1, int(len(text) * self._rng.uniform(0.3, 0.9)))]
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return text
+        if isinstance(data, list) and data:
+            if mode == "drop_item":
+                data.pop(self._rng.randrange(len(data)))
+            else:
+                data[self._rng.randrange(len(data))]["confidence"] = "very sure"
+        return json.dumps(data)
+
+
+def get_model_backend():
+    """Backend selected by AI_BACKEND; None when Gemini is selected but unavailable."""
+    if settings.AI_BACKEND == "fake":
+        return FakeBackend(
+            latency_ms=settings.AI_FAKE_LATENCY_MS,
+            failure_rate=settings.AI_FAKE_FAILURE_RATE,
+            corruption_rate=settings.AI_FAKE_CORRUPTION_RATE,
+        )
+    if genai and settings.GEMINI_API_KEY:
+        return GeminiBackend()
+    return None
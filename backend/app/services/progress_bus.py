@@ -0,0 +1,191 @@
+"""
+Progress events for long-running jobs (sync, analysis, bulk approval).
+
+Jobs publish through a ProgressReporter. The SSE endpoint (/progress/stream)
+subscribes per realm, so clients can follow a job instead of polling list
+endpoints.
+
+  - ProgressBus:      in-process pub/sub (API container, local fallbacks)
+  - RedisProgressBus: Redis pub/sub, used when REDIS_URL is set, so Modal
+                      workers reach subscribers in the API container
+
+Publishing never raises into the job: a broken bus only costs the events.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import defaultdict
+from typing import AsyncIterator, Optional
+
+try:
+    import redis
+    import redis.asyncio as aioredis
+except ImportError:
+    redis = None
+    aioredis = None
+
+from app.core.config import settings
+
+TERMINAL_STAGES = ("done", "failed")
+
+
+class ProgressBus:
+    """
+    In-process bus. Subscribers are asyncio queues bound to their event loop;
+    publish() is thread-safe, so sync services running in a threadpool can call it.
+    Slow subscribers drop their oldest events rather than growing without bound.
+    """
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscribers = defaultdict(set)  # realm_id -> {(loop, queue)}
+        self._latest = defaultdict(dict)  # realm_id -> {job: last event}, replayed to new subscribers
+        self._lock = threading.Lock()
+
+    def publish(self, realm_id: str, event: dict):
+        with self._lock:
+            self._latest[realm_id][event["job"]] = event
+            subscribers = list(self._subscribers.get(realm_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, event)
+            except RuntimeError:
+                pass  # Subscriber's loop already closed
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, event: dict):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(event)
+
+    def snapshot(self, realm_id: str) -> list:
+        with self._lock:
+            return list(self._latest.get(realm_id, {}).values())
+
+    async def subscribe(self, realm_id: str) -> AsyncIterator[dict]:
+        """Yields the latest event of every known job, then live events."""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        entry = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._subscribers[realm_id].add(entry)
+        try:
+            for event in self.snapshot(realm_id):
+                yield event
+            while True:
+                yield await queue.get()
+        finally:
+            with self._lock:
+                self._subscribers[realm_id].discard(entry)
+                if not self._subscribers[realm_id]:
+                    del self._subscribers[realm_id]
+
+
+class RedisProgressBus(ProgressBus):
+    """
+    Events are PUBLISHed on progress:<realm_id>; the latest event per job is
+    also kept in a hash with a TTL so late subscribers get a snapshot.
+    """
+
+    LATEST_TTL_SECONDS = 3600
+
+    def __init__(self, url: str, queue_size: int = 100):
+        super().__init__(queue_size)
+        self.url = url
+        self._client = redis.Redis.from_url(url)
+
+    @staticmethod
+    def _channel(realm_id: str) -> str:
+        return f"progress:{realm_id}"
+
+    def publish(self, realm_id: str, event: dict):
+        payload = json.dumps(event)
+        key = f"{self._channel(realm_id)}:latest"
+        pipe = self._client.pipeline()
+        pipe.hset(key, event["job"], payload)
+        pipe.expire(key, self.LATEST_TTL_SECONDS)
+        pipe.publish(self._channel(realm_id), payload)
+        pipe.execute()
+
+    def snapshot(self, realm_id: str) -> list:
+        latest = self._client.hgetall(f"{self._channel(realm_id)}:latest")
+        return [json.loads(v) for v in latest.values()]
+
+    async def subscribe(self, realm_id: str) -> AsyncIterator[dict]:
+        client = aioredis.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(self._channel(realm_id))
+        try:
+            latest = await client.hgetall(f"{self._channel(realm_id)}:latest")
+            for value in latest.values():
+                yield json.loads(value)
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    yield json.loads(message["data"])
+        finally:
+            await pubsub.unsubscribe(self._channel(realm_id))
+            await pubsub.aclose()
+            await client.aclose()
+
+
+_bus: Optional[ProgressBus] = None
+_bus_lock = threading.Lock()
+
+
+def get_progress_bus() -> ProgressBus:
+    global _bus
+    if _bus is None:
+        with _bus_lock:
+            if _bus is None:
+                if settings.REDIS_URL and redis:
+                    _bus = RedisProgressBus(settings.REDIS_URL)
+                else:
+                    _bus = ProgressBus()
+    return _bus
+
+
+class ProgressReporter:
+    """
+    Publishes one job's progress: stage, done/total, percent and free-form counters.
+
+    Non-terminal updates within the same stage are throttled to one per
+    PROGRESS_MIN_INTERVAL_SECONDS so per-item loops can report every item.
+    """
+
+    def __init__(self, realm_id: str, job: str, bus: ProgressBus = None):
+        self.realm_id = realm_id
+        self.job = job
+        self.bus = bus
+        self.started_at = time.time()
+        self._last_stage = None
+        self._last_sent = 0.0
+
+    def update(self, stage: str, done: int = None, total: int = None, message: str = None, **counters):
+        now = time.monotonic()
+        if (stage == self._last_stage and stage not in TERMINAL_STAGES and (done is None or done != total)
+                and now - self._last_sent < settings.PROGRESS_MIN_INTERVAL_SECONDS):
+            return
+        self._last_stage, self._last_sent = stage, now
+
+        event = {
+            "realm_id": self.realm_id,
+            "job": self.job,
+            "stage": stage,
+            "done": done,
+            "total": total,
+            "percent": round(done / total * 100, 1) if total and done is not None else None,
+            "counters": counters,
+            "message": message,
+            "started_at": self.started_at,
+            "ts": time.time(),
+        }
+        try:
+            (self.bus or get_progress_bus()).publish(self.realm_id, event)
+        except Exception as e:
+            print(f"⚠️ [Progress] Could not publish {self.job}/{stage} for {self.realm_id}: {e}")
+
+    def done(self, message: str = None, **counters):
+        self.update("done", message=message, **counters)
+
+    def failed(self, error: str, **counters):
+        self.update("failed", message=error, **counters)
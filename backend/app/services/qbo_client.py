@@ -1,11 +1,40 @@
 import httpx
 import asyncio
+import json
+import uuid
+from datetime import datetime
+from typing import Optional
 from sqlalchemy.orm import Session
 from app.models.qbo import QBOConnection
 from app.core.config import settings
-from app.core.encryption import encrypt_token, decrypt_token
+from app.core.encryption import encrypt_token, decrypt_token, decrypt_access_token, forget_access_token
 from intuitlib.client import AuthClient
 
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+class _AsyncByteReader:
+    """Adapts an httpx byte stream to the async file-like `read(n)` interface ijson expects."""
+
+    def __init__(self, byte_iterator):
+        self._iterator = byte_iterator
+        self._buffer = b""
+
+    async def read(self, size: int = -1) -> bytes:
+        while size < 0 or len(self._buffer) < size:
+            try:
+                self._buffer += await self._iterator.__anext__()
+            except StopAsyncIteration:
+                break
+        if size < 0:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
 class QBOClient:
     def __init__(self, db: Session, qbo_connection: QBOConnection):
         self.db = db
@@ -25,12 +54,17 @@ class QBOClient:
         # or use an async-compatible auth library. usage: blocking for now.
         print("🔄 [QBOClient] Refreshing Access Token...")
         self.auth_client.refresh()
+        forget_access_token(self.connection.realm_id)
         self.connection.access_token = encrypt_token(self.auth_client.access_token)
         self.connection.refresh_token = encrypt_token(self.auth_client.refresh_token)
         self.db.add(self.connection)
         self.db.commit()
         return self.auth_client.access_token
 
+    def _access_token(self) -> str:
+        """Plaintext access token; decrypted once per TTL per realm, not per request."""
+        return decrypt_access_token(self.connection.realm_id, self.connection.access_token)
+
     def _get_api_url(self, endpoint):
         base_url = "https://sandbox-quickbooks.api.intuit.com" if settings.QBO_ENVIRONMENT == "sandbox" else "https://quickbooks.api.intuit.com"
         return f"{base_url}/v3/company/{self.connection.realm_id}/{endpoint}"
@@ -52,7 +86,7 @@ class QBOClient:
         """
         url = self._get_api_url(endpoint)
         headers = {
-            'Authorization': f'Bearer {decrypt_token(self.connection.access_token)}',
+            'Authorization': f'Bearer {self._access_token()}',
             'Accept': 'application/json',
             'Content-Type': 'application/json'
         }
@@ -95,6 +129,55 @@ class QBOClient:
     async def query(self, query_str):
         return await self.request("GET", "query", params={'query': query_str})
 
+    async def stream_query(self, query_str: str, entity: str):
+        """
+        Async generator over the `entity` rows of a query response.
+        Parses the body incrementally with ijson so a full 1000-row page is never
+        materialized at once. Falls back to a buffered parse if ijson is missing.
+        Same 401 refresh / 429 backoff behaviour as request().
+        """
+        url = self._get_api_url("query")
+        headers = {
+            'Authorization': f'Bearer {self._access_token()}',
+            'Accept': 'application/json'
+        }
+        params = {'query': query_str}
+
+        max_retries = 3
+        backoff_factor = 2
+
+        async with httpx.AsyncClient() as client:
+            for attempt in range(max_retries):
+                async with client.stream("GET", url, headers=headers, params=params) as res:
+                    await self._log_tid(res)
+
+                    if res.status_code == 401:
+                        token = self._refresh_access_token()
+                        headers['Authorization'] = f'Bearer {token}'
+                        continue
+
+                    if res.status_code == 429 and attempt < max_retries - 1:
+                        wait_time = backoff_factor ** attempt
+                        print(f"⚠️ QBO Rate Limit (429). Retrying in {wait_time}s...")
+                        await asyncio.sleep(wait_time)
+                        continue
+
+                    if res.is_error:
+                        await res.aread()
+                        tid = res.headers.get('intuit_tid', 'N/A')
+                        print(f"❌ [QBOClient] HTTP Error: {res.text} (TID: {tid})")
+                        res.raise_for_status()
+
+                    if ijson:
+                        reader = _AsyncByteReader(res.aiter_bytes())
+                        async for item in ijson.items_async(reader, f"QueryResponse.{entity}.item", use_float=True):
+                            yield item
+                    else:
+                        data = json.loads(await res.aread())
+                        for item in data.get("QueryResponse", {}).get(entity, []):
+                            yield item
+                    return
+
     async def get_entity(self, entity_id: str, entity_type: str = "Purchase"):
         """Fetches a single entity by ID using the correct endpoint."""
         type_mapping = {
@@ -117,6 +200,18 @@ class QBOClient:
         endpoint = type_mapping.get(entity_type, "purchase")
         return await self.request("GET", f"{endpoint}/{entity_id}")
 
+    async def cdc(self, entities: list[str], changed_since: datetime):
+        """Change Data Capture: every entity of these types changed since changed_since (max 30 days back)."""
+        return await self.request("GET", "cdc", params={
+            "entities": ",".join(entities),
+            "changedSince": changed_since.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        })
+
+    async def batch(self, items: list[dict]) -> list[dict]:
+        """Batch operations (max 30 per call). Each item carries a bId; failed items come back with a Fault."""
+        result = await self.request("POST", "batch", json_payload={"BatchItemRequest": items})
+        return result.get("BatchItemResponse", [])
+
     async def get_purchase(self, purchase_id: str):
         """Fetches a single Purchase entity by ID (Legacy wrapper)."""
         return await self.get_entity(purchase_id, "Purchase")
@@ -340,51 +435,89 @@ class QBOClient:
         customers = result.get("QueryResponse", {}).get("Customer", [])
         return customers[0] if customers else None
 
+    async def find_attachable(self, entity_type: str, entity_id: str, sha256: str) -> Optional[dict]:
+        """An Attachable on the entity whose Note carries this content hash (see upload_attachment_stream)."""
+        query = (
+            f"select * from Attachable where AttachableRef.EntityRef.Type = '{entity_type}' "
+            f"and AttachableRef.EntityRef.value = '{entity_id}'"
+        )
+        result = await self.query(query)
+        for attachable in result.get("QueryResponse", {}).get("Attachable", []):
+            if attachable.get("Note") == f"sha256:{sha256}":
+                return attachable
+        return None
+
     async def upload_attachment(self, file_bytes: bytes, filename: str, content_type: str, attachable_ref: dict = None):
+        """In-memory wrapper around upload_attachment_stream."""
+        async def chunks():
+            yield file_bytes
+        return await self.upload_attachment_stream(chunks, filename, content_type, attachable_ref, size=len(file_bytes))
+
+    async def upload_attachment_stream(self, chunks, filename: str, content_type: str, attachable_ref: dict = None,
+                                       size: int = None, sha256: str = None):
         """
         Uploads a file to QBO 'Attachable' endpoint using multipart/form-data.
         Docs: https://developer.intuit.com/app/developer/qbo/docs/api/accounting/all-entities/attachable#upload-attachments
+
+        chunks: zero-arg callable returning an async iterator of bytes. The multipart
+        body is generated around it, so the file is never buffered; it is called
+        again if the request has to be replayed after a 401.
+        size: content length if known (sent as Content-Length instead of chunked encoding).
+        sha256: stored in the Attachable Note so find_attachable can detect re-uploads.
         """
         endpoint = "upload"
         url = self._get_api_url(endpoint)
-        headers = {
-            'Authorization': f'Bearer {decrypt_token(self.connection.access_token)}',
-            'Accept': 'application/json'
-            # Content-Type is set automatically by httpx for multipart
-        }
         
         # Metadata part (JSON)
         metadata = {
             "ContentType": content_type,
             "FileName": filename
         }
+        if sha256:
+            metadata["Note"] = f"sha256:{sha256}"
         if attachable_ref:
             # Setup linking (e.g. to a Purchase)
             # Structure: "AttachableRef": [{"EntityRef": {"type": "Purchase", "value": "123"}}]
             metadata["AttachableRef"] = [attachable_ref]
 
-        import json
-        
-        # httpx expects 'files' for multipart
-        # QBO requires specific part names: 'file_metadata_01' and 'file_content_01'
-        # httpx expects 'files' for multipart. 
-        # Using a list of tuples to GUARANTEE order: Metadata (file_metadata_01) FIRST, Content SECOND.
-        # QBO is known to be picky about part order.
-        files = [
-            ('file_metadata_01', (None, json.dumps(metadata), 'application/json')),
-            ('file_content_01', (filename, file_bytes, content_type))
-        ]
+        # QBO requires specific part names: 'file_metadata_01' and 'file_content_01',
+        # and is known to be picky about part order: Metadata FIRST, Content SECOND.
+        boundary = uuid.uuid4().hex
+        head = (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="file_metadata_01"\r\n'
+            f"Content-Type: application/json\r\n\r\n"
+            f"{json.dumps(metadata)}\r\n"
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="file_content_01"; filename="{filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        ).encode()
+        tail = f"\r\n--{boundary}--\r\n".encode()
+
+        async def body():
+            yield head
+            async for chunk in chunks():
+                yield chunk
+            yield tail
+
+        headers = {
+            'Authorization': f'Bearer {self._access_token()}',
+            'Accept': 'application/json',
+            'Content-Type': f'multipart/form-data; boundary={boundary}',
+        }
+        if size is not None:
+            headers['Content-Length'] = str(len(head) + size + len(tail))
         
-        print(f"Tb [QBOClient] Uploading attachment: {filename} ({len(file_bytes)} bytes)")
+        print(f"Tb [QBOClient] Uploading attachment: {filename} ({size if size is not None else 'streamed'} bytes)")
         
         async with httpx.AsyncClient() as client:
             try:
-                res = await client.post(url, headers=headers, files=files)
+                res = await client.post(url, headers=headers, content=body())
                 if res.status_code == 401:
                     # Simple refresh retry (blocking)
                     token = self._refresh_access_token()
                     headers['Authorization'] = f'Bearer {token}'
-                    res = await client.post(url, headers=headers, files=files)
+                    res = await client.post(url, headers=headers, content=body())
                 
                 res.raise_for_status()
                 result = res.json()
@@ -405,6 +538,7 @@ class QBOClient:
     def revoke(self):
         try:
             print(f"🔌 [QBOClient] Revoking token...")
+            forget_access_token(self.connection.realm_id)
             self.auth_client.revoke(token=decrypt_token(self.connection.refresh_token))
             return True
         except Exception:
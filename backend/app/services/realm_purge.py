@@ -0,0 +1,152 @@
+"""
+Background purge of a disconnected realm.
+
+disconnect_qbo used to delete transactions, bank accounts and sync logs and
+then the connection in one request-bound transaction, leaving the rest
+(splits, vendors, aliases, rules, ...) to the ON DELETE CASCADE of that last
+statement. On a large realm that is one long transaction holding row locks
+across the biggest tables, and it could time out.
+
+Now the endpoint revokes the tokens, stamps QBOConnection.disconnect_requested_at
+and queues RealmPurge. The purge walks every realm-scoped table in primary
+key order, CHUNK_SIZE rows per statement, one short commit per chunk, and
+deletes the connection row last. Chunk deletes are idempotent, so a purge
+that dies halfway is simply run again (daily_maintenance picks up stamps
+older than STALE_AFTER). A reconnect clears the stamp, which stops a running
+purge at its next chunk.
+"""
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+from sqlalchemy.orm import Session
+
+from app.models.qbo import (
+    BankAccount, Category, ClassificationRule, Customer, LearnedMapping, QBOConnection,
+    RealmCategoryModel, SyncLog, Tag, Transaction, TransactionSplit, Vendor, VendorAlias,
+)
+from app.db.session import mark_realm_changed
+from app.services.progress_bus import ProgressReporter
+
+CHUNK_SIZE = 500
+STALE_AFTER = timedelta(minutes=30)
+
+# Deleted in this order: dependents before the rows they reference
+REALM_TABLES = (
+    VendorAlias, Vendor, Customer, Category, Tag, LearnedMapping,
+    ClassificationRule, RealmCategoryModel, BankAccount, SyncLog,
+)
+
+
+class PurgeCancelled(Exception):
+    pass
+
+
+def pending_purges(db: Session, older_than: timedelta = STALE_AFTER) -> List[str]:
+    """Realms whose purge was requested before older_than and never finished."""
+    cutoff = datetime.now(timezone.utc) - older_than
+    return [realm_id for (realm_id,) in db.query(QBOConnection.realm_id).filter(
+        QBOConnection.disconnect_requested_at.isnot(None),
+        QBOConnection.disconnect_requested_at <= cutoff,
+    )]
+
+
+class RealmPurge:
+    def __init__(self, db: Session, realm_id: str, chunk_size: int = CHUNK_SIZE):
+        self.db = db
+        self.realm_id = realm_id
+        self.chunk_size = chunk_size
+        self.progress = ProgressReporter(realm_id, "disconnect")
+        self.deleted: Dict[str, int] = {}
+
+    def _check_requested(self):
+        requested = self.db.query(QBOConnection.disconnect_requested_at).filter(
+            QBOConnection.realm_id == self.realm_id
+        ).scalar()
+        if requested is None:
+            raise PurgeCancelled(self.realm_id)
+
+    def _chunks(self, pk, *criteria):
+        """Keyset-ordered primary key chunks; each chunk is re-checked against the purge stamp."""
+        last = None
+        while True:
+            self._check_requested()
+            query = self.db.query(pk).filter(*criteria)
+            if last is not None:
+                query = query.filter(pk > last)
+            ids = [row[0] for row in query.order_by(pk).limit(self.chunk_size)]
+            if not ids:
+                return
+            yield ids
+            last = ids[-1]
+
+    def _purge_transactions(self):
+        realm = Transaction.realm_id == self.realm_id
+        # Duplicate links point across chunks; cut them first so any chunk can go
+        for ids in self._chunks(Transaction.id, realm, Transaction.potential_duplicate_id.isnot(None)):
+            self.db.query(Transaction).filter(Transaction.id.in_(ids)).update(
+                {Transaction.potential_duplicate_id: None}, synchronize_session=False)
+            self.db.commit()
+
+        done = 0
+        for ids in self._chunks(Transaction.id, realm):
+            # Local receipt copies (dev / single instance); blobs go with the rows
+            files = [url for (url,) in self.db.query(Transaction.receipt_url).filter(
+                Transaction.id.in_(ids), Transaction.receipt_url.isnot(None))
+                if not url.startswith("http") and os.path.isfile(url)]
+            splits = self.db.query(TransactionSplit).filter(
+                TransactionSplit.transaction_id.in_(ids)).delete(synchronize_session=False)
+            done += self.db.query(Transaction).filter(Transaction.id.in_(ids)).delete(synchronize_session=False)
+            self.db.commit()
+            for path in files:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    print(f"⚠️ [Purge] Could not remove receipt file {path}: {e}")
+            self.deleted["transaction_splits"] = self.deleted.get("transaction_splits", 0) + splits
+            self.deleted["transactions"] = done
+            self.progress.update("transactions", done=done)
+
+    def _purge_table(self, model):
+        pk = model.__table__.primary_key.columns.values()[0]
+        done = 0
+        for ids in self._chunks(pk, model.realm_id == self.realm_id):
+            done += self.db.query(model).filter(pk.in_(ids)).delete(synchronize_session=False)
+            self.db.commit()
+            self.progress.update(model.__tablename__, done=done)
+        self.deleted[model.__tablename__] = done
+
+    def run(self) -> Dict[str, int]:
+        """Deletes everything for the realm, then the connection. Safe to call again after a failure."""
+        try:
+            self._check_requested()
+            mark_realm_changed(self.db, self.realm_id)  # Cached list responses stop being served
+            self.db.commit()
+            self._purge_transactions()
+            for model in REALM_TABLES:
+                self._purge_table(model)
+
+            self._check_requested()
+            self.db.query(QBOConnection).filter(QBOConnection.realm_id == self.realm_id).delete(synchronize_session=False)
+            self.db.commit()
+        except PurgeCancelled:
+            self.db.rollback()
+            print(f"↩️ [Purge] Realm {self.realm_id} was reconnected, purge stopped")
+            self.progress.failed("Reconnected during purge", **self.deleted)
+            return self.deleted
+        except Exception as e:
+            self.db.rollback()
+            self.progress.failed(str(e), **self.deleted)
+            raise
+
+        print(f"🗑️ [Purge] Realm {self.realm_id}: {self.deleted}")
+        self.progress.done("Disconnected from QuickBooks", **self.deleted)
+        return self.deleted
+
+
+def run_purge(realm_id: str) -> Dict[str, int]:
+    """RealmPurge on its own session (Modal job / background task)."""
+    from app.db.session import SessionLocal
+
+    with SessionLocal() as db:
+        return RealmPurge(db, realm_id).run()
@@ -19,6 +19,21 @@ class ReceiptService:
             print(f"❌ AI Receipt Error: {str(e)}")
             raise e
 
+        return self._match_receipt(extracted, file_content)
+
+    async def process_receipt_async(self, file_content: bytes, filename: str, mime_type: str = "image/jpeg"):
+        """
+        Same as process_receipt, but awaits the Gemini call instead of blocking the event loop.
+        """
+        try:
+            extracted = await self.analyzer.process_receipt_async(file_content, mime_type=mime_type)
+        except Exception as e:
+            print(f"❌ AI Receipt Error: {str(e)}")
+            raise e
+
+        return self._match_receipt(extracted, file_content)
+
+    def _match_receipt(self, extracted: dict, file_content: bytes):
         # Find Best Match (Vendor Fuzz + Amount + Date Proximity)
         amount = float(extracted.get('total', 0))
         receipt_date_str = extracted.get('date')
@@ -0,0 +1,159 @@
+"""
+Chunked receipt sources for QBO attachable uploads.
+
+Each source yields the receipt in CHUNK_SIZE pieces, so a large PDF never
+sits in memory whole:
+
+  - BlobReceiptSource: transactions.receipt_content, read with substr() per chunk
+  - FileReceiptSource: a local file (dev / single instance)
+  - HttpReceiptSource: a download from receipt_url, streamed straight through
+
+chunks() can be called again to replay the body, e.g. after a 401 refresh.
+sha256 is known up front for blob and file sources, which lets
+QBOClient.find_attachable skip re-uploading an identical receipt.
+"""
+import asyncio
+import hashlib
+import os
+from typing import AsyncIterator, Optional
+from urllib.parse import urlparse
+
+import httpx
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.qbo import Transaction
+
+CHUNK_SIZE = 256 * 1024
+
+EXTENSION_TYPES = {".pdf": "application/pdf", ".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg"}
+
+
+def _type_from_url(url: Optional[str]):
+    """(extension, content_type) from the URL path, defaulting to JPEG."""
+    if url:
+        _, ext = os.path.splitext(urlparse(url).path)
+        ext = ext.lower()
+        if ext:
+            return ext, EXTENSION_TYPES.get(ext, "image/jpeg")
+    return ".jpg", "image/jpeg"
+
+
+class ReceiptSource:
+    def __init__(self, url: Optional[str] = None):
+        self.extension, self.content_type = _type_from_url(url)
+        self.size: Optional[int] = None
+        self.sha256: Optional[str] = None
+
+    async def prepare(self):
+        """Resolves size / hash / content type before the upload starts."""
+
+    def chunks(self) -> AsyncIterator[bytes]:
+        raise NotImplementedError
+
+    async def aclose(self):
+        pass
+
+
+class BlobReceiptSource(ReceiptSource):
+    def __init__(self, db: Session, tx):
+        super().__init__(tx.receipt_url)
+        self.db = db
+        self.tx_id = tx.id
+        self.realm_id = getattr(tx, "realm_id", None)
+        self.sha256 = tx.receipt_sha256
+
+    def _filter(self, query):
+        query = query.filter(Transaction.id == self.tx_id)
+        return query.filter(Transaction.realm_id == self.realm_id) if self.realm_id else query
+
+    async def prepare(self):
+        self.size = self._filter(self.db.query(func.length(Transaction.receipt_content))).scalar() or 0
+
+    async def chunks(self):
+        # substr() is 1-based and works on bytea (Postgres) and blobs (SQLite)
+        for offset in range(1, self.size + 1, CHUNK_SIZE):
+            chunk = self._filter(self.db.query(func.substr(Transaction.receipt_content, offset, CHUNK_SIZE))).scalar()
+            if not chunk:
+                return
+            yield bytes(chunk)
+
+
+class FileReceiptSource(ReceiptSource):
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.path = path
+
+    async def _read(self):
+        with open(self.path, "rb") as f:
+            while True:
+                chunk = await asyncio.to_thread(f.read, CHUNK_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+
+    async def prepare(self):
+        self.size = os.path.getsize(self.path)
+        digest = hashlib.sha256()
+        async for chunk in self._read():
+            digest.update(chunk)
+        self.sha256 = digest.hexdigest()
+
+    def chunks(self):
+        return self._read()
+
+
+class HttpReceiptSource(ReceiptSource):
+    """The first chunks() call reuses the response opened by prepare(); later calls download again."""
+
+    def __init__(self, url: str):
+        super().__init__(url)
+        self.url = url
+        self._client: Optional[httpx.AsyncClient] = None
+        self._response: Optional[httpx.Response] = None
+
+    async def _open(self) -> httpx.Response:
+        response = await self._client.send(self._client.build_request("GET", self.url), stream=True)
+        if response.is_error:
+            await response.aclose()
+            response.raise_for_status()
+        return response
+
+    async def prepare(self):
+        self._client = httpx.AsyncClient(follow_redirects=True)
+        self._response = await self._open()
+        content_type = self._response.headers.get("content-type")
+        if content_type:
+            self.content_type = content_type.split(";")[0].strip()
+            if "pdf" in content_type: self.extension = ".pdf"
+            elif "png" in content_type: self.extension = ".png"
+            elif "jpeg" in content_type: self.extension = ".jpg"
+        length = self._response.headers.get("content-length")
+        self.size = int(length) if length and length.isdigit() else None
+
+    async def chunks(self):
+        response, self._response = self._response, None
+        if response is None:
+            response = await self._open()
+        try:
+            async for chunk in response.aiter_bytes(CHUNK_SIZE):
+                yield chunk
+        finally:
+            await response.aclose()
+
+    async def aclose(self):
+        if self._response is not None:
+            await self._response.aclose()
+        if self._client is not None:
+            await self._client.aclose()
+
+
+def receipt_source_for(db: Session, tx) -> Optional[ReceiptSource]:
+    """Stored content first (serverless-safe), then a local file, then the receipt URL."""
+    if tx.receipt_sha256:
+        return BlobReceiptSource(db, tx)
+    if tx.receipt_url and os.path.exists(tx.receipt_url):
+        return FileReceiptSource(tx.receipt_url)
+    if tx.receipt_url and tx.receipt_url.startswith("http"):
+        return HttpReceiptSource(tx.receipt_url)
+    return None
@@ -0,0 +1,138 @@
+"""
+Split transactions: validation, category resolution and QBO line payloads.
+
+All split categories are resolved with one Category query per transaction
+(or per batch) instead of one query per split, amounts are checked in cents
+against the transaction total, and the sparse Purchase update is built in a
+single pass. write_batch sends many split updates through QBO's /batch
+endpoint, BATCH_SIZE operations per call.
+"""
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models.qbo import Category, Transaction, TransactionSplit
+
+BATCH_SIZE = 30  # QBO's limit per /batch request
+TOLERANCE = Decimal("0.01")
+
+
+class SplitValidationError(ValueError):
+    pass
+
+
+def _cents(value) -> Decimal:
+    return Decimal(str(value or 0)).quantize(Decimal("0.01"))
+
+
+def resolve_categories(db: Session, realm_id: str, names: Iterable[str]) -> Dict[str, str]:
+    """category name -> id for every name, in one query."""
+    names = {n for n in names if n}
+    if not names:
+        return {}
+    rows = db.query(Category.name, Category.id).filter(Category.realm_id == realm_id, Category.name.in_(names))
+    return {name: category_id for name, category_id in rows}
+
+
+def validate_total(tx: Transaction, amounts: Iterable) -> None:
+    total = sum((_cents(a) for a in amounts), Decimal("0"))
+    if abs(total - _cents(tx.amount)) > TOLERANCE:
+        raise SplitValidationError(f"Split total ({total}) must match transaction amount ({tx.amount})")
+
+
+def build_splits(db: Session, realm_id: str, tx: Transaction, splits: List) -> List[TransactionSplit]:
+    """TransactionSplit rows for the submitted splits (objects with category_name/amount/description)."""
+    validate_total(tx, (s.amount for s in splits))
+    category_ids = resolve_categories(db, realm_id, (s.category_name for s in splits))
+    return [
+        TransactionSplit(
+            transaction_id=tx.id,
+            category_id=category_ids.get(s.category_name),
+            category_name=s.category_name,
+            amount=s.amount,
+            description=s.description or tx.description,
+        )
+        for s in splits
+    ]
+
+
+def build_payload(tx: Transaction, entity_ref: Optional[dict], payment_type: Optional[str],
+                  category_ids: Dict[str, str] = None) -> dict:
+    """
+    Sparse Purchase update replacing the lines with the splits.
+    Splits saved before their category existed locally are resolved through
+    category_ids; TotalAmt and TxnDate are left out to protect the banking data.
+    """
+    splits = list(tx.splits)
+    validate_total(tx, (s.amount for s in splits))
+    category_ids = category_ids or {}
+
+    lines = []
+    for i, split in enumerate(splits, 1):
+        category_id = split.category_id or category_ids.get(split.category_name)
+        if not category_id:
+            raise SplitValidationError(f"Split line {i} missing category")
+        lines.append({
+            "Id": str(i),
+            "Amount": float(split.amount) if split.amount else 0.0,
+            "Description": split.description or tx.description,
+            "DetailType": "AccountBasedExpenseLineDetail",
+            "AccountBasedExpenseLineDetail": {
+                "AccountRef": {"value": category_id, "name": split.category_name}
+            },
+        })
+
+    payload = {
+        "Id": tx.id,
+        "SyncToken": tx.sync_token,
+        "sparse": True,
+        "Line": lines,
+        "PrivateNote": f"Split Transaction | #Accepted {'| Tags: ' + ', '.join(tx.tags) if tx.tags else ''}",
+    }
+    if entity_ref:
+        payload["EntityRef"] = entity_ref
+    if payment_type:
+        payload["PaymentType"] = payment_type
+    return payload
+
+
+def missing_category_names(txs: Iterable[Transaction]) -> set:
+    return {s.category_name for tx in txs for s in tx.splits if not s.category_id and s.category_name}
+
+
+class BatchItemFault(Exception):
+    """A failed /batch item; the message keeps QBO's code so is_stale_error still recognises 5010."""
+
+    def __init__(self, fault: dict):
+        errors = fault.get("Error", [{}])
+        detail = "; ".join(f"{e.get('code', '?')}: {e.get('Message', '')} {e.get('Detail', '')}".strip() for e in errors)
+        super().__init__(f"QBO batch fault ({fault.get('type', 'Fault')}) {detail}")
+        self.fault = fault
+
+
+async def write_batch(client, payloads: Dict[str, dict]) -> Dict[str, object]:
+    """
+    Sends Purchase updates through /batch. Returns tx_id -> updated Purchase,
+    or the exception for that item (BatchItemFault, or the request error for
+    a whole chunk).
+    """
+    results = {}
+    tx_ids = list(payloads)
+    for start in range(0, len(tx_ids), BATCH_SIZE):
+        chunk = tx_ids[start:start + BATCH_SIZE]
+        items = [{"bId": tx_id, "operation": "update", "Purchase": payloads[tx_id]} for tx_id in chunk]
+        try:
+            response = await client.batch(items)
+        except Exception as e:
+            results.update({tx_id: e for tx_id in chunk})
+            continue
+        for item in response:
+            tx_id = item.get("bId")
+            if "Fault" in item:
+                results[tx_id] = BatchItemFault(item["Fault"])
+            else:
+                results[tx_id] = item.get("Purchase", {})
+        for tx_id in chunk:
+            results.setdefault(tx_id, Exception(f"QBO batch returned no result for {tx_id}"))
+    return results
@@ -3,13 +3,20 @@ from sqlalchemy.orm import Session
 from app.models.qbo import Transaction, QBOConnection, Category, Customer, Vendor, SyncLog, BankAccount
 from app.models.user import User
 from app.services.qbo_client import QBOClient
+from app.services.entity_cache import get_entity_cache
 from app.core.feed_logic import FeedLogic
+from app.db.session import mark_realm_changed
+from app.services.progress_bus import ProgressReporter
 
 class SyncService:
+    INGEST_CHUNK_SIZE = 200  # Raw payloads mapped + flushed per round trip
+
     def __init__(self, db: Session, qbo_connection: QBOConnection):
         self.db = db
         self.connection = qbo_connection
         self.client = QBOClient(db, qbo_connection)
+        self._entity_cache = None
+        self.progress = ProgressReporter(qbo_connection.realm_id, "sync")
 
     def _log(self, operation: str, entity_type: str, count: int, status: str, details: dict = None):
         log = SyncLog(
@@ -26,11 +33,21 @@ class SyncService:
     async def sync_all(self):
         """Orchestrates the full sync flow."""
         print(f"🚀 [SyncService] Starting sync for realm: {self.connection.realm_id}")
-        await self.sync_bank_accounts()
-        await self.sync_categories()
-        await self.sync_customers()
-        await self.sync_vendors()
-        await self.sync_transactions()
+        steps = [
+            ("bank_accounts", self.sync_bank_accounts),
+            ("categories", self.sync_categories),
+            ("customers", self.sync_customers),
+            ("vendors", self.sync_vendors),
+            ("transactions", self.sync_transactions),
+        ]
+        try:
+            for i, (stage, step) in enumerate(steps):
+                self.progress.update(stage, done=i, total=len(steps))
+                await step()
+        except Exception as e:
+            self.progress.failed(str(e))
+            raise
+        self.progress.done()
         print(f"✅ [SyncService] Completed sync for realm: {self.connection.realm_id}")
 
     async def sync_bank_accounts(self):
@@ -83,49 +100,17 @@ class SyncService:
             "RefundReceipt", "CreditMemo"
         ]
         
-        all_txs = []
-        
         # Date Filter: Last 365 Days (and future)
         from datetime import timedelta, date
         start_date = (date.today() - timedelta(days=365)).isoformat()
         
-        print(f"🔄 [SyncService] Fetching history since {start_date}...")
-        
-        batch_size = 1000
-        
-        for entity in entity_types:
-            start_pos = 1
-            while True:
-                # Add 'TxnDate' filter
-                query = f"SELECT * FROM {entity} WHERE TxnDate >= '{start_date}' STARTPOSITION {start_pos} MAXRESULTS {batch_size}"
-                try:
-                    res = await self.client.query(query)
-                    batch = res.get("QueryResponse", {}).get(entity, [])
-                    
-                    if not batch: break
-                    
-                    # Tag with source entity
-                    for item in batch:
-                        item["_source_entity"] = entity
-                    
-                    all_txs.extend(batch)
-                    
-                    if len(batch) < batch_size: break
-                    start_pos += len(batch)
-                    
-                except Exception as e:
-                    print(f"⚠️ Error syncing {entity}: {e}")
-                    break
-        
-        print(f"📥 [SyncService] Retrieved {len(all_txs)} raw items from QBO.")
-        
         # [MODIFIED v4.3.2] GLOBAL PURGE: To enforce "Zero Suggestions" policy strictly,
         # we clear any non-history/non-rule suggestions for all unmatched transactions in this realm.
-        from app.models.qbo import Transaction
+        # (Runs before ingestion now that rows are written chunk by chunk while streaming.)
         self.db.query(Transaction).filter(
             Transaction.realm_id == self.connection.realm_id,
             Transaction.status == 'unmatched',
-            Transaction.matching_method.in_(['none', None, 'ai']) # Purge legacy suggestions
+            Transaction.matching_method.in_(['none', None, 'ai', 'local_model']) # Purge legacy suggestions
         ).update({
             "suggested_category_name": None,
             "suggested_category_id": None,
@@ -137,8 +122,53 @@ class SyncService:
             "category_reasoning": None,
             "tax_deduction_note": None
         }, synchronize_session=False)
+        mark_realm_changed(self.db, self.connection.realm_id)  # Bulk UPDATE: not seen by the ORM hooks
         self.db.commit()
         print(f"🧹 [SyncService] Global Suggestion Purge Complete.")
+
+        # Load Vendor/Customer lookups once for the whole batch (was 1-2 queries per tx)
+        self._entity_cache = get_entity_cache(self.db, self.connection.realm_id)
+
+        print(f"🔄 [SyncService] Streaming history since {start_date}...")
+        
+        batch_size = 1000
+        synced_ids = set()
+        valid_count = 0
+        raw_count = 0
+        chunk = []
+        
+        # [v4.4] STREAMING INGEST: Entities are parsed incrementally from each page and
+        # written in fixed-size chunks, so peak memory no longer scales with a year of history.
+        for entity in entity_types:
+            start_pos = 1
+            while True:
+                # Add 'TxnDate' filter
+                query = f"SELECT * FROM {entity} WHERE TxnDate >= '{start_date}' STARTPOSITION {start_pos} MAXRESULTS {batch_size}"
+                page_count = 0
+                try:
+                    async for item in self.client.stream_query(query, entity):
+                        page_count += 1
+                        # Tag with source entity
+                        item["_source_entity"] = entity
+                        chunk.append(item)
+                        
+                        if len(chunk) >= self.INGEST_CHUNK_SIZE:
+                            valid_count += self._ingest_chunk(chunk, active_account_ids, synced_ids)
+                            self.progress.update("transactions", ingested=valid_count, streamed=raw_count + page_count)
+                            chunk = []
+                except Exception as e:
+                    print(f"⚠️ Error syncing {entity}: {e}")
+                    break
+                
+                raw_count += page_count
+                if page_count < batch_size: break
+                start_pos += page_count
+        
+        if chunk:
+            valid_count += self._ingest_chunk(chunk, active_account_ids, synced_ids)
+            chunk = []
+        
+        print(f"📥 [SyncService] Streamed {raw_count} raw items from QBO.")
         
         # [NEW] Report Fallback for Hidden Transfers
         try:
@@ -147,14 +177,34 @@ class SyncService:
             end_date = date.today().isoformat()
             report_txs = await self._fetch_missing_via_report(start_date[:10], end_date, active_account_ids)
             if report_txs:
-                all_txs.extend(report_txs)
+                valid_count += self._ingest_chunk(report_txs, active_account_ids, synced_ids)
         except Exception as e:
             print(f"⚠️ Report Sync Wrapper failed: {e}")
         
-        synced_ids = set()
-        valid_count = 0
+        # Pruning
+        if synced_ids:
+            self.db.query(Transaction).filter(
+                Transaction.realm_id == self.connection.realm_id,
+                Transaction.id.notin_(synced_ids)
+            ).delete(synchronize_session=False)
+            mark_realm_changed(self.db, self.connection.realm_id)
+
+        self.db.commit()
+        self._log("sync", "transaction", valid_count, "success")
+
+    def _ingest_chunk(self, chunk: list, active_account_ids: list, synced_ids: set) -> int:
+        """
+        Maps one chunk of raw QBO payloads onto Transaction rows and flushes them.
+        Existing rows are loaded with a single IN query per chunk.
+        Returns the number of payloads that belonged to an active account.
+        """
+        ids = [str(p["Id"]) for p in chunk if p.get("Id") is not None]
+        existing = {
+            t.id: t for t in self.db.query(Transaction).filter(Transaction.id.in_(ids)).all()
+        } if ids else {}
         
-        for p in all_txs:
+        valid_count = 0
+        for p in chunk:
             acc_id = self._resolve_account_id(p, active_account_ids)
             if not acc_id:
                 # DEBUG: Trace skipped items
@@ -168,11 +218,13 @@ class SyncService:
                 continue
 
             valid_count += 1
-            synced_ids.add(str(p["Id"]))
+            tx_id = str(p["Id"])
+            synced_ids.add(tx_id)
             
-            tx = self.db.query(Transaction).filter(Transaction.id == p["Id"]).first()
+            tx = existing.get(tx_id)
             if not tx:
-                tx = Transaction(id=p["Id"], realm_id=self.connection.realm_id)
+                tx = Transaction(id=tx_id, realm_id=self.connection.realm_id)
+                existing[tx_id] = tx
             
             tx.date = datetime.strptime(p["TxnDate"], "%Y-%m-%d")
             tx.account_id = acc_id
@@ -210,8 +262,9 @@ class SyncService:
                 print(f"🎯 PROCESSING TARGET: ID {tx.id} | Date {tx.date} | Desc {tx.description} | Amt {tx.amount} | Type {tx.transaction_type} | Acc {tx.account_id}")
 
 
-            is_qbo_matched, _ = FeedLogic.analyze(p)
-            tx.is_qbo_matched = is_qbo_matched
+            tx.is_qbo_matched, tx.feed_reason = FeedLogic.analyze(p)
+            for column, value in FeedLogic.signals(p).items():
+                setattr(tx, column, value)
             
             # [MODIFIED v4.3.1] Strict "Zero Suggestions" Policy
             # Every sync/re-sync starts with a clean slate. 
@@ -228,15 +281,9 @@ class SyncService:
 
             self.db.add(tx)
         
-        # Pruning
-        if synced_ids:
-            self.db.query(Transaction).filter(
-                Transaction.realm_id == self.connection.realm_id,
-                Transaction.id.notin_(synced_ids)
-            ).delete(synchronize_session=False)
-
-        self.db.commit()
-        self._log("sync", "transaction", valid_count, "success")
+        # Push the chunk to the DB so the ORM objects (and raw payloads) can be released
+        self.db.flush()
+        return valid_count
 
     def _resolve_account_id(self, p, active_ids):
         # Priority 1: Check standard references
@@ -310,14 +357,12 @@ class SyncService:
             val = ref.get("value")
             
             if val:
-                # Try to look up fully_qualified_name from our DB
-                from app.models.qbo import Vendor, Customer
-                entity = self.db.query(Vendor).filter(Vendor.id == val).first()
-                if not entity:
-                    entity = self.db.query(Customer).filter(Customer.id == val).first()
-                
-                if entity and entity.fully_qualified_name:
-                    return entity.fully_qualified_name
+                # Look up fully_qualified_name from the realm's entity cache
+                if self._entity_cache is None:
+                    self._entity_cache = get_entity_cache(self.db, self.connection.realm_id)
+                fqn = self._entity_cache.fully_qualified_name(val)
+                if fqn:
+                    return fqn
             return name
 
         # Priority 2: Fallback for Transfers/CreditCardPayments (No EntityRef)
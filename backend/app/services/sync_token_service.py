@@ -0,0 +1,137 @@
+"""
+SyncToken freshness for the QBO write-back.
+
+Approvals write first with the SyncToken stored at sync time and only re-read
+on a Stale Object (5010) fault. This keeps those re-reads rare and cheap:
+
+  - refresh_from_cdc: one CDC call refreshes every token changed in QBO since
+    the last transaction sync (sync_approved_batch runs it before large batches)
+  - refresh: `select Id, SyncToken ... where Id in (...)`, one query per entity
+    type and chunk, for all the writes of a batch that went stale together
+  - conflict_stats: per-realm write/conflict counts from the approve SyncLog rows
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import func, update
+from sqlalchemy.orm import Session
+
+from app.db.session import mark_realm_changed
+from app.models.qbo import QBOConnection, SyncLog, Transaction
+
+# transaction_type -> queryable QBO entity (Expense/Check/CreditCard rows are Purchases)
+QUERY_ENTITY = {"Expense": "Purchase", "Check": "Purchase", "CreditCard": "Purchase", "CreditCardCredit": "Purchase"}
+REFRESH_CHUNK_SIZE = 100
+CDC_MAX_AGE = timedelta(days=30)  # QBO rejects older changedSince values
+
+
+def query_entity(transaction_type: Optional[str]) -> str:
+    transaction_type = transaction_type or "Purchase"
+    return QUERY_ENTITY.get(transaction_type, transaction_type)
+
+
+def is_stale_error(e: Exception) -> bool:
+    """QBO answers a write with an outdated SyncToken with a 400 fault, code 5010."""
+    try:
+        if getattr(e, "response", None) is not None:
+            body = e.response.text
+            if "5010" in body or "Stale Object" in body:
+                return True
+    except Exception:
+        pass
+    return "5010" in str(e) or "Stale Object" in str(e)
+
+
+class StaleSyncToken(Exception):
+    """Raised instead of re-reading inline while a batch collects its conflicts."""
+
+    def __init__(self, tx_id: str):
+        super().__init__(f"Stale SyncToken for {tx_id}")
+        self.tx_id = tx_id
+
+
+class SyncTokenService:
+    def __init__(self, db: Session, connection: QBOConnection, client):
+        self.db = db
+        self.connection = connection
+        self.client = client
+
+    def _apply(self, tokens: Dict[str, str]) -> int:
+        """Stores changed tokens; returns how many local rows changed."""
+        if not tokens:
+            return 0
+        current = dict(self.db.query(Transaction.id, Transaction.sync_token).filter(
+            Transaction.realm_id == self.connection.realm_id, Transaction.id.in_(list(tokens))
+        ))
+        changed = [{"id": tx_id, "sync_token": token} for tx_id, token in tokens.items()
+                   if tx_id in current and current[tx_id] != token]
+        if changed:
+            self.db.execute(update(Transaction), changed)  # Executemany by primary key
+            mark_realm_changed(self.db, self.connection.realm_id)
+            self.db.commit()
+        return len(changed)
+
+    def last_transaction_sync(self) -> Optional[datetime]:
+        return self.db.query(func.max(SyncLog.timestamp)).filter(
+            SyncLog.realm_id == self.connection.realm_id,
+            SyncLog.operation == "sync",
+            SyncLog.entity_type == "transaction",
+        ).scalar()
+
+    async def refresh_from_cdc(self, transaction_types: Iterable[str], since: datetime = None) -> int:
+        """One CDC call for the given types since the last sync. Returns the number of tokens updated."""
+        since = since or self.last_transaction_sync()
+        if since is None:
+            return 0
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        if datetime.now(timezone.utc) - since > CDC_MAX_AGE:
+            return 0
+
+        entities = sorted({query_entity(t) for t in transaction_types})
+        data = await self.client.cdc(entities, since)
+        tokens = {}
+        for block in data.get("CDCResponse", []):
+            for response in block.get("QueryResponse", []):
+                for items in response.values():
+                    for item in items if isinstance(items, list) else ():
+                        if item.get("Id") and item.get("SyncToken") is not None:
+                            tokens[item["Id"]] = item["SyncToken"]
+        updated = self._apply(tokens)
+        print(f"🔄 [SyncTokens] CDC since {since.isoformat()}: {len(tokens)} changed in QBO, {updated} local tokens refreshed")
+        return updated
+
+    async def refresh(self, txs: List[Transaction]) -> Dict[str, str]:
+        """Current SyncTokens for txs, read in batched IN queries and stored locally."""
+        by_entity = {}
+        for tx in txs:
+            by_entity.setdefault(query_entity(tx.transaction_type), []).append(tx.id)
+
+        tokens = {}
+        for entity, ids in by_entity.items():
+            for start in range(0, len(ids), REFRESH_CHUNK_SIZE):
+                chunk = ids[start:start + REFRESH_CHUNK_SIZE]
+                quoted = ", ".join("'" + tx_id.replace("'", "\\'") + "'" for tx_id in chunk)
+                result = await self.client.query(f"select Id, SyncToken from {entity} where Id in ({quoted})")
+                for item in result.get("QueryResponse", {}).get(entity, []):
+                    tokens[item["Id"]] = item.get("SyncToken")
+        self._apply(tokens)
+        return tokens
+
+
+def conflict_stats(db: Session, realm_id: str, days: int = 7) -> dict:
+    """Write attempts and 5010 conflicts recorded by ApprovalEffects over the last `days`."""
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    writes = conflicts = 0
+    for (details,) in db.query(SyncLog.details).filter(
+        SyncLog.realm_id == realm_id, SyncLog.operation == "approve", SyncLog.timestamp >= since,
+    ):
+        writes += (details or {}).get("writes", 0)
+        conflicts += (details or {}).get("conflicts", 0)
+    return {
+        "realm_id": realm_id,
+        "days": days,
+        "writes": writes,
+        "conflicts": conflicts,
+        "conflict_rate": round(conflicts / writes, 4) if writes else 0.0,
+    }
@@ -1,49 +1,150 @@
+import uuid
+from dataclasses import dataclass
+from typing import Optional
+from sqlalchemy import select, update, insert
 from sqlalchemy.orm import Session
 from datetime import datetime
-from app.models.user import User
+from app.models.user import User, TokenLedgerEntry
+
+
+@dataclass
+class TokenReservation:
+    """Tokens held for a multi-step (chunked) AI run; settle() refunds what wasn't used."""
+    id: str
+    user_id: str
+    amount: int
+    reason: str
+    settled: bool = False
+
 
 class TokenService:
     def __init__(self, db: Session):
         self.db = db
+        self._pending_ledger = []  # Written in one INSERT at the next commit()
 
     def get_balance(self, user_id: str) -> int:
-        user = self.db.query(User).filter(User.id == user_id).first()
-        if not user:
-            return 0
-        return user.token_balance
+        balance = self.db.execute(select(User.token_balance).where(User.id == user_id)).scalar()
+        return balance or 0
 
     def has_sufficient_tokens(self, user_id: str, cost: int) -> bool:
-        balance = self.get_balance(user_id)
-        return balance >= cost
+        """
+        Advisory check only (e.g. to fail fast before uploading work).
+        Use deduct_tokens/reserve_tokens to actually claim the tokens.
+        """
+        return self.get_balance(user_id) >= cost
+
+    def _try_decrement(self, user_id: str, cost: int) -> Optional[int]:
+        """
+        Atomic conditional decrement. Returns the new balance, or None if the
+        user doesn't exist or can't cover the cost. Concurrent runs can't
+        oversubscribe because the balance check happens inside the UPDATE.
+        """
+        return self.db.execute(
+            update(User)
+            .where(User.id == user_id, User.token_balance >= cost)
+            .values(token_balance=User.token_balance - cost)
+            .returning(User.token_balance)
+        ).scalar()
 
-    def deduct_tokens(self, user_id: str, cost: int, reason: str = "usage") -> bool:
+    def _record(self, user_id: str, delta: int, balance_after: int, entry_type: str,
+                reason: str = None, reservation_id: str = None):
+        self._pending_ledger.append({
+            "user_id": user_id,
+            "delta": delta,
+            "balance_after": balance_after,
+            "entry_type": entry_type,
+            "reason": reason,
+            "reservation_id": reservation_id,
+        })
+
+    def commit(self):
+        """Bulk-writes pending ledger entries and commits the session."""
+        if self._pending_ledger:
+            self.db.execute(insert(TokenLedgerEntry), self._pending_ledger)
+            self._pending_ledger = []
+        self.db.commit()
+
+    def deduct_tokens(self, user_id: str, cost: int, reason: str = "usage", commit: bool = True) -> bool:
         """
         Deducts tokens from user. Returns True if successful, False if insufficient funds.
         """
-        user = self.db.query(User).filter(User.id == user_id).first()
-        if not user or user.token_balance < cost:
+        new_balance = self._try_decrement(user_id, cost)
+        if new_balance is None:
+            self.db.rollback()
             return False
-            
-        user.token_balance -= cost
-        self.db.add(user)
-        self.db.commit()
-        
-        # In a real system, we'd log this transaction to a 'token_ledger' table
-        print(f"💰 Tokens deducted: {cost} for '{reason}'. New Balance: {user.token_balance}")
-        
+
+        self._record(user_id, -cost, new_balance, "deduct", reason)
+        if commit:
+            self.commit()
+
+        print(f"💰 Tokens deducted: {cost} for '{reason}'. New Balance: {new_balance}")
         return True
 
+    def reserve_tokens(self, user_id: str, amount: int, reason: str = "usage",
+                       allow_partial: bool = False) -> Optional[TokenReservation]:
+        """
+        Holds up to `amount` tokens for a chunked run (committed immediately so
+        parallel runs see the reduced balance). With allow_partial, reserves
+        whatever is available if the full amount isn't. Returns None if nothing
+        could be reserved.
+        """
+        for _ in range(3):  # Balance may move between the read and the retry
+            if amount <= 0:
+                return None
+            new_balance = self._try_decrement(user_id, amount)
+            if new_balance is not None:
+                reservation = TokenReservation(str(uuid.uuid4()), user_id, amount, reason)
+                self._record(user_id, -amount, new_balance, "reserve", reason, reservation.id)
+                self.commit()
+                print(f"🎟️ [Token] Reserved {amount} for '{reason}'. New Balance: {new_balance}")
+                return reservation
+            if not allow_partial:
+                break
+            amount = min(amount, self.get_balance(user_id))
+
+        self.db.rollback()
+        return None
+
+    def settle_reservation(self, reservation: TokenReservation, used: int, commit: bool = True) -> int:
+        """
+        Finalizes a reservation, refunding the unused part. Returns the refund.
+        Pass commit=False to fold the refund into the caller's own commit (then call commit()).
+        """
+        if reservation.settled:
+            return 0
+        reservation.settled = True
+
+        refund = reservation.amount - max(0, min(used, reservation.amount))
+        if refund > 0:
+            new_balance = self.db.execute(
+                update(User)
+                .where(User.id == reservation.user_id)
+                .values(token_balance=User.token_balance + refund)
+                .returning(User.token_balance)
+            ).scalar()
+            self._record(reservation.user_id, refund, new_balance, "refund", reservation.reason, reservation.id)
+            print(f"↩️ [Token] Refunded {refund} unused tokens for '{reservation.reason}'.")
+
+        if commit:
+            self.commit()
+        return refund
+
     def refill_tokens(self, user_id: str, amount: int):
         """
         Refills tokens (e.g., monthly reset or purchase).
         Ideally resets to allowance, or adds to it depending on policy.
         Here we implement 'Reset to Allowance' policy for monthly cycles.
         """
-        user = self.db.query(User).filter(User.id == user_id).first()
-        if not user:
+        previous = self.db.execute(
+            select(User.token_balance).where(User.id == user_id).with_for_update()
+        ).scalar()
+        if previous is None:
             return
-            
-        user.token_balance = amount
-        user.last_refill_date = datetime.now()
-        self.db.add(user)
-        self.db.commit()
+
+        self.db.execute(
+            update(User)
+            .where(User.id == user_id)
+            .values(token_balance=amount, last_refill_date=datetime.now())
+        )
+        self._record(user_id, amount - previous, amount, "refill", "refill")
+        self.commit()
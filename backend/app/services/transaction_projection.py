@@ -0,0 +1,114 @@
+"""
+Column projection + orjson encoding for the transaction list.
+
+The list endpoint used to load full ORM rows (raw_json and receipt bytes
+included), validate each through TransactionSchema and encode with the
+default JSON encoder. Here only the schema's columns are selected and the
+row tuples are shaped into plain dicts that orjson encodes directly. The
+output is the same JSON as TransactionSchema produces (see test_transaction_projection).
+"""
+from collections import defaultdict
+from typing import Iterable, List, Optional
+
+import orjson
+from sqlalchemy import select
+
+from app.models.qbo import Transaction, TransactionSplit
+
+# Same fields, same order, as TransactionSchema in endpoints/transactions.py (minus splits)
+LIST_COLUMNS = (
+    Transaction.id, Transaction.date, Transaction.description, Transaction.amount, Transaction.currency,
+    Transaction.transaction_type, Transaction.note, Transaction.tags, Transaction.suggested_tags,
+    Transaction.status, Transaction.suggested_category_id, Transaction.suggested_category_name,
+    Transaction.suggested_payee, Transaction.category_id, Transaction.category_name, Transaction.reasoning,
+    Transaction.vendor_reasoning, Transaction.category_reasoning, Transaction.note_reasoning,
+    Transaction.tax_deduction_note, Transaction.confidence, Transaction.is_qbo_matched, Transaction.is_excluded,
+    Transaction.is_bank_feed_import, Transaction.forced_review, Transaction.is_split, Transaction.payee,
+    Transaction.account_id, Transaction.account_name, Transaction.sync_token, Transaction.matching_method,
+)
+SPLIT_COLUMNS = (
+    TransactionSplit.transaction_id, TransactionSplit.category_name, TransactionSplit.amount,
+    TransactionSplit.description,
+)
+ORJSON_OPTIONS = orjson.OPT_UTC_Z  # pydantic writes UTC as "Z"
+
+
+def list_statement(realm_id: str, *criteria):
+    return select(*LIST_COLUMNS).where(Transaction.realm_id == realm_id, *criteria)
+
+
+def splits_statement(realm_id: str, *criteria):
+    """Splits of every transaction the list statement selects, in one query (no IN list of ids)."""
+    return (
+        select(*SPLIT_COLUMNS)
+        .join(Transaction, Transaction.id == TransactionSplit.transaction_id)
+        .where(Transaction.realm_id == realm_id, *criteria)
+    )
+
+
+def _float(value) -> Optional[float]:
+    return float(value) if value is not None else None
+
+
+def project_row(row, splits: list = ()) -> dict:
+    """One LIST_COLUMNS row tuple -> the dict TransactionSchema would serialize."""
+    (tx_id, date, description, amount, currency, transaction_type, note, tags, suggested_tags, status,
+     suggested_category_id, suggested_category_name, suggested_payee, category_id, category_name, reasoning,
+     vendor_reasoning, category_reasoning, note_reasoning, tax_deduction_note, confidence, is_qbo_matched,
+     is_excluded, is_bank_feed_import, forced_review, is_split, payee, account_id, account_name, sync_token,
+     matching_method) = row
+    return {
+        "id": tx_id,
+        "date": date,
+        "description": description,
+        "amount": _float(amount),
+        "currency": currency,
+        "transaction_type": transaction_type,
+        "note": note,
+        "tags": tags or [],
+        "suggested_tags": suggested_tags or [],
+        "status": status,
+        "suggested_category_id": suggested_category_id,
+        "suggested_category_name": suggested_category_name,
+        "suggested_payee": suggested_payee,
+        "category_id": category_id,
+        "category_name": category_name,
+        "reasoning": reasoning,
+        "vendor_reasoning": vendor_reasoning,
+        "category_reasoning": category_reasoning,
+        "note_reasoning": note_reasoning,
+        "tax_deduction_note": tax_deduction_note,
+        "confidence": _float(confidence),
+        "is_qbo_matched": bool(is_qbo_matched),
+        "is_excluded": bool(is_excluded),
+        "is_bank_feed_import": True if is_bank_feed_import is None else bool(is_bank_feed_import),
+        "forced_review": bool(forced_review),
+        "is_split": bool(is_split),
+        "splits": list(splits),
+        "payee": payee,
+        "account_id": account_id,
+        "account_name": account_name,
+        "sync_token": sync_token,
+        "matching_method": matching_method,
+    }
+
+
+def group_splits(split_rows: Iterable) -> dict:
+    """transaction_id -> [SplitSchema-shaped dicts]"""
+    grouped = defaultdict(list)
+    for tx_id, category_name, amount, description in split_rows:
+        grouped[tx_id].append({"category_name": category_name, "amount": _float(amount), "description": description})
+    return grouped
+
+
+def project_rows(rows: Iterable, split_rows: Iterable = ()) -> List[dict]:
+    splits = group_splits(split_rows)
+    return [project_row(row, splits.get(row[0], ())) for row in rows]
+
+
+def dumps(payload) -> bytes:
+    return orjson.dumps(payload, option=ORJSON_OPTIONS)
+
+
+def dumps_ndjson_line(row: dict) -> bytes:
+    return orjson.dumps(row, option=ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE)
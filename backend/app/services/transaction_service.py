@@ -1,16 +1,54 @@
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
 from sqlalchemy.orm import Session
 
 from app.models.qbo import Transaction, QBOConnection, Category, Customer, Vendor, SyncLog, TransactionSplit, BankAccount, Tag
 from app.models.user import User
 from app.services.qbo_client import QBOClient
+from app.services.entity_cache import get_entity_cache
+from app.services.progress_bus import ProgressReporter
+from app.services.approval_effects import ApprovalEffects
+from app.services.sync_token_service import SyncTokenService, StaleSyncToken, is_stale_error
+from app.services import split_engine
+from app.core.config import settings
 import uuid
 
+# Active bank account limit per subscription tier
+ACCOUNT_LIMITS = {
+    "free": 1,
+    "free_user": 1,
+    "personal": 2,
+    "business": 100,
+    "corporate": 1000,
+    # Legacy keys
+    "starter": 1,
+    "pro": 5,
+    "founder": 100,
+    "empire": 1000
+}
+
 class TransactionService:
     def __init__(self, db: Session, qbo_connection: QBOConnection):
         self.db = db
         self.connection = qbo_connection
         self.client = QBOClient(db, qbo_connection)
+        self._entity_cache = None
+        self._effects = None  # Open ApprovalEffects batch, see approval_batch()
+        self._defer_conflicts = False  # Raise StaleSyncToken instead of re-reading inline (batch first pass)
+
+    @property
+    def tokens(self) -> SyncTokenService:
+        return SyncTokenService(self.db, self.connection, self.client)
+
+    def _record_write(self):
+        if self._effects is not None:
+            self._effects.writes += 1
+
+    def _record_conflict(self, tx):
+        if self._effects is not None:
+            self._effects.conflicts += 1
+        if self._defer_conflicts:
+            raise StaleSyncToken(tx.id)
 
     async def sync_bank_accounts(self):
         """Shim to call SyncService until qbo.py is refactored."""
@@ -28,22 +66,9 @@ class TransactionService:
         user = self.db.query(User).filter(User.id == self.connection.user_id).first()
         if not user:
             return 1
-        
-        limits = {
-            "free": 1,
-            "free_user": 1,
-            "personal": 2,
-            "business": 100,
-            "corporate": 1000,
-            # Legacy keys
-            "starter": 1,
-            "pro": 5,
-            "founder": 100,
-            "empire": 1000
-        }
-        return limits.get(user.subscription_tier, 1)
+        return ACCOUNT_LIMITS.get(user.subscription_tier, 1)
 
-    def _log(self, operation: str, entity_type: str, count: int, status: str, details: dict = None):
+    def _log(self, operation: str, entity_type: str, count: int, status: str, details: dict = None, commit: bool = True):
         log = SyncLog(
             realm_id=self.connection.realm_id,
             operation=operation,
@@ -53,7 +78,8 @@ class TransactionService:
             details=details
         )
         self.db.add(log)
-        self.db.commit()
+        if commit:
+            self.db.commit()
 
     async def approve_transaction(self, tx_id: str, optimistic: bool = True):
         """
@@ -82,10 +108,91 @@ class TransactionService:
         print(f"🚀 [Approve] Transaction {tx_id} marked as 'pending_qbo'. Returning optimistically.")
         return {"status": "success", "message": "Transaction queued for approval", "tx_id": tx_id}
 
+    @asynccontextmanager
+    async def approval_batch(self):
+        """
+        Groups sync_approved_to_qbo calls so their side effects (receipts,
+        SyncLog, XP) are applied once, after the last approval. Nested batches
+        join the outer one.
+        """
+        if self._effects is not None:
+            yield self._effects
+            return
+        self._effects = ApprovalEffects(self)
+        try:
+            yield self._effects
+        finally:
+            effects, self._effects = self._effects, None
+            await effects.flush()
+
     async def sync_approved_to_qbo(self, tx_id: str):
         """
         Backgroundable method to actually push an approved transaction to QBO.
+        Outside an approval_batch, side effects are flushed before returning.
+        """
+        async with self.approval_batch() as effects:
+            return await self._sync_approved_to_qbo(tx_id, effects)
+
+    async def sync_approved_batch(self, tx_ids: list[str]):
         """
+        Pushes already-queued approvals to QBO, flushing side effects once for the batch.
+        Split approvals are written together through QBO /batch.
+
+        Writes go out with the stored SyncTokens (refreshed from CDC first when
+        the batch is large). Approvals that hit a stale token are not re-read
+        one by one: their tokens are fetched together afterwards and only those
+        approvals are written again.
+        """
+        results = {}
+        async with self.approval_batch() as effects:
+            if len(tx_ids) >= settings.SYNC_TOKEN_CDC_MIN_BATCH:
+                try:
+                    types = [t for (t,) in self.db.query(Transaction.transaction_type).filter(
+                        Transaction.realm_id == self.connection.realm_id, Transaction.id.in_(tx_ids)
+                    ).distinct()]
+                    await self.tokens.refresh_from_cdc(types)
+                except Exception as e:
+                    print(f"⚠️ [SyncTokens] CDC refresh failed, writing with stored tokens: {e}")
+
+            stale = []
+            self._defer_conflicts = True
+            try:
+                try:
+                    written = await self._write_splits_batch(tx_ids)
+                except Exception as e:
+                    print(f"⚠️ [SyncToQBO] Split batch write failed, writing splits one by one: {e}")
+                    written = {}
+                for tx_id in tx_ids:
+                    try:
+                        result = await self._sync_approved_to_qbo(tx_id, effects, written.get(tx_id))
+                        results[tx_id] = {"id": tx_id, "status": "success", "result": result}
+                    except StaleSyncToken:
+                        stale.append(tx_id)
+                    except Exception as e:
+                        results[tx_id] = {"id": tx_id, "status": "error", "message": str(e)}
+            finally:
+                self._defer_conflicts = False
+
+            if stale:
+                print(f"🔄 [SyncTokens] {len(stale)}/{len(tx_ids)} approvals hit stale SyncTokens. Re-reading in batch...")
+                txs = self.db.query(Transaction).filter(
+                    Transaction.realm_id == self.connection.realm_id, Transaction.id.in_(stale)
+                ).all()
+                try:
+                    fresh = await self.tokens.refresh(txs)
+                    for tx in txs:
+                        if tx.id in fresh:
+                            tx.sync_token = fresh[tx.id]
+                except Exception as e:
+                    print(f"⚠️ [SyncTokens] Batched re-read failed, retrying one by one: {e}")
+                for tx_id in stale:
+                    try:
+                        results[tx_id] = {"id": tx_id, "status": "success", "result": await self.sync_approved_to_qbo(tx_id)}
+                    except Exception as e:
+                        results[tx_id] = {"id": tx_id, "status": "error", "message": str(e)}
+        return [results[tx_id] for tx_id in tx_ids]
+
+    async def _sync_approved_to_qbo(self, tx_id: str, effects: ApprovalEffects, written=None):
         tx = self.db.query(Transaction).filter(
             Transaction.id == tx_id,
             Transaction.realm_id == self.connection.realm_id
@@ -98,53 +205,60 @@ class TransactionService:
         try:
             if tx.is_split and tx.splits:
                 print(f"✂️ [SyncToQBO] Processing SPLIT transaction {tx.id}...")
-                await self._update_qbo_split_transaction(tx)
+                if written is not None:
+                    updated = await self._apply_split_write(tx, written)
+                else:
+                    updated = await self._update_qbo_split_transaction(tx)
             else:
                 print(f"🏷️ [SyncToQBO] Processing standard transaction {tx.id}...")
-                await self._update_qbo_transaction(tx)
+                updated = await self._update_qbo_transaction(tx)
             
-            # Post-Process: Upload Receipt (if any)
-            await self._upload_receipt(tx)
+            # Post-Process: Upload Receipt (if any), in the background
+            effects.upload_receipt(tx)
             
-            # Cleanup amount if was 0
+            # Cleanup amount if was 0: the write response usually has it, else re-read at flush
             if not tx.amount or tx.amount == 0:
-                try:
-                    qbo_tx = await self.client.get_purchase(tx.id)
-                    purchase_data = qbo_tx.get("Purchase", {})
-                    real_amount = purchase_data.get("TotalAmt")
-                    if real_amount:
-                        tx.amount = real_amount
-                except Exception as e:
-                    print(f"⚠️ [SyncToQBO] Failed to fetch amount: {e}")
+                real_amount = updated.get("TotalAmt") if isinstance(updated, dict) else None
+                if real_amount:
+                    tx.amount = real_amount
+                else:
+                    effects.refresh_amount(tx.id)
 
             # Final success state
             tx.status = 'approved'
             tx.is_qbo_matched = True
             self.db.add(tx)
+
+            # Teach the history index (same commit as the approval)
+            if not tx.is_split:
+                try:
+                    from app.services.learned_mapping_service import LearnedMappingIndex
+                    with self.db.begin_nested():  # A failure here must not roll back the approval
+                        LearnedMappingIndex(self.db, self.connection.realm_id).learn(
+                            tx.description,
+                            tx.category_id or tx.suggested_category_id,
+                            tx.category_name or tx.suggested_category_name,
+                        )
+                except Exception as lx:
+                    print(f"⚠️ [LearnedMappings] Failed to record approval: {lx}")
+
+            is_split = tx.is_split
             self.db.commit()
-            
-            self._log("approve", "transaction", 1, "success", {"tx_id": tx_id, "is_split": tx.is_split})
-            
-            # [Gamification] Award XP for Categorization
-            try:
-                from app.services.gamification_service import GamificationService
-                gs = GamificationService(self.db)
-                # "categorize" action yields 10 XP
-                xp_result = gs.add_xp(self.connection.user_id, "categorize", {"tx_id": tx_id})
-                print(f"🎮 [Gamification] {self.connection.user_id} gained XP: {xp_result}")
-            except Exception as gx:
-                print(f"⚠️ [Gamification] Failed to award XP: {gx}")
+            effects.record_success(tx_id, is_split)
 
+            # "categorize" action yields 10 XP, awarded when the batch flushes
             return {"status": "success", "message": "Transaction synchronized with QuickBooks", "xp_earned": 10}
 
 
+        except StaleSyncToken:
+            raise  # Still pending_qbo; sync_approved_batch retries it with a fresh token
         except Exception as e:
             print(f"❌ [SyncToQBO] Write-Back Failed: {e}")
             tx.status = 'error_qbo'
             tx.reasoning = f"QBO Sync Failed: {str(e)}"
             self.db.add(tx)
             self.db.commit()
-            self._log("approve", "transaction", 1, "error", {"tx_id": tx_id, "error": str(e)})
+            effects.record_failure(tx_id, str(e))
             raise e
 
     async def _update_qbo_transaction(self, tx):
@@ -208,6 +322,7 @@ class TransactionService:
                 print(f"🛡️ [Approve] Skipping line update for existing transaction {tx.id} to preserve original ledger structure.")
                 skip_line_update = True
 
+            self._record_write()
             updated = await self.client.update_purchase(
                 purchase_id=tx.id,
                 category_id=cat_id if not skip_line_update else None,
@@ -227,42 +342,14 @@ class TransactionService:
                 from_account_ref=tx.raw_json.get("FromAccountRef") if tx.raw_json else None
             )
         except Exception as e:
-            # Check for Stale Object Error (5010)
-            # Typically QBO returns validation fault 400 with code 5010 inside response body
-            is_stale = False
-            try:
-                if hasattr(e, "response") and e.response is not None:
-                    # Check the response text directly
-                    err_body = e.response.text
-                    if "5010" in err_body or "Stale Object" in err_body:
-                        is_stale = True
-            except:
-                pass
-            
-            if not is_stale and ("5010" in str(e) or "Stale Object" in str(e)):
-                is_stale = True
-
-            if is_stale:
+            if is_stale_error(e):
+                self._record_conflict(tx)
                 print(f"⚠️ [TransactionService] Stale Object detected for {tx.id}. Retrying with fresh SyncToken...")
-                # Fetch fresh entity using the specific type
-                fresh_res = await self.client.get_entity(tx.id, tx.transaction_type or "Purchase")
-                
-                # Extract object from wrapper (QBO returns { "Purchase": { ... } })
-                # But sometimes it's flattened or has a different key.
-                entity_key = tx.transaction_type or "Purchase"
-                if tx.transaction_type == "Expense": entity_key = "Purchase" # QBO mapping
-                
-                fresh_obj = fresh_res.get(entity_key)
-                if not fresh_obj:
-                    # Try to find any key that might be the object
-                    for k, v in fresh_res.items():
-                        if isinstance(v, dict) and "SyncToken" in v:
-                            fresh_obj = v
-                            break
-
-                if fresh_obj:
-                    new_token = fresh_obj.get("SyncToken")
+                new_token = (await self.tokens.refresh([tx])).get(tx.id)
+
+                if new_token is not None:
                     print(f"🔄 [TransactionService] Retry with SyncToken: {new_token}")
+                    self._record_write()
                     updated = await self.client.update_purchase(
                         purchase_id=tx.id,
                         category_id=cat_id,
@@ -299,35 +386,14 @@ class TransactionService:
                 if is_not_found:
                     print(f"🛡️ [Guardian] Transaction {tx.id} is GHOSTED in QBO (Object Not Found). Hunting for replacement...")
                     
-                    # 1. Search for replacement in QBO
-                    # Range: +/- 3 days? Or just match Amount exactly?
-                    # Let's try exact Amount for now since date might shift slightly on posting.
-                    query = f"select * from Purchase where TotalAmt = '{tx.amount}'"
-                    result = await self.client.query(query)
-                    candidates = result.get("QueryResponse", {}).get("Purchase", [])
-                    
-                    # Filter candidates by Date (strict +/- 4 days)
-                    from datetime import timedelta
-                    target_date = tx.date.date()
-                    found_replacement = None
-                    
-                    for cand in candidates:
-                        # Parse QBO date (YYYY-MM-DD)
-                        # Minimal parsing
-                        c_date_str = cand.get("TxnDate")
-                        if not c_date_str: continue
-                        
-                        y, m, d = map(int, c_date_str.split('-'))
-                        c_date = datetime(y, m, d).date()
-                        
-                        diff = abs((c_date - target_date).days)
-                        if diff <= 4:
-                            found_replacement = cand
-                            break
+                    # 1. Closest same-type entity with the same amount within +/- 4 days:
+                    #    local mirror first, then a TxnDate-bounded QBO query
+                    from app.services.ghost_finder import GhostFinder
+                    found_replacement = await GhostFinder(self.db, self.connection, self.client).find(tx)
 
                     if found_replacement:
                         new_id = found_replacement["Id"]
-                        print(f"✅ [Guardian] Found Replacement: {new_id} (Date: {found_replacement['TxnDate']}). Heal/Swizzle...")
+                        print(f"✅ [Guardian] Found Replacement: {new_id} (Date: {found_replacement['TxnDate']}, via {found_replacement['source']}). Heal/Swizzle...")
                         
                         # DELETE any existing local transaction that might have the new ID (to avoid PK collision)
                         existing_new = self.db.query(Transaction).filter(
@@ -363,6 +429,7 @@ class TransactionService:
                         print(f"🔄 [Guardian] Retry update with NEW ID: {tx.id}")
                         
                         # Recursive retry
+                        self._record_write()
                         updated = await self.client.update_purchase(
                             purchase_id=tx.id,
                             category_id=cat_id,
@@ -394,106 +461,149 @@ class TransactionService:
 
         return updated
 
+    async def _split_payload(self, tx, category_ids: dict = None):
+        entity_ref = await self._resolve_entity_ref(tx.payee, tx.transaction_type)
+        payment_type = tx.raw_json.get("PaymentType") if tx.raw_json else None
+        if category_ids is None:
+            category_ids = split_engine.resolve_categories(
+                self.db, self.connection.realm_id, split_engine.missing_category_names([tx])
+            )
+        return split_engine.build_payload(tx, entity_ref, payment_type, category_ids)
+
     async def _update_qbo_split_transaction(self, tx):
         """
         Helper: Writes a split transaction (multiple lines) to QBO.
         """
-        entity_ref = await self._resolve_entity_ref(tx.payee, tx.transaction_type)
-        payment_type = tx.raw_json.get("PaymentType") if tx.raw_json else None
+        payload = await self._split_payload(tx)
 
-        # Build Line items for QBO
-        lines = []
-        for i, split in enumerate(tx.splits, 1):
-            if not split.category_id:
-                raise ValueError(f"Split line {i} missing category")
-            
-            lines.append({
-                "Id": str(i),
-                "Amount": float(split.amount) if split.amount else 0.0,
-                "Description": split.description or tx.description,
-                "DetailType": "AccountBasedExpenseLineDetail",
-                "AccountBasedExpenseLineDetail": {
-                    "AccountRef": {
-                        "value": split.category_id,
-                        "name": split.category_name
-                    }
-                }
-            })
-
-        payload = {
-            "Id": tx.id,
-            "SyncToken": tx.sync_token,
-            "sparse": True,
-            "Line": lines,
-            "PrivateNote": f"Split Transaction | #Accepted {'| Tags: ' + ', '.join(tx.tags) if tx.tags else ''}"
-        }
-        
-        # TotalAmt and TxnDate EXCLUDED to protect original banking data.
-        
-        if entity_ref:
-            payload["EntityRef"] = entity_ref
-        if payment_type:
-            payload["PaymentType"] = payment_type
-
-        print(f"📝 [TransactionService] Updating split Purchase {tx.id} with {len(lines)} lines")
-        result = await self.client.request("POST", "purchase", json_payload=payload)
+        print(f"📝 [TransactionService] Updating split Purchase {tx.id} with {len(payload['Line'])} lines")
+        self._record_write()
+        try:
+            result = await self.client.request("POST", "purchase", json_payload=payload)
+        except Exception as e:
+            if not is_stale_error(e):
+                raise
+            self._record_conflict(tx)
+            new_token = (await self.tokens.refresh([tx])).get(tx.id)
+            if new_token is None:
+                raise
+            print(f"🔄 [TransactionService] Retry split with SyncToken: {new_token}")
+            payload["SyncToken"] = new_token
+            self._record_write()
+            result = await self.client.request("POST", "purchase", json_payload=payload)
         updated = result.get("Purchase", {})
         
         if updated.get("SyncToken"):
             tx.sync_token = updated.get("SyncToken")
         return updated
 
+    async def _write_splits_batch(self, tx_ids: list[str]) -> dict:
+        """
+        Sends the split approvals among tx_ids through QBO /batch.
+        Returns tx_id -> updated Purchase or the exception for that item.
+        """
+        txs = self.db.query(Transaction).filter(
+            Transaction.realm_id == self.connection.realm_id,
+            Transaction.id.in_(tx_ids),
+            Transaction.status == 'pending_qbo',
+        ).all()
+        txs = [tx for tx in txs if tx.is_split and tx.splits]
+        if not txs:
+            return {}
+
+        # One category query for every split in the batch
+        category_ids = split_engine.resolve_categories(
+            self.db, self.connection.realm_id, split_engine.missing_category_names(txs)
+        )
+        written, payloads = {}, {}
+        for tx in txs:
+            try:
+                payloads[tx.id] = await self._split_payload(tx, category_ids)
+            except Exception as e:
+                written[tx.id] = e
+        if payloads:
+            print(f"📝 [TransactionService] Updating {len(payloads)} split Purchases via batch")
+            for _ in payloads:
+                self._record_write()
+            written.update(await split_engine.write_batch(self.client, payloads))
+        return written
+
+    async def _apply_split_write(self, tx, written):
+        """Result of a batched split write; stale tokens go through the same conflict path as single writes."""
+        if isinstance(written, Exception):
+            if not is_stale_error(written):
+                raise written
+            self._record_conflict(tx)  # Raises StaleSyncToken in the batch first pass
+            return await self._update_qbo_split_transaction(tx)
+        if written.get("SyncToken"):
+            tx.sync_token = written.get("SyncToken")
+        return written
+
+    def _get_entity_cache(self):
+        """Entity lookups are loaded once per service instance (one approval batch)."""
+        if self._entity_cache is None:
+            self._entity_cache = get_entity_cache(self.db, self.connection.realm_id)
+        return self._entity_cache
+
     async def _resolve_entity_ref(self, payee_name, transaction_type="Purchase"):
         if not payee_name:
             return None
+
+        entities = self._get_entity_cache()
             
         # strategy: if Customer-facing type, look for Customer first. Else Vendor.
         is_customer_type = transaction_type in ["Payment", "SalesReceipt", "RefundReceipt", "CreditMemo"]
         
         if is_customer_type:
-            # Check DB Customer
-            customer = self.db.query(Customer).filter(
-                Customer.display_name == payee_name,
-                Customer.realm_id == self.connection.realm_id
-            ).first()
-            if customer: return {"value": customer.id, "name": customer.display_name}
+            # Check local Customer (cached)
+            customer_ref = entities.customer_ref(payee_name)
+            if customer_ref: return customer_ref
             
-            # Check QBO Customer
+            # Check QBO Customer (skip if it recently came back empty)
+            if entities.is_known_missing("customer", payee_name):
+                return None
             remote_c = await self.client.get_customer_by_name(payee_name)
             if remote_c:
                 # Cache it
                 cust = Customer(id=remote_c["Id"], realm_id=self.connection.realm_id, display_name=payee_name)
                 self.db.add(cust)
                 self.db.commit()
+                entities.add_customer(remote_c["Id"], payee_name, remote_c.get("FullyQualifiedName"))
                 return {"value": remote_c["Id"], "name": payee_name}
+            entities.mark_missing("customer", payee_name)
                 
             # Create Customer logic could go here if we wanted to auto-create customers, 
             # but usually for Payments the customer MUST exist. 
             # Failure fallback: maybe it IS a vendor? (Unlikely for Payment endpoint)
             return None 
 
-        # Default Vendor Logic
-        vendor = self.db.query(Vendor).filter(
-            Vendor.display_name == payee_name,
-            Vendor.realm_id == self.connection.realm_id
-        ).first()
-        
-        if vendor:
-            return {"value": vendor.id, "name": vendor.display_name}
+        # Default Vendor Logic (cached)
+        vendor_ref = entities.vendor_ref(payee_name)
+        if vendor_ref:
+            return vendor_ref
             
-        # Try QBO Vendor
-        remote_v = await self.client.get_vendor_by_name(payee_name)
-        if remote_v:
-            vendor = Vendor(id=remote_v["Id"], realm_id=self.connection.realm_id, display_name=payee_name)
-            self.db.add(vendor)
-            self.db.commit()
-            return {"value": remote_v["Id"], "name": payee_name}
+        # Try QBO Vendor (negative answers are cached for a short TTL)
+        if not entities.is_known_missing("vendor", payee_name):
+            remote_v = await self.client.get_vendor_by_name(payee_name)
+            if remote_v:
+                vendor = Vendor(id=remote_v["Id"], realm_id=self.connection.realm_id, display_name=payee_name)
+                self.db.add(vendor)
+                self.db.commit()
+                entities.add_vendor(remote_v["Id"], payee_name, remote_v.get("FullyQualifiedName"))
+                return {"value": remote_v["Id"], "name": payee_name}
+            entities.mark_missing("vendor", payee_name)
 
         # Check QBO Customer as fallback (sometimes people pay Vendors via Check)
-        remote_c = await self.client.get_customer_by_name(payee_name)
-        if remote_c:
-             # It's actually a customer
-            return {"value": remote_c["Id"], "name": payee_name}
+        customer_ref = entities.customer_ref(payee_name)
+        if customer_ref:
+            return customer_ref
+        if not entities.is_known_missing("customer", payee_name):
+            remote_c = await self.client.get_customer_by_name(payee_name)
+            if remote_c:
+                 # It's actually a customer
+                entities.add_customer(remote_c["Id"], payee_name, remote_c.get("FullyQualifiedName"))
+                return {"value": remote_c["Id"], "name": payee_name}
+            entities.mark_missing("customer", payee_name)
             
         # Create new Vendor
         try:
@@ -501,6 +611,7 @@ class TransactionService:
             vendor = Vendor(id=new_v["Id"], realm_id=self.connection.realm_id, display_name=payee_name)
             self.db.add(vendor)
             self.db.commit()
+            entities.add_vendor(new_v["Id"], payee_name, new_v.get("FullyQualifiedName"))
             return {"value": new_v["Id"], "name": payee_name}
         except Exception as e:
             print(f"⚠️ Failed to create vendor {payee_name}: {e}")
@@ -508,13 +619,19 @@ class TransactionService:
             return None
 
     async def bulk_approve(self, tx_ids: list[str]):
+        progress = ProgressReporter(self.connection.realm_id, "bulk_approve")
         results = []
-        for tx_id in tx_ids:
+        approved = failed = 0
+        for i, tx_id in enumerate(tx_ids):
             try:
                 await self.approve_transaction(tx_id)
                 results.append({"id": tx_id, "status": "success"})
+                approved += 1
             except Exception as e:
                 results.append({"id": tx_id, "status": "error", "message": str(e)})
+                failed += 1
+            progress.update("approving", done=i + 1, total=len(tx_ids), approved=approved, failed=failed)
+        progress.done(approved=approved, failed=failed)
         return results
 
     def _map_to_qbo_attachable_type(self, transaction_type: str) -> str:
@@ -550,83 +667,49 @@ class TransactionService:
 
     async def _upload_receipt(self, tx):
         """
-        Uploads an associated receipt to QBO.
-        Prefers binary content from DB (serverless-safe), fallbacks to local file or URL download.
-        Correctly detects content-type and filename from URL extension.
+        Streams an associated receipt to a QBO Attachable on the transaction.
+        Prefers the content stored in the DB (serverless-safe), falls back to a
+        local file or URL download (see receipt_stream). Skips the upload when
+        the entity already has an attachable with the same content hash.
         """
-        if not tx.receipt_url and not tx.receipt_content:
+        from app.services.receipt_stream import receipt_source_for
+
+        source = receipt_source_for(self.db, tx)
+        if source is None:
             return
 
-        print(f"📎 [Approve] Found Receipt for {tx.id}. Preparing attachment...")
+        print(f"📎 [Approve] Found Receipt for {tx.id}. Preparing attachment ({type(source).__name__})...")
         try:
-            import httpx
-            import os
-            from urllib.parse import urlparse
-
-            file_bytes = None
-            ct = "image/jpeg"
-            ext = ".jpg"
-
-            # 0. Pre-detect extension and content-type from URL path
-            if tx.receipt_url:
-                parsed_url = urlparse(tx.receipt_url)
-                _, url_ext = os.path.splitext(parsed_url.path)
-                if url_ext:
-                    url_ext = url_ext.lower()
-                    ext = url_ext
-                    if url_ext == ".pdf": ct = "application/pdf"
-                    elif url_ext == ".png": ct = "image/png"
-                    elif url_ext in [".jpg", ".jpeg"]: ct = "image/jpeg"
-
-            filename = f"Receipt-{tx.date.strftime('%Y-%m-%d')}-{tx.id[:8]}{ext}"
-
-            # 1. Prefer Binary Persistence (Serverless-Safe)
-            if tx.receipt_content:
-                print(f"📦 [Approve] Using binary receipt content from DB for {tx.id}")
-                file_bytes = tx.receipt_content
-
-            # 2. Check local file (Local Dev / Single instance)
-            elif tx.receipt_url and os.path.exists(tx.receipt_url):
-                print(f"📂 [Approve] Reading local receipt file: {tx.receipt_url}")
-                with open(tx.receipt_url, "rb") as f:
-                    file_bytes = f.read()
-
-            # 3. Fallback to URL download (External Storage)
-            elif tx.receipt_url and tx.receipt_url.startswith("http"):
-                print(f"🌐 [Approve] Downloading receipt from URL: {tx.receipt_url}")
-                async with httpx.AsyncClient() as dl_client:
-                    r = await dl_client.get(tx.receipt_url)
-                    r.raise_for_status()
-                    file_bytes = r.content
-
-                    dl_ct = r.headers.get("content-type")
-                    if dl_ct: 
-                        ct = dl_ct
-                        # Adjust filename if download provides better type info
-                        if "pdf" in ct: ext = ".pdf"
-                        elif "png" in ct: ext = ".png"
-                        elif "jpeg" in ct: ext = ".jpg"
-                        filename = f"Receipt-{tx.date.strftime('%Y-%m-%d')}-{tx.id[:8]}{ext}"
-
-            if file_bytes:
-                print(f"📎 [Approve] Attaching {filename} ({len(file_bytes)} bytes)...")
-
-                # Map transaction type to valid QBO Attachable entity type
-                qbo_entity_type = self._map_to_qbo_attachable_type(tx.transaction_type or "Purchase")
-
-                attachable_ref = {
-                    "EntityRef": {"type": qbo_entity_type, "value": tx.id},
-                    "IncludeOnSend": True
-                }
-
-                await self.client.upload_attachment(
-                    file_bytes=file_bytes,
-                    filename=filename,
-                    content_type=ct,
-                    attachable_ref=attachable_ref
-                )
-                print(f"✅ [Approve] Receipt attached to {tx.id} as {qbo_entity_type}")
+            await source.prepare()
+            filename = f"Receipt-{tx.date.strftime('%Y-%m-%d')}-{tx.id[:8]}{source.extension}"
+
+            # Map transaction type to valid QBO Attachable entity type
+            qbo_entity_type = self._map_to_qbo_attachable_type(tx.transaction_type or "Purchase")
+
+            if source.sha256:
+                existing = await self.client.find_attachable(qbo_entity_type, tx.id, source.sha256)
+                if existing:
+                    print(f"⏭️ [Approve] Receipt already attached to {tx.id} (Attachable {existing.get('Id')}). Skipping upload.")
+                    return
+
+            attachable_ref = {
+                "EntityRef": {"type": qbo_entity_type, "value": tx.id},
+                "IncludeOnSend": True
+            }
+
+            print(f"📎 [Approve] Attaching {filename} ({source.size if source.size is not None else '?'} bytes)...")
+            await self.client.upload_attachment_stream(
+                source.chunks,
+                filename=filename,
+                content_type=source.content_type,
+                attachable_ref=attachable_ref,
+                size=source.size,
+                sha256=source.sha256,
+            )
+            print(f"✅ [Approve] Receipt attached to {tx.id} as {qbo_entity_type}")
 
         except Exception as e:
             print(f"❌ [Approve] Receipt Upload Failed: {e}")
             # Non-blocking error
+        finally:
+            await source.aclose()
@@ -11,17 +11,12 @@ print(f"{'Description':<30} | {'Old Matched':<11} | {'Old Reason':<30} | {'New M
 print("-" * 150)
 
 for term in terms:
-    txs = db.query(Transaction).filter(Transaction.description.ilike(f"%{term}%")).all()
-    for tx in txs:
-        if not tx.raw_json:
-            continue
-            
+    txs = [tx for tx in db.query(Transaction).filter(Transaction.description.ilike(f"%{term}%")).all() if tx.raw_json]
+    decisions = FeedLogic.analyze_many(tx.raw_json for tx in txs)
+    for tx, (is_matched, reason) in zip(txs, decisions):
         old_matched = tx.is_qbo_matched
         old_reason = tx.reasoning or "N/A" # Using reasoning field as proxy for logic reason, though actual Logic returns it separately.
         
-        # Run Logic
-        is_matched, reason = FeedLogic.analyze(tx.raw_json)
-        
         print(f"{tx.description[:30]:<30} | {str(old_matched):<11} | {old_reason[:30]:<30} | {str(is_matched):<11} | {reason}")
         
         # Update DB
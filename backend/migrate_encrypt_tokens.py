@@ -7,6 +7,10 @@ Run this ONCE after deploying the encryption code and setting FERNET_KEY:
 It uses the decrypt_token fallback (which returns plaintext if it can't decrypt)
 to detect already-encrypted vs plaintext tokens and only encrypts those that
 haven't been encrypted yet.
+
+After adding a new key in front of FERNET_KEY (comma-separated), re-encrypt
+every token under it before removing the old key:
+  python migrate_encrypt_tokens.py --rotate
 """
 import os
 import sys
@@ -21,10 +25,10 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from app.models.user import User  # register FK
 from app.models.qbo import QBOConnection
-from app.core.encryption import encrypt_token, decrypt_token
-from cryptography.fernet import Fernet, InvalidToken
+from app.core.encryption import encrypt_token, rotate_token, _get_fernet
+from cryptography.fernet import InvalidToken
 
-def main():
+def main(rotate: bool = False):
     db_url = os.getenv("DATABASE_URL")
     if not db_url:
         print("❌ DATABASE_URL not set")
@@ -42,7 +46,7 @@ def main():
     connections = session.query(QBOConnection).all()
     print(f"Found {len(connections)} QBO connections")
 
-    f = Fernet(fernet_key.encode())
+    f = _get_fernet()  # All keys in FERNET_KEY
     migrated = 0
 
     for conn in connections:
@@ -53,6 +57,9 @@ def main():
             try:
                 f.decrypt(conn.refresh_token.encode())
                 # Already encrypted
+                if rotate:
+                    conn.refresh_token = rotate_token(conn.refresh_token)
+                    changed = True
             except InvalidToken:
                 # Plaintext — encrypt it
                 conn.refresh_token = encrypt_token(conn.refresh_token)
@@ -62,13 +69,16 @@ def main():
         if conn.access_token:
             try:
                 f.decrypt(conn.access_token.encode())
+                if rotate:
+                    conn.access_token = rotate_token(conn.access_token)
+                    changed = True
             except InvalidToken:
                 conn.access_token = encrypt_token(conn.access_token)
                 changed = True
 
         if changed:
             migrated += 1
-            print(f"  🔒 Encrypted tokens for realm {conn.realm_id}")
+            print(f"  🔒 {'Rotated' if rotate else 'Encrypted'} tokens for realm {conn.realm_id}")
 
     if migrated > 0:
         session.commit()
@@ -79,4 +89,4 @@ def main():
     session.close()
 
 if __name__ == "__main__":
-    main()
+    main(rotate="--rotate" in sys.argv)
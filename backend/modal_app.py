@@ -32,7 +32,12 @@ image = (
         "pytz",
         "alembic",
         "tenacity",
-        "cryptography"
+        "cryptography",
+        "ijson",
+        "asyncpg",
+        "numpy",
+        "redis",
+        "orjson"
     )
     .add_local_dir(os.path.join(base_dir, "app"), remote_path="/root/app")
     .add_local_dir(os.path.join(base_dir, "alembic"), remote_path="/root/alembic")
@@ -61,7 +66,11 @@ secrets = modal.Secret.from_dict({
     "FERNET_KEY": env_vars.get("FERNET_KEY", ""),
 })
 
-@app.function(image=image, secrets=[secrets], min_containers=1, timeout=300)
+# The ASGI container stays warm (min_containers=1), so it keeps a bounded QueuePool.
+# Every other function defaults to DB_RUNTIME=worker (NullPool).
+api_runtime = modal.Secret.from_dict({"DB_RUNTIME": "api"})
+
+@app.function(image=image, secrets=[secrets, api_runtime], min_containers=1, timeout=300)
 @modal.asgi_app()
 def fastapi_app():
     print("🚀 [Modal] ASGI Entrypoint waking up...")
@@ -169,6 +178,11 @@ async def bulk_approve_modal(realm_id: str, tx_ids: list[str]):
         
         success_count = sum(1 for r in results if r.get("status") == "success")
         print(f"✅ Bulk Approve Complete. Success: {success_count}/{len(tx_ids)}")
+
+        # Push the queued approvals to QBO; receipts, SyncLog and XP are applied once for the batch
+        queued = [r["id"] for r in results if r.get("status") == "success"]
+        synced = await service.sync_approved_batch(queued)
+        print(f"✅ QBO write-back: {sum(1 for r in synced if r['status'] == 'success')}/{len(queued)}")
         
     except Exception as e:
         print(f"❌ Bulk Approve Failed: {e}")
@@ -236,71 +250,96 @@ async def process_single_approval(realm_id: str, tx_id: str):
     finally:
         db.close()
 
+@app.function(image=image, secrets=[secrets], timeout=600)
+def auto_accept_realm(realm_id: str, tx_ids: list[str], deadline: float):
+    """
+    Auto-approves one realm's candidates (bulk write-back, checkpointed) until deadline.
+    """
+    import sys
+    if "/root" not in sys.path:
+        sys.path.append("/root")
+
+    from app.services.auto_accept import run_realm
+
+    print(f"🤖 [Auto-Accept] Realm {realm_id}: {len(tx_ids)} candidates")
+    return run_realm(realm_id, tx_ids, deadline)
+
 @app.function(image=image, secrets=[secrets], timeout=600, schedule=modal.Cron("0 */6 * * *"))
-async def auto_accept_worker():
+def auto_accept_worker():
     """
     Worker to auto-approve high-confidence matches for Founder/Empire tiers.
+    Finds every eligible (realm, tx) pair in one query and fans out one
+    auto_accept_realm call per realm, all sharing the same time budget.
     """
     print("🤖 [Modal] Starting Auto-Accept Cron Job...")
     import sys
+    import time
     if "/root" not in sys.path:
         sys.path.append("/root")
 
-    from app.models.user import User
-    from app.models.qbo import Transaction, QBOConnection
-    from app.services.transaction_service import TransactionService
+    from app.core.config import settings
+    from app.services.auto_accept import pending_work
     from app.db.session import SessionLocal
 
-    db = SessionLocal()
     try:
-        # 1. Target Premium Users who have Auto-Accept ENABLED
-        premium_users = db.query(User).filter(
-            User.subscription_tier.in_(['business', 'corporate', 'founder', 'empire']),
-            User.auto_accept_enabled == True
-        ).all()
-        user_ids = [u.id for u in premium_users]
-        
-        if not user_ids:
-            print("ℹ️ No premium users found for auto-accept.")
+        with SessionLocal() as db:
+            work = pending_work(db)
+        if not work:
+            print("ℹ️ No auto-accept candidates.")
             return
 
-        # 2. Find High Confidence Matches (>95%)
-        # Note: We filter by realm_id associated with these users
-        connections = db.query(QBOConnection).filter(QBOConnection.user_id.in_(user_ids)).all()
-        
-        for conn in connections:
-            service = TransactionService(db, conn)
-            
-            # Find txs: unmatched, high confidence, not forced_review
-            candidates = db.query(Transaction).filter(
-                Transaction.realm_id == conn.realm_id,
-                Transaction.status == 'unmatched',
-                Transaction.confidence >= 0.95,
-                Transaction.forced_review == False
-            ).all()
-            
-            if not candidates:
+        deadline = time.time() + settings.AUTO_ACCEPT_BUDGET_SECONDS
+        print(f"🚀 [Auto-Accept] {sum(len(ids) for ids in work.values())} candidates across {len(work)} realms")
+        approved = failed = remaining = 0
+        for result in auto_accept_realm.starmap(
+            [(realm_id, tx_ids, deadline) for realm_id, tx_ids in work.items()], return_exceptions=True
+        ):
+            if isinstance(result, Exception):
+                print(f"⚠️ Auto-accept realm failed: {result}")
                 continue
-                
-            print(f"🚀 [Auto-Accept] Processing {len(candidates)} candidates for realm {conn.realm_id}")
-            for tx in candidates:
-                # Use synchronous-ish path here as we are already in a background worker
-                try:
-                    # We use approve_transaction(optimistic=False) to run it sequentially in this worker
-                    await service.approve_transaction(tx.id, optimistic=False)
-                except Exception as e:
-                    print(f"⚠️ Failed auto-accept for {tx.id}: {e}")
-
-        print("✅ Auto-Accept Cron Job complete.")
+            approved += result["approved"]
+            failed += result["failed"]
+            remaining += result["remaining"]
+
+        print(f"✅ Auto-Accept Cron Job complete. Approved: {approved}, failed: {failed}, deferred: {remaining}")
         
     except Exception as e:
         print(f"❌ Auto-Accept Job failed: {e}")
-    finally:
-        db.close()
 
-@app.function(image=image, secrets=[secrets])
+@app.function(image=image, secrets=[secrets], timeout=3600)
+def purge_realm_modal(realm_id: str):
+    """
+    Deletes a disconnected realm's data in short chunks (see realm_purge.py).
+    """
+    print(f"🗑️ [Modal] Purging realm {realm_id}")
+    import sys
+    if "/root" not in sys.path:
+        sys.path.append("/root")
+
+    from app.services.realm_purge import run_purge
+
+    try:
+        deleted = run_purge(realm_id)
+        print(f"✅ Purge complete for {realm_id}: {deleted}")
+    except Exception as e:
+        print(f"❌ Purge failed for {realm_id} (resumed by daily_maintenance): {e}")
+
+@app.function(image=image, secrets=[secrets], schedule=modal.Cron("0 3 * * *"))
 def daily_maintenance():
     print("Running daily maintenance tasks...")
+    import sys
+    if "/root" not in sys.path:
+        sys.path.append("/root")
+
+    from app.db.session import SessionLocal
+    from app.services.realm_purge import pending_purges
+
+    # Purges that died halfway (chunk deletes are idempotent, so they just run again)
+    with SessionLocal() as db:
+        stalled = pending_purges(db)
+    for realm_id in stalled:
+        print(f"🔁 Resuming purge for realm {realm_id}")
+        purge_realm_modal.spawn(realm_id)
 
 @app.function(image=image, secrets=[secrets])
 def run_migrations():
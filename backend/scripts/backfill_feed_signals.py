@@ -0,0 +1,71 @@
+"""
+One-off backfill of the FeedLogic signal columns (qbo_txn_type, clr_status,
+has_linked_txn, ...) for rows synced before they existed. New syncs write
+them as they ingest each payload.
+
+Usage:
+    python scripts/backfill_feed_signals.py [--realm REALM_ID] [--chunk 1000]
+"""
+import argparse
+import os
+import sys
+from dotenv import dotenv_values
+
+# Setup Paths
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+sys.path.append(backend_dir)
+
+# Load Env
+env_path = os.path.join(backend_dir, ".env")
+env_vars = dotenv_values(env_path)
+for key, value in env_vars.items():
+    os.environ.setdefault(key, value)
+
+from app.core.feed_logic import FeedLogic
+from app.db.session import SessionLocal
+from app.models.qbo import Transaction
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--realm", default=None)
+    parser.add_argument("--chunk", type=int, default=1000)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    query = db.query(Transaction.id, Transaction.raw_json).filter(
+        Transaction.raw_json.isnot(None), Transaction.qbo_txn_type.is_(None)
+    )
+    if args.realm:
+        query = query.filter(Transaction.realm_id == args.realm)
+
+    updated = 0
+    rows = []
+
+    def flush():
+        nonlocal updated, rows
+        decisions = FeedLogic.analyze_many(raw for _, raw in rows)
+        db.bulk_update_mappings(Transaction, [
+            {"id": tx_id, "is_qbo_matched": matched, "feed_reason": reason, **FeedLogic.signals(raw)}
+            for (tx_id, raw), (matched, reason) in zip(rows, decisions)
+        ])
+        db.commit()
+        updated += len(rows)
+        rows = []
+        print(f"   ... {updated} rows")
+
+    # Materialize ids first so committing between chunks doesn't disturb the cursor
+    for row in query.all():
+        rows.append(row)
+        if len(rows) >= args.chunk:
+            flush()
+    if rows:
+        flush()
+
+    db.close()
+    print(f"✅ [Backfill] Feed signals written for {updated} transactions")
+
+
+if __name__ == "__main__":
+    main()
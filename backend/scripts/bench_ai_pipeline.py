@@ -0,0 +1,214 @@
+"""
+End-to-end AnalysisService.analyze_transactions benchmark, no Gemini key needed.
+
+Seeds a realm with synthetic categories, vendors, approved history and N
+unmatched transactions, then analyzes them in batches using the offline
+FakeBackend. Reports throughput, p50/p95 per stage, DB round trips and
+token spend (app tokens charged + model input/output tokens).
+
+Usage:
+    python scripts/bench_ai_pipeline.py --transactions 2000 --batch 100 \
+        --latency-ms 800 --failure-rate 0.05 --corruption-rate 0.1
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+# Setup Paths
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+sys.path.append(backend_dir)
+
+# Benchmarks run against a throwaway SQLite file unless --db-url is given
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import create_engine, event, func
+from sqlalchemy.orm import sessionmaker
+
+from app.db.session import Base
+from app.models.user import User, TokenLedgerEntry
+from app.models.qbo import (
+    QBOConnection, Category, Customer, Vendor, Transaction, TransactionSplit, SyncLog,
+    VendorAlias, ClassificationRule, LearnedMapping, RealmCategoryModel,
+)
+from app.services.ai_analyzer import AIAnalyzer
+from app.services.analysis_service import AnalysisService
+from app.services.llm_backend import FakeBackend
+
+TABLES = [
+    User, TokenLedgerEntry, QBOConnection, Category, Customer, Vendor, Transaction,
+    TransactionSplit, SyncLog, VendorAlias, ClassificationRule, LearnedMapping, RealmCategoryModel,
+]
+REALM = "bench-realm"
+WORDS = ["north", "blue", "river", "metro", "prime", "summit", "harbor", "pixel", "golden", "urban",
+         "oak", "atlas", "nova", "cedar", "delta", "echo", "falcon", "granite", "iris", "juniper"]
+KINDS = ["supply", "cafe", "fuel", "hardware", "software", "freight", "print", "clinic", "market", "labs"]
+
+
+def seed(db, n_tx: int, history: int, rng: random.Random):
+    db.add(User(id="bench-user", email="bench@example.com", token_balance=n_tx * 2, subscription_tier="pro"))
+    db.add(QBOConnection(realm_id=REALM, user_id="bench-user", refresh_token="x"))
+    categories = [f"{k.title()} Expense" for k in KINDS] + [f"Misc {i}" for i in range(30)]
+    db.add_all([Category(id=str(i), realm_id=REALM, name=c, type="Expense") for i, c in enumerate(categories)])
+
+    vendors = [f"{a} {b} {k}" for a in WORDS for b in WORDS[:5] for k in KINDS]
+    db.add_all([Vendor(id=f"v{i}", realm_id=REALM, display_name=v.title()) for i, v in enumerate(vendors)])
+
+    # Mostly kind -> category, with enough bookkeeping noise that the local model isn't always sure
+    vendor_category = {
+        v: categories[KINDS.index(v.split()[-1])] if rng.random() < 0.7 else rng.choice(categories[len(KINDS):])
+        for v in vendors
+    }
+
+    start = datetime(2026, 1, 1)
+    known = rng.sample(vendors, k=min(len(vendors), max(1, history // 3)))
+    rows = []
+    for i in range(history):
+        v = rng.choice(known)
+        rows.append(Transaction(
+            id=f"h{i}", realm_id=REALM, description=f"POS {v.upper()} #{rng.randint(100, 9999)}",
+            payee=v.title(), account_name="Operating Checking", transaction_type="Purchase",
+            amount=rng.randint(5, 900), currency="USD", status="approved",
+            category_name=vendor_category[v], date=start + timedelta(hours=i),
+        ))
+    for i in range(n_tx):
+        if rng.random() < 0.5:
+            v = rng.choice(known)  # Resolvable from history / local model
+        else:
+            # Novel merchant the realm has never seen -> needs the AI
+            v = "".join(rng.choice("bcdfghjklmnpqrstvwxz") + rng.choice("aeiou") for _ in range(4)) + " co"
+        rows.append(Transaction(
+            id=f"t{i}", realm_id=REALM, description=f"{v.upper()} {rng.randint(1000, 99999)}",
+            account_name="Operating Checking", transaction_type="Purchase",
+            amount=rng.randint(5, 900), currency="USD", status="unmatched",
+            date=start + timedelta(days=30, minutes=i),
+        ))
+    db.add_all(rows)
+    db.commit()
+
+
+def timed(timings, name, fn):
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            timings[name].append((time.perf_counter() - started) * 1000)
+    return wrapper
+
+
+def instrument(service, timings):
+    """Wraps the pipeline stages of one AnalysisService instance with timers."""
+    timed_stage = lambda name, fn: timed(timings, name, fn)
+
+    service.get_ai_context = timed_stage("context", service.get_ai_context)
+    service._apply_rules = timed_stage("rules (per tx)", service._apply_rules)
+    service.history_index.lookup = timed_stage("history lookup (per tx)", service.history_index.lookup)
+    service.recommender.recommend = timed_stage("local model", service.recommender.recommend)
+    service.analyzer.analyze_batch = timed_stage("ai batch", service.analyzer.analyze_batch)
+
+
+def pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, int(round(q * len(values))) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transactions", type=int, default=1000)
+    parser.add_argument("--history", type=int, default=600, help="approved transactions to learn from")
+    parser.add_argument("--batch", type=int, default=100, help="analyze_transactions(limit=...)")
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--jitter-ms", type=float, default=200)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--corruption-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--db-url", default=None, help="defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    tmp = None
+    db_url = args.db_url
+    if not db_url:
+        tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        db_url = f"sqlite:///{tmp.name}"
+
+    engine = create_engine(db_url)
+    round_trips = [0]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count(*_):
+        round_trips[0] += 1
+
+    Base.metadata.create_all(engine, tables=[t.__table__ for t in TABLES])
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    with Session() as db:
+        seed(db, args.transactions, args.history, random.Random(args.seed))
+
+    backend = FakeBackend(args.latency_ms, args.jitter_ms, args.failure_rate, args.corruption_rate, args.seed)
+    timings = defaultdict(list)
+    methods = defaultdict(int)
+    runs = 0
+    round_trips[0] = 0
+
+    print(f"🚀 [Bench] {args.transactions} tx, batch {args.batch}, fake latency {args.latency_ms}±{args.jitter_ms}ms, "
+          f"failures {args.failure_rate:.0%}, corruption {args.corruption_rate:.0%}")
+    started = time.perf_counter()
+    with Session() as db:
+        raw_commit = db.commit
+        db.commit = timed(timings, "commit", raw_commit)
+        while True:
+            # Bookkeeping queries are excluded from the round-trip count
+            before = round_trips[0]
+            batch_ids = [row.id for row in db.query(Transaction.id).filter(
+                Transaction.realm_id == REALM, Transaction.status == "unmatched",
+            ).order_by(Transaction.date.desc()).limit(args.batch)]
+            round_trips[0] = before
+            if not batch_ids:
+                break
+
+            service = AnalysisService(db, REALM, analyzer=AIAnalyzer(backend))
+            instrument(service, timings)
+            run_started = time.perf_counter()
+            results = service.analyze_transactions(limit=args.batch, allow_ai=True)
+            timings["analyze_transactions"].append((time.perf_counter() - run_started) * 1000)
+            runs += 1
+            for r in results if isinstance(results, list) else []:
+                methods[r["analysis"].get("method", "?")] += 1
+
+            # Rows the AI couldn't resolve stay 'unmatched'; park them so the next batch moves on
+            before = round_trips[0]
+            db.query(Transaction).filter(
+                Transaction.id.in_(batch_ids), Transaction.status == "unmatched",
+            ).update({"status": "benched"}, synchronize_session=False)
+            raw_commit()
+            round_trips[0] = before
+        elapsed = time.perf_counter() - started
+        spent = -(db.query(func.coalesce(func.sum(TokenLedgerEntry.delta), 0)).scalar() or 0)
+
+    resolved = sum(methods.values())
+    print(f"\n✅ Resolved {resolved}/{args.transactions} in {elapsed:.2f}s "
+          f"({resolved / elapsed:.1f} tx/s, {runs} runs)")
+    print("   by method: " + ", ".join(f"{m}={c}" for m, c in sorted(methods.items())))
+    print(f"\n{'stage':<26} {'calls':>7} {'p50 ms':>9} {'p95 ms':>9} {'total s':>8}")
+    for stage, values in timings.items():
+        print(f"{stage:<26} {len(values):>7} {statistics.median(values):>9.2f} {pct(values, 0.95):>9.2f} "
+              f"{sum(values) / 1000:>8.2f}")
+    print(f"\nDB round trips: {round_trips[0]} ({round_trips[0] / max(1, resolved):.2f}/tx)")
+    usage = backend.usage
+    print(f"App tokens charged: {spent} | model calls: {usage['calls']} (+{usage['failures']} failed) | "
+          f"input tokens: {usage['input_tokens']} | output tokens: {usage['output_tokens']}")
+
+    engine.dispose()
+    if tmp:
+        os.unlink(tmp.name)
+
+
+if __name__ == "__main__":
+    main()
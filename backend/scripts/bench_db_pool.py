@@ -0,0 +1,78 @@
+"""
+Compares request latency with NullPool vs QueuePool against DATABASE_URL.
+
+Each simulated request checks out a connection, runs a trivial query and
+returns it, from a thread pool sized like the API container's worker threads.
+
+Usage:
+    python scripts/bench_db_pool.py --requests 500 --concurrency 16
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import dotenv_values
+
+# Setup Paths
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+sys.path.append(backend_dir)
+
+# Load Env
+env_path = os.path.join(backend_dir, ".env")
+env_vars = dotenv_values(env_path)
+for key, value in env_vars.items():
+    os.environ.setdefault(key, value)
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+from app.db.session import create_db_engine, get_pool_status
+
+
+def run(pool_mode: str, requests: int, concurrency: int):
+    engine = create_db_engine(pool_mode=pool_mode)
+    Session = sessionmaker(bind=engine)
+
+    def one_request(_):
+        start = time.perf_counter()
+        with Session() as db:
+            db.execute(text("SELECT 1"))
+        return (time.perf_counter() - start) * 1000
+
+    one_request(0)  # Warm-up (DNS/TLS, pool fill)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = sorted(pool.map(one_request, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    status = get_pool_status(engine)
+    engine.dispose()
+    return {
+        "mode": pool_mode,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1],
+        "max_ms": latencies[-1],
+        "rps": requests / elapsed,
+        "avg_wait_ms": status.get("avg_wait_ms", 0.0),
+        "timeouts": status.get("timeouts", 0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"🚀 [Bench] {args.requests} requests @ concurrency {args.concurrency}")
+    print(f"{'mode':<6} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'req/s':>8} {'wait ms':>8} {'timeouts':>8}")
+    for mode in ("null", "queue"):
+        r = run(mode, args.requests, args.concurrency)
+        print(f"{r['mode']:<6} {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['max_ms']:>8.2f} "
+              f"{r['rps']:>8.1f} {r['avg_wait_ms']:>8.3f} {r['timeouts']:>8}")
+
+
+if __name__ == "__main__":
+    main()
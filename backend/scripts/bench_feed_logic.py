@@ -0,0 +1,54 @@
+"""
+FeedLogic throughput: scalar analyze() loop vs analyze_many() on synthetic raw payloads.
+
+Usage:
+    python scripts/bench_feed_logic.py --payloads 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+# Setup Paths
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+sys.path.append(backend_dir)
+sys.path.append(os.path.join(backend_dir, "tests", "unit"))
+
+from app.core.feed_logic import FeedLogic
+from test_feed_logic import random_payload
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--payloads", type=int, default=100_000)
+    parser.add_argument("--max-lines", type=int, default=8, help="Line items per payload (0..N)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    payloads = [random_payload(rng, args.max_lines) for _ in range(args.payloads)]
+    print(f"🚀 [Bench] {len(payloads)} payloads (0-{args.max_lines} lines), best of {args.repeat}")
+
+    def best(fn):
+        timings = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            result = fn()
+            timings.append(time.perf_counter() - started)
+        return min(timings), result
+
+    scalar_s, scalar = best(lambda: [FeedLogic.analyze(p) for p in payloads])
+    batch_s, batch = best(lambda: FeedLogic.analyze_many(payloads))
+
+    print(f"   analyze() loop : {scalar_s:.3f}s ({len(payloads) / scalar_s:,.0f}/s)")
+    print(f"   analyze_many() : {batch_s:.3f}s ({len(payloads) / batch_s:,.0f}/s)  x{scalar_s / batch_s:.2f}")
+    print(f"   identical output: {scalar == batch}")
+    if scalar != batch:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Per-request token crypto overhead: what QBOClient paid before vs now.
+
+  - before: a new Fernet object and a decrypt on every request
+  - cipher: the cached MultiFernet, still decrypting on every request
+  - cached: decrypt_access_token (decrypt once per ACCESS_TOKEN_TTL per realm)
+
+Usage:
+    python scripts/bench_token_crypto.py --requests 20000 --realms 20
+"""
+import argparse
+import os
+import sys
+import time
+
+# Setup Paths
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+sys.path.append(backend_dir)
+
+from cryptography.fernet import Fernet
+
+from app.core import encryption
+
+
+def timed(requests: int, fn) -> float:
+    started = time.perf_counter()
+    for i in range(requests):
+        fn(i)
+    return (time.perf_counter() - started) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--realms", type=int, default=20)
+    args = parser.parse_args()
+
+    key = Fernet.generate_key().decode()
+    encryption._FERNET_KEY = key
+    encryption._get_fernet.cache_clear()
+    # ~1 KB, like an Intuit access token
+    tokens = [(f"realm-{r}", encryption.encrypt_token("eyJ" + "x" * 1000 + str(r))) for r in range(args.realms)]
+
+    def before(i):
+        _, ciphertext = tokens[i % len(tokens)]
+        Fernet(key.encode()).decrypt(ciphertext.encode()).decode()
+
+    def cipher(i):
+        encryption.decrypt_token(tokens[i % len(tokens)][1])
+
+    def cached(i):
+        encryption.decrypt_access_token(*tokens[i % len(tokens)])
+
+    results = {name: timed(args.requests, fn) for name, fn in (("before", before), ("cipher", cipher), ("cached", cached))}
+    print(f"{'path':>8} {'us/request':>11} {'speedup':>8}")
+    for name, seconds in results.items():
+        print(f"{name:>8} {seconds * 1e6:>11.2f} {results['before'] / seconds:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+GET /transactions serialization benchmark: ORM + pydantic vs column projection + orjson.
+
+Seeds a realm with N transactions (realistic raw_json payloads, ~1 in 10
+split) in a temporary SQLite file, then times both list paths end to end
+(query + shape + encode) and checks they produce the same JSON.
+
+  - orm:        select(Transaction) + selectinload(splits), TypeAdapter validate + dump_json
+  - projection: AsyncTransactionService.list_transaction_rows + orjson
+
+Usage:
+    python scripts/bench_transaction_serialization.py --sizes 1000 10000 50000 --repeat 3
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+# Setup Paths
+current_dir = os.path.dirname(os.path.abspath(__file__))
+backend_dir = os.path.dirname(current_dir)
+sys.path.append(backend_dir)
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+
+from app.api.v1.endpoints.transactions import TransactionSchema
+from app.db.session import Base
+from app.models.qbo import QBOConnection, Transaction, TransactionSplit
+from app.services.async_transaction_service import AsyncTransactionService
+from app.services import transaction_projection
+
+REALM = "bench-realm"
+TRANSACTION_LIST = TypeAdapter(List[TransactionSchema])
+
+
+def seed(db_url: str, n: int, rng: random.Random):
+    engine = create_engine(db_url)
+    Base.metadata.create_all(engine, tables=[QBOConnection.__table__, Transaction.__table__, TransactionSplit.__table__])
+    start = datetime(2026, 1, 1)
+    with sessionmaker(bind=engine)() as db:
+        db.add(QBOConnection(realm_id=REALM, user_id="bench-user", refresh_token="x"))
+        for i in range(n):
+            amount = round(rng.uniform(1, 900), 2)
+            db.add(Transaction(
+                id=f"t{i:07d}", realm_id=REALM, date=start + timedelta(minutes=i), amount=amount, currency="USD",
+                description=f"POS PURCHASE {rng.randint(1000, 99999)} MERCHANT {i % 997}",
+                transaction_type="Purchase", status=rng.choice(["unmatched", "approved", "pending_qbo"]),
+                suggested_category_name="Office Expense", suggested_payee=f"Merchant {i % 997}",
+                reasoning="Matched by vendor history " * 3, confidence=round(rng.random(), 3),
+                tags=["ops"] if i % 3 == 0 else [], account_id=str(35 + i % 4), account_name="Checking",
+                sync_token=str(rng.randint(0, 9)), is_split=i % 10 == 0,
+                raw_json={"Id": str(i), "Line": [{"Amount": amount, "Description": "x" * 200,
+                                                  "AccountBasedExpenseLineDetail": {"AccountRef": {"value": "7"}}}] * 4,
+                          "MetaData": {"CreateTime": start.isoformat()}, "PrivateNote": "y" * 300},
+            ))
+            if i % 10 == 0:
+                db.add_all([
+                    TransactionSplit(transaction_id=f"t{i:07d}", category_name="Fuel", amount=amount / 2, description="a"),
+                    TransactionSplit(transaction_id=f"t{i:07d}", category_name="Meals", amount=amount / 2, description="b"),
+                ])
+            if i % 5000 == 4999:
+                db.commit()
+        db.commit()
+    engine.dispose()
+
+
+async def orm_path(service: AsyncTransactionService) -> bytes:
+    rows = await service.list_transactions()
+    return TRANSACTION_LIST.dump_json(TRANSACTION_LIST.validate_python(rows, from_attributes=True))
+
+
+async def projection_path(service: AsyncTransactionService) -> bytes:
+    return transaction_projection.dumps(await service.list_transaction_rows())
+
+
+async def run(db_url: str, repeat: int) -> dict:
+    engine = create_async_engine(db_url.replace("sqlite://", "sqlite+aiosqlite://"))
+    Session = async_sessionmaker(bind=engine, expire_on_commit=False)
+    timings, bodies = {}, {}
+    for name, path in (("orm", orm_path), ("projection", projection_path)):
+        timings[name] = []
+        for _ in range(repeat):
+            async with Session() as db:  # Fresh session: no identity-map reuse between runs
+                started = time.perf_counter()
+                bodies[name] = await path(AsyncTransactionService(db, REALM))
+                timings[name].append(time.perf_counter() - started)
+    await engine.dispose()
+
+    if json.loads(bodies["orm"]) != json.loads(bodies["projection"]):
+        print("❌ Projection output differs from the ORM + pydantic output")
+        sys.exit(1)
+    return {name: (statistics.median(values), len(bodies[name])) for name, values in timings.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'rows':>7} {'orm ms':>10} {'projection ms':>14} {'speedup':>8} {'body KB':>9}")
+    for n in args.sizes:
+        tmp = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+        db_url = f"sqlite:///{tmp.name}"
+        try:
+            seed(db_url, n, random.Random(args.seed))
+            results = asyncio.run(run(db_url, args.repeat))
+        finally:
+            os.unlink(tmp.name)
+        (orm_s, size), (proj_s, _) = results["orm"], results["projection"]
+        print(f"{n:>7} {orm_s * 1000:>10.1f} {proj_s * 1000:>14.1f} {orm_s / proj_s:>7.2f}x {size / 1024:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.session import Base
+from app.models.qbo import QBOConnection, Transaction, TransactionSplit
+from app.models.user import User
+from app.services import account_preview
+from app.services.account_preview import AccountPreview
+
+CATEGORIZED = {"AccountRef": {"value": "20"}, "EntityRef": {"value": "v1", "name": "Shell"}, "Line": [
+    {"DetailType": "AccountBasedExpenseLineDetail", "AccountBasedExpenseLineDetail": {"AccountRef": {"value": "7", "name": "Fuel"}}},
+]}
+FOR_REVIEW = {"AccountRef": {"value": "20"}, "Line": [
+    {"DetailType": "AccountBasedExpenseLineDetail", "AccountBasedExpenseLineDetail": {"AccountRef": {"value": "1", "name": "Uncategorized Expense"}}},
+]}
+
+
+class TestAccountPreview(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(engine, tables=[User.__table__, QBOConnection.__table__, Transaction.__table__, TransactionSplit.__table__])
+        self.db = sessionmaker(bind=engine)()
+        self.connection = QBOConnection(realm_id="r1", refresh_token="x")
+        self.db.add(self.connection)
+        self.db.add_all([
+            Transaction(id="1", realm_id="r1", account_id="10", is_qbo_matched=True),
+            Transaction(id="2", realm_id="r1", account_id="10", is_qbo_matched=False),
+            Transaction(id="3", realm_id="r1", account_id="10", is_qbo_matched=False),
+            Transaction(id="4", realm_id="r1", account_id="11", is_qbo_matched=True),
+        ])
+        self.db.commit()
+
+        def query(q):
+            if q.startswith("SELECT COUNT(*)"):
+                return {"QueryResponse": {"totalCount": 2 if "Purchase" in q else (1 if "Transfer" in q else 0)}}
+            if "FROM Purchase" in q:
+                return {"QueryResponse": {"Purchase": [dict(CATEGORIZED, Id="p1"), dict(FOR_REVIEW, Id="p2")]}}
+            return {"QueryResponse": {"Transfer": [{"Id": "t1", "FromAccountRef": {"value": "99"}, "ToAccountRef": {"value": "20"}}]}}
+
+        self.client = MagicMock()
+        self.client.query = AsyncMock(side_effect=query)
+        account_preview._cache.clear()
+
+    def test_seen_accounts_answer_from_the_mirror(self):
+        result = asyncio.run(AccountPreview(self.db, self.connection, self.client).build(["10", "11"]))
+        self.assertEqual((result["total_transactions"], result["already_matched"], result["to_analyze"]), (4, 2, 2))
+        self.assertEqual(result["account_breakdown"], {"10": 3, "11": 1})
+        self.client.query.assert_not_awaited()
+
+    def test_unseen_accounts_count_then_fetch_only_non_empty_types(self):
+        result = asyncio.run(AccountPreview(self.db, self.connection, self.client).build(["10", "20"]))
+        self.assertEqual(result["sources"], {"10": "local", "20": "qbo"})
+        self.assertEqual(result["account_breakdown"], {"10": 3, "20": 3})
+        self.assertEqual((result["already_matched"], result["to_analyze"]), (2, 4))
+
+        fetched = [c.args[0] for c in self.client.query.await_args_list if not c.args[0].startswith("SELECT COUNT(*)")]
+        self.assertEqual(fetched, ["SELECT * FROM Purchase ORDERBY TxnDate DESC MAXRESULTS 2",
+                                   "SELECT * FROM Transfer ORDERBY TxnDate DESC MAXRESULTS 1"])
+
+    def test_results_are_cached_per_selection(self):
+        preview = AccountPreview(self.db, self.connection, self.client)
+        first = asyncio.run(preview.build(["20", "10"]))
+        calls = self.client.query.await_count
+        self.assertEqual(asyncio.run(preview.build(["10", "20"])), first)
+        self.assertEqual(self.client.query.await_count, calls)
+
+        full = asyncio.run(preview.build(["10", "20"], mode="full"))  # Different mode: not the cached answer
+        self.assertEqual(full["sources"], {"10": "qbo", "20": "qbo"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import asyncio
+import json
+import unittest
+from types import SimpleNamespace
+
+from app.services.ai_analyzer import AIAnalyzer, iter_json_items, validate_analyses
+from app.services.llm_backend import ModelBackend, FakeBackend
+
+
+class ScriptedBackend(ModelBackend):
+    """Returns queued responses; records the prompt of every call."""
+
+    def __init__(self, responses, delay=0.0):
+        super().__init__()
+        self.responses = list(responses)
+        self.prompts = []
+        self.delay = delay
+
+    async def generate(self, content, json_mode=True):
+        self.prompts.append(content)
+        await asyncio.sleep(self.delay)
+        return self.responses.pop(0)
+
+
+def _analyzer(backend, timeout=5):
+    analyzer = AIAnalyzer(backend)
+    analyzer.timeout = timeout
+    return analyzer
+
+
+def _tx(i):
+    return SimpleNamespace(id=str(i), transaction_type="Purchase", description=f"VENDOR {i}", payee=None,
+                           account_name="Checking", amount=10, currency="USD", note=None,
+                           suggested_category_name=None)
+
+
+CONTEXT = {"category_list": ["Fuel", "Meals"], "entity_vocabulary": [], "history": []}
+
+
+class TestOutputValidation(unittest.TestCase):
+
+    def test_truncated_list_keeps_complete_items(self):
+        raw = '```json\n[{"id": "1", "category": "Fuel"}, {"id": "2", "categ'
+        self.assertEqual([i["id"] for i in iter_json_items(raw)], ["1"])
+
+    def test_invalid_and_unexpected_items_are_reported_missing(self):
+        raw = json.dumps([
+            {"id": 1, "category": "Fuel", "confidence": 1.7},
+            {"id": "2", "confidence": "not a number"},
+            {"id": "99", "category": "Meals"},
+        ])
+        valid, missing = validate_analyses(raw, ["1", "2"])
+        self.assertEqual([(a["id"], a["confidence"]) for a in valid], [("1", 1.0)])
+        self.assertEqual(missing, ["2"])
+
+
+class TestAsyncAnalyzer(unittest.TestCase):
+
+    def test_only_missing_ids_are_re_requested(self):
+        model = ScriptedBackend([
+            json.dumps([{"id": "1", "category": "Fuel"}]),
+            json.dumps([{"id": "2", "category": "Meals"}]),
+        ])
+        analyses = asyncio.run(_analyzer(model).analyze_batch_async([_tx(1), _tx(2)], CONTEXT))
+
+        self.assertEqual(sorted(a["id"] for a in analyses), ["1", "2"])
+        self.assertEqual(len(model.prompts), 2)
+        self.assertIn("2|OUT|", model.prompts[1])
+        self.assertNotIn("1|OUT|", model.prompts[1])
+
+    def test_timeouts_are_bounded(self):
+        model = ScriptedBackend(["[]"] * 5, delay=1)
+        analyses = _analyzer(model, timeout=0.01).analyze_batch([_tx(1)], CONTEXT)  # Sync wrapper
+        self.assertEqual(analyses, [])
+
+    def test_fake_backend_round_trip(self):
+        backend = FakeBackend(latency_ms=0, seed=1)
+        analyses = asyncio.run(_analyzer(backend).analyze_batch_async([_tx(i) for i in range(5)], CONTEXT))
+        self.assertEqual(sorted(a["id"] for a in analyses), [str(i) for i in range(5)])
+        self.assertTrue(all(a["category"] in CONTEXT["category_list"] for a in analyses))
+        self.assertEqual(backend.usage["calls"], 1)
+
+    def test_fake_backend_corruption_is_repaired(self):
+        backend = FakeBackend(latency_ms=0, corruption_rate=0.5, seed=3)
+        analyses = asyncio.run(_analyzer(backend).analyze_batch_async([_tx(i) for i in range(20)], CONTEXT))
+        self.assertGreater(backend.usage["calls"], 1)  # Some responses needed a re-request
+        self.assertEqual(len({a["id"] for a in analyses}), len(analyses))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import asyncio
+import hashlib
+import unittest
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.session import Base
+from app.models.gamification import GamificationEvent, UserGamificationStats
+from app.models.qbo import LearnedMapping, QBOConnection, SyncLog, Transaction, TransactionSplit
+from app.models.user import User
+from app.services.transaction_service import TransactionService
+
+
+class TestApprovalEffects(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(engine, tables=[
+            User.__table__, QBOConnection.__table__, Transaction.__table__, TransactionSplit.__table__,
+            SyncLog.__table__, LearnedMapping.__table__, UserGamificationStats.__table__, GamificationEvent.__table__,
+        ])
+        self.db = sessionmaker(bind=engine)()
+        self.db.add(User(id="u1", email="u1@example.com"))
+        connection = QBOConnection(realm_id="r1", user_id="u1", refresh_token="x")
+        self.db.add(connection)
+        self.db.add_all([
+            Transaction(id="1", realm_id="r1", status="pending_qbo", amount=10, date=datetime(2026, 1, 1),
+                        receipt_content=b"%PDF", description="FUEL"),
+            Transaction(id="2", realm_id="r1", status="pending_qbo", amount=0, date=datetime(2026, 1, 2)),
+            Transaction(id="3", realm_id="r1", status="pending_qbo", amount=0, date=datetime(2026, 1, 3)),
+            Transaction(id="4", realm_id="r1", status="pending_qbo", amount=5, date=datetime(2026, 1, 4)),
+        ])
+        self.db.commit()
+
+        with patch("app.services.transaction_service.QBOClient"):
+            self.service = TransactionService(self.db, connection)
+        self.service.client.get_purchase = AsyncMock(return_value={"Purchase": {"TotalAmt": 42}})
+        self.service._upload_receipt = AsyncMock()
+
+        async def write(tx):
+            if tx.id == "4":
+                raise RuntimeError("Stale object")
+            return {"SyncToken": "1", "TotalAmt": 7} if tx.id == "2" else {"SyncToken": "1"}
+        self.service._update_qbo_transaction = write
+
+    def test_batch_applies_side_effects_once(self):
+        results = asyncio.run(self.service.sync_approved_batch(["1", "2", "3", "4"]))
+        self.assertEqual([r["status"] for r in results], ["success", "success", "success", "error"])
+
+        statuses = {tx.id: (tx.status, tx.amount) for tx in self.db.query(Transaction)}
+        self.assertEqual(statuses["1"], ("approved", 10))
+        self.assertEqual(statuses["2"], ("approved", 7))  # From the write response
+        self.assertEqual(statuses["3"], ("approved", 42))  # Re-read at flush
+        self.assertEqual(statuses["4"][0], "error_qbo")
+        self.service.client.get_purchase.assert_awaited_once_with("3")
+
+        # The receipt upload got a snapshot, not the (expired) ORM row
+        self.service._upload_receipt.assert_awaited_once()
+        self.assertEqual(self.service._upload_receipt.await_args.args[0].receipt_sha256, hashlib.sha256(b"%PDF").hexdigest())
+
+        logs = {log.status: log for log in self.db.query(SyncLog)}
+        self.assertEqual(set(logs), {"success", "error"})
+        self.assertEqual(logs["success"].count, 3)
+        self.assertEqual(logs["success"].details["tx_ids"], ["1", "2", "3"])
+        self.assertEqual(logs["error"].details["errors"][0]["tx_id"], "4")
+
+        events = self.db.query(GamificationEvent).all()
+        self.assertEqual([e.xp_earned for e in events], [30])
+        stats = self.db.query(UserGamificationStats).one()
+        self.assertEqual((stats.total_xp, stats.current_streak), (30, 1))
+
+    def test_single_approval_flushes_its_own_batch(self):
+        result = asyncio.run(self.service.sync_approved_to_qbo("1"))
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(self.db.query(SyncLog).one().count, 1)
+        self.assertEqual(self.db.query(UserGamificationStats).one().total_xp, 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import unittest
+from datetime import datetime, timezone
+
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from app.db.session import Base
+from app.db.async_session import to_async_url
+from app.core.feed_logic import FeedLogic
+from app.models.qbo import QBOConnection, Transaction, TransactionSplit
+from app.services.async_transaction_service import AsyncTransactionService
+from app.services import transaction_projection
+
+
+class TestAsyncUrl(unittest.TestCase):
+
+    def test_postgres_url_maps_to_asyncpg(self):
+        url, connect_args = to_async_url("postgresql://u:p@db.example.com/qbo?sslmode=require")
+        self.assertEqual(url.drivername, "postgresql+asyncpg")
+        self.assertNotIn("sslmode", url.query)
+        self.assertEqual(connect_args["ssl"], "require")
+
+    def test_sqlite_url_maps_to_aiosqlite(self):
+        url, connect_args = to_async_url("sqlite:///:memory:")
+        self.assertEqual(url.drivername, "sqlite+aiosqlite")
+        self.assertEqual(connect_args, {})
+
+
+class TestAsyncTransactionService(unittest.TestCase):
+
+    async def _setup(self):
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        async with engine.begin() as conn:
+            await conn.run_sync(lambda c: Base.metadata.create_all(
+                c, tables=[QBOConnection.__table__, Transaction.__table__, TransactionSplit.__table__]
+            ))
+        db = async_sessionmaker(bind=engine, expire_on_commit=False)()
+        db.add_all([
+            Transaction(id="1", realm_id="r1", account_id="35", status="unmatched", forced_review=True),
+            Transaction(id="2", realm_id="r1", account_id="36", status="unmatched"),
+            Transaction(id="3", realm_id="r2", account_id="35", status="unmatched"),
+        ])
+        await db.commit()
+        return engine, db
+
+    def test_approve_and_list(self):
+        async def scenario():
+            engine, db = await self._setup()
+            service = AsyncTransactionService(db, "r1")
+
+            self.assertEqual([t.id for t in await service.list_transactions(["35"])], ["1"])
+
+            await service.approve_transaction("1")
+            with self.assertRaises(ValueError):
+                await service.approve_transaction("3")  # Other realm
+
+            results = await service.bulk_approve(["2", "missing"])
+            self.assertEqual([r["status"] for r in results], ["success", "error"])
+
+            statuses = {t.id: (t.status, t.forced_review) for t in await service.list_transactions()}
+            self.assertEqual(statuses["1"], ("pending_qbo", False))
+            self.assertEqual(statuses["2"][0], "pending_qbo")
+
+            await db.close()
+            await engine.dispose()
+
+        asyncio.run(scenario())
+
+    def test_feed_filters_use_signal_columns(self):
+        manual = {"PurchaseEx": {"any": [{"value": {"Name": "TxnType", "Value": "54"}}]}, "Line": [], "SyncToken": "1"}
+        bank_feed = {"Line": [{"AccountBasedExpenseLineDetail": {"AccountRef": {"name": "Fuel"}}}], "SyncToken": "0"}
+
+        async def scenario():
+            engine, db = await self._setup()
+            for tx_id, payload in (("m1", manual), ("b1", bank_feed)):
+                tx = Transaction(id=tx_id, realm_id="r3", status="unmatched", raw_json=payload)
+                tx.is_qbo_matched, tx.feed_reason = FeedLogic.analyze(payload)
+                for column, value in FeedLogic.signals(payload).items():
+                    setattr(tx, column, value)
+                db.add(tx)
+            await db.commit()
+
+            service = AsyncTransactionService(db, "r3")
+            self.assertEqual([t.id for t in await service.list_transactions(feed="unreconciled_manual")], ["m1"])
+            self.assertEqual([t.id for t in await service.list_transactions(feed="bank_feed_review")], ["b1"])
+            self.assertEqual(sorted(t.id for t in await service.list_transactions(feed="missing_payee")), ["b1", "m1"])
+            with self.assertRaises(ValueError):
+                await service.list_transactions(feed="nope")
+
+            await db.close()
+            await engine.dispose()
+
+        asyncio.run(scenario())
+
+    def test_projection_matches_schema_serialization(self):
+        from app.api.v1.endpoints.transactions import TransactionSchema
+
+        async def scenario():
+            engine, db = await self._setup()
+            db.add_all([
+                Transaction(id="p1", realm_id="r4", account_id="35", status="unmatched", amount=12.5, currency="USD",
+                            date=datetime(2026, 3, 1, 9, 30, tzinfo=timezone.utc), tags=["a"], confidence=0.875,
+                            is_split=True, raw_json={"big": "x" * 1000}),
+                Transaction(id="p2", realm_id="r4", account_id="36", status="approved", amount=-3, currency="CAD",
+                            date=datetime(2026, 3, 2, 12, 0, 0, 123456), matching_method="history"),
+                Transaction(id="p3", realm_id="r4", account_id="35", status="unmatched", amount=1, currency="USD",
+                            date=datetime(2026, 3, 3)),
+                TransactionSplit(transaction_id="p1", category_name="Fuel", amount=10, description="gas"),
+                TransactionSplit(transaction_id="p1", category_name="Meals", amount=2.5, description=""),
+            ])
+            await db.commit()
+            service = AsyncTransactionService(db, "r4")
+
+            orm_rows = sorted(await service.list_transactions(), key=lambda t: t.id)
+            expected = [json.loads(TransactionSchema.model_validate(t).model_dump_json()) for t in orm_rows]
+            rows = sorted(await service.list_transaction_rows(), key=lambda r: r["id"])
+            self.assertEqual(json.loads(transaction_projection.dumps(rows)), expected)
+
+            streamed = [r async for r in service.stream_transaction_rows(chunk_size=2)]
+            self.assertEqual([r["id"] for r in streamed], ["p1", "p2", "p3"])
+            self.assertEqual([json.loads(transaction_projection.dumps_ndjson_line(r)) for r in streamed], expected)
+
+            self.assertEqual([r["id"] for r in await service.list_transaction_rows(["36"])], ["p2"])
+            with self.assertRaises(ValueError):
+                await service.list_transaction_rows(feed="nope")
+
+            await db.close()
+            await engine.dispose()
+
+        asyncio.run(scenario())
+
+
+if __name__ == "__main__":
+    unittest.main()
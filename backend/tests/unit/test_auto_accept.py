@@ -0,0 +1,94 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.session import Base
+from app.models.gamification import GamificationEvent, UserGamificationStats
+from app.models.qbo import LearnedMapping, QBOConnection, SyncLog, Transaction, TransactionSplit
+from app.models.user import User
+from app.services import auto_accept
+from app.services.transaction_service import TransactionService
+
+
+class TestAutoAccept(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(engine, tables=[
+            User.__table__, QBOConnection.__table__, Transaction.__table__, TransactionSplit.__table__,
+            SyncLog.__table__, LearnedMapping.__table__, UserGamificationStats.__table__, GamificationEvent.__table__,
+        ])
+        self.db = sessionmaker(bind=engine)()
+        self.db.add_all([
+            User(id="u1", email="u1@example.com", subscription_tier="business", auto_accept_enabled=True),
+            User(id="u2", email="u2@example.com", subscription_tier="business", auto_accept_enabled=False),
+            User(id="u3", email="u3@example.com", subscription_tier="free", auto_accept_enabled=True),
+            QBOConnection(realm_id="r1", user_id="u1", refresh_token="x"),
+            QBOConnection(realm_id="r2", user_id="u2", refresh_token="x"),
+            QBOConnection(realm_id="r3", user_id="u3", refresh_token="x"),
+        ])
+        for i in range(30):
+            self.db.add(Transaction(id=f"a{i:02}", realm_id="r1", status="unmatched", confidence=0.97, forced_review=False,
+                                    amount=1, category_id="c1", category_name="Meals", sync_token="0"))
+        self.db.add_all([
+            Transaction(id="low", realm_id="r1", status="unmatched", confidence=0.5, forced_review=False),
+            Transaction(id="review", realm_id="r1", status="unmatched", confidence=0.99, forced_review=True),
+            Transaction(id="b0", realm_id="r2", status="unmatched", confidence=0.99, forced_review=False),
+            Transaction(id="c0", realm_id="r3", status="unmatched", confidence=0.99, forced_review=False),
+        ])
+        self.db.commit()
+        self.patches = [
+            patch("app.services.transaction_service.QBOClient"),
+            patch.object(TransactionService, "_update_qbo_transaction", AsyncMock(return_value={"SyncToken": "1"})),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def _count_by_status(self):
+        counts = {}
+        for (status,) in self.db.query(Transaction.status).filter(Transaction.id.like("a%")):
+            counts[status] = counts.get(status, 0) + 1
+        return counts
+
+    def test_pending_work_is_one_query_over_eligible_realms(self):
+        work = auto_accept.pending_work(self.db)
+        self.assertEqual(list(work), ["r1"])
+        self.assertEqual(work["r1"], [f"a{i:02}" for i in range(30)])
+
+    def test_accept_realm_claims_in_checkpointed_chunks(self):
+        work = auto_accept.pending_work(self.db)
+        summary = asyncio.run(auto_accept.accept_realm(self.db, "r1", work["r1"], time.time() + 60))
+
+        self.assertEqual((summary["approved"], summary["failed"], summary["remaining"]), (30, 0, 0))
+        self.assertEqual(self._count_by_status(), {"approved": 30})
+        checkpoints = self.db.query(SyncLog).filter(SyncLog.operation == "auto_accept").all()
+        self.assertEqual([(len(c.details["tx_ids"]), c.status) for c in checkpoints], [(25, "success"), (5, "success")])
+        self.assertEqual(auto_accept.pending_work(self.db), {})
+
+    def test_spent_budget_leaves_candidates_unmatched(self):
+        summary = asyncio.run(auto_accept.accept_realm(self.db, "r1", auto_accept.pending_work(self.db)["r1"], time.time() - 1))
+        self.assertEqual((summary["approved"], summary["remaining"]), (0, 30))
+        self.assertEqual(self._count_by_status(), {"unmatched": 30})
+
+    def test_open_checkpoint_is_resumed(self):
+        # A previous run claimed a chunk and died before writing it
+        auto_accept._claim(self.db, "r1", ["a00", "a01"])
+        work = auto_accept.pending_work(self.db)
+        self.assertEqual(len(work["r1"]), 28)
+
+        summary = asyncio.run(auto_accept.accept_realm(self.db, "r1", [], time.time() + 60))
+        self.assertEqual((summary["resumed"], summary["approved"]), (1, 2))
+        self.assertEqual(auto_accept._open_checkpoints(self.db).count(), 0)
+        self.assertEqual(self._count_by_status(), {"approved": 2, "unmatched": 28})
+
+
+if __name__ == "__main__":
+    unittest.main()
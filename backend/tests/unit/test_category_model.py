@@ -0,0 +1,86 @@
+import unittest
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.session import Base
+from app.core.category_model import CategoryModel
+from app.models.qbo import RealmCategoryModel, Transaction
+from app.services.category_model_service import CategoryRecommender
+
+VENDORS = [
+    ("SHELL OIL {n}", "Shell", "Fuel"),
+    ("CHEVRON {n}", "Chevron", "Fuel"),
+    ("HOME DEPOT #{n}", "Home Depot", "Repairs"),
+    ("LOWES #{n}", "Lowes", "Repairs"),
+    ("STARBUCKS STORE {n}", "Starbucks", "Meals"),
+]
+
+
+def _history(count):
+    features, labels = [], []
+    for i in range(count):
+        desc, payee, category = VENDORS[i % len(VENDORS)]
+        features.append((desc.format(n=1000 + i), payee, "Chase Checking", "Purchase"))
+        labels.append((category[:2], category))
+    return features, labels
+
+
+class TestCategoryModel(unittest.TestCase):
+
+    def test_predicts_and_round_trips(self):
+        features, labels = _history(60)
+        model = CategoryModel.train(features, labels)
+
+        restored = CategoryModel.from_bytes(model.to_bytes(), model.labels, model.sample_count)
+        full, partial = restored.predict_many([
+            ("Home Depot 0042", "Home Depot", "Chase Checking", "Purchase"),
+            ("Home Depot 0042", None, "Chase Checking", "Purchase"),  # Unlike anything trained on
+        ])
+        self.assertEqual((full[1], partial[1]), ("Repairs", "Repairs"))
+        self.assertGreater(full[2], 0.9)
+        self.assertLess(partial[2], full[2])  # Calibrated: weaker margin, lower confidence
+
+    def test_needs_enough_history(self):
+        features, labels = _history(5)
+        self.assertIsNone(CategoryModel.train(features, labels))
+
+
+class TestCategoryRecommender(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(bind=engine, tables=[Transaction.__table__, RealmCategoryModel.__table__])
+        self.db = sessionmaker(bind=engine)()
+        features, labels = _history(60)
+        start = datetime(2026, 1, 1)
+        self.db.add_all([
+            Transaction(id=str(i), realm_id="r1", description=f[0], payee=f[1], account_name=f[2],
+                        transaction_type=f[3], category_name=l[1], status="approved", date=start + timedelta(days=i))
+            for i, (f, l) in enumerate(zip(features, labels))
+        ])
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_trains_once_and_filters_by_confidence(self):
+        recommender = CategoryRecommender(self.db, "r1")
+        recommender.MIN_CONFIDENCE = 0.0
+        pending = Transaction(id="new", realm_id="r1", description="SHELL OIL 77", payee="Shell",
+                              account_name="Chase Checking", transaction_type="Purchase")
+        self.assertEqual(recommender.recommend([pending])["new"]["category_name"], "Fuel")
+
+        stored = self.db.query(RealmCategoryModel).one()
+        self.assertEqual(stored.sample_count, 60)
+
+        # A fresh instance reuses the stored model instead of retraining
+        reloaded = CategoryRecommender(self.db, "r1")
+        reloaded.MIN_CONFIDENCE = 1.01
+        self.assertEqual(reloaded.recommend([pending]), {})
+        self.assertEqual(reloaded.get_model().sample_count, 60)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from starlette.requests import Request
+
+from app.db.session import Base, mark_realm_changed
+from app.models.user import User
+from app.models.qbo import QBOConnection, Transaction, TransactionSplit
+from app.services.data_version import ResponseCache, get_data_version
+
+
+def _request(if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers, "query_string": b""})
+
+
+class TestDataVersion(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=engine, tables=[
+            User.__table__, QBOConnection.__table__, Transaction.__table__, TransactionSplit.__table__,
+        ])
+        self.db = sessionmaker(bind=engine)()
+        self.db.add_all([
+            QBOConnection(realm_id="r1", user_id="u1", refresh_token="x"),
+            QBOConnection(realm_id="r2", user_id="u1", refresh_token="x"),
+        ])
+        self.db.commit()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_orm_writes_bump_only_their_realm(self):
+        self.db.add(Transaction(id="1", realm_id="r1", status="unmatched"))
+        self.db.commit()
+        self.assertEqual((get_data_version(self.db, "r1"), get_data_version(self.db, "r2")), (1, 0))
+
+        tx = self.db.get(Transaction, "1")
+        tx.note = "lunch"
+        self.db.rollback()  # Discarded changes don't bump
+        self.db.commit()
+        self.assertEqual(get_data_version(self.db, "r1"), 1)
+
+    def test_bulk_statements_bump_when_marked(self):
+        self.db.execute(update(Transaction).where(Transaction.realm_id == "r2").values(status="approved"))
+        mark_realm_changed(self.db, "r2")
+        self.db.commit()
+        self.assertEqual(get_data_version(self.db, "r2"), 1)
+
+    def test_token_refresh_does_not_bump(self):
+        conn = self.db.query(QBOConnection).filter(QBOConnection.realm_id == "r1").first()
+        conn.access_token = "new"
+        self.db.commit()
+        self.assertEqual(get_data_version(self.db, "r1"), 0)
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def test_etag_304_and_version_keyed_entries(self):
+        cache = ResponseCache(max_entries=2, ttl_seconds=60)
+        self.assertIsNone(cache.lookup(_request(), "r1", 3, "categories"))
+
+        response = cache.respond("r1", 3, "categories", b"[]")
+        etag = response.headers["etag"]
+        self.assertTrue(etag.startswith('W/"'))
+
+        self.assertEqual(cache.lookup(_request(etag), "r1", 3, "categories").status_code, 304)
+        self.assertEqual(cache.lookup(_request(etag.removeprefix("W/")), "r1", 3, "categories").status_code, 304)
+        self.assertEqual(cache.lookup(_request(), "r1", 3, "categories").body, b"[]")
+
+        # A new version is a different ETag and a cache miss
+        self.assertIsNone(cache.lookup(_request(etag), "r1", 4, "categories"))
+
+    def test_lru_is_bounded(self):
+        cache = ResponseCache(max_entries=2, ttl_seconds=60)
+        for key in ("a", "b", "c"):
+            cache.respond("r1", 1, key, b"{}")
+        self.assertIsNone(cache.lookup(_request(), "r1", 1, "a"))
+        self.assertIsNotNone(cache.lookup(_request(), "r1", 1, "c"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+from unittest.mock import patch
+
+from sqlalchemy import text
+from sqlalchemy.pool import NullPool
+
+from app.db import session as db_session
+from app.db.session import (
+    create_db_engine, engine_options, get_pool_status, resolve_pool_mode,
+    InstrumentedQueuePool, InstrumentedNullPool,
+)
+
+
+class TestPoolStrategy(unittest.TestCase):
+
+    def test_mode_follows_runtime_unless_forced(self):
+        with patch.object(db_session.settings, "DB_POOL_MODE", "auto"):
+            with patch.object(db_session.settings, "DB_RUNTIME", "api"):
+                self.assertEqual(resolve_pool_mode(), "queue")
+            with patch.object(db_session.settings, "DB_RUNTIME", "worker"):
+                self.assertEqual(resolve_pool_mode(), "null")
+        with patch.object(db_session.settings, "DB_POOL_MODE", "null"), \
+                patch.object(db_session.settings, "DB_RUNTIME", "api"):
+            self.assertEqual(resolve_pool_mode(), "null")
+
+    def test_engine_options(self):
+        queue = engine_options("postgresql://u:p@h/db", "queue")
+        self.assertIs(queue["poolclass"], InstrumentedQueuePool)
+        self.assertTrue(queue["pool_pre_ping"])
+        self.assertEqual(queue["connect_args"], {"connect_timeout": 10})
+
+        self.assertIs(engine_options("sqlite://", "null")["poolclass"], InstrumentedNullPool)
+        self.assertNotIn("connect_args", engine_options("sqlite://", "null"))
+        self.assertIs(engine_options("sqlite://", "null", is_async=True)["poolclass"], NullPool)
+
+    def test_queue_pool_reports_checkouts(self):
+        engine = create_db_engine("sqlite:///file:pooltest?mode=memory&uri=true", pool_mode="queue")
+        try:
+            for _ in range(3):
+                with engine.connect() as conn:
+                    conn.execute(text("SELECT 1"))
+            status = get_pool_status(engine)
+            self.assertEqual(status["pool_class"], "InstrumentedQueuePool")
+            self.assertEqual(status["checked_out"], 0)
+            self.assertEqual(status["checked_in"], 1)  # Connection reused, not reopened
+            self.assertEqual(status["checkouts"], 3)
+            self.assertEqual(status["timeouts"], 0)
+        finally:
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    unittest.main()
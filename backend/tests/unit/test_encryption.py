@@ -0,0 +1,64 @@
+import unittest
+from unittest.mock import patch
+
+from cryptography.fernet import Fernet
+
+from app.core import encryption
+
+OLD_KEY, NEW_KEY = Fernet.generate_key().decode(), Fernet.generate_key().decode()
+
+
+class TestEncryption(unittest.TestCase):
+
+    def setUp(self):
+        self.patches = [patch.object(encryption, "_FERNET_KEY", f"{NEW_KEY},{OLD_KEY}")]
+        for p in self.patches:
+            p.start()
+        encryption._get_fernet.cache_clear()
+        encryption._access_tokens.clear()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        encryption._get_fernet.cache_clear()
+        encryption._access_tokens.clear()
+
+    def test_cipher_is_built_once(self):
+        self.assertIs(encryption._get_fernet(), encryption._get_fernet())
+
+    def test_old_key_decrypts_and_rotates_to_new(self):
+        legacy = Fernet(OLD_KEY.encode()).encrypt(b"refresh-1").decode()
+        self.assertEqual(encryption.decrypt_token(legacy), "refresh-1")
+        rotated = encryption.rotate_token(legacy)
+        self.assertEqual(Fernet(NEW_KEY.encode()).decrypt(rotated.encode()), b"refresh-1")
+        self.assertEqual(encryption.decrypt_token("plaintext"), "plaintext")  # Pre-migration fallback
+
+    def test_access_token_cache(self):
+        first = encryption.encrypt_token("access-1")
+        with patch.object(encryption, "decrypt_token", wraps=encryption.decrypt_token) as decrypt:
+            self.assertEqual(encryption.decrypt_access_token("r1", first), "access-1")
+            self.assertEqual(encryption.decrypt_access_token("r1", first), "access-1")
+            self.assertEqual(decrypt.call_count, 1)
+
+            # A new ciphertext (refreshed elsewhere) is never answered from the cache
+            second = encryption.encrypt_token("access-2")
+            self.assertEqual(encryption.decrypt_access_token("r1", second), "access-2")
+            encryption.forget_access_token("r1")
+            self.assertEqual(encryption.decrypt_access_token("r1", second), "access-2")
+            self.assertEqual(decrypt.call_count, 3)
+
+            with patch.object(encryption, "ACCESS_TOKEN_TTL", -1):
+                encryption.decrypt_access_token("r2", first)
+                encryption.decrypt_access_token("r2", first)
+            self.assertEqual(decrypt.call_count, 5)
+
+    def test_access_token_cache_is_bounded(self):
+        token = encryption.encrypt_token("access")
+        with patch.object(encryption, "ACCESS_TOKEN_CACHE_SIZE", 3):
+            for realm_id in ("r1", "r2", "r3", "r1", "r4"):
+                encryption.decrypt_access_token(realm_id, token)
+        self.assertEqual(list(encryption._access_tokens), ["r3", "r1", "r4"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.session import Base
+from app.models.qbo import Vendor, Customer
+from app.services import entity_cache
+from app.services.entity_cache import get_entity_cache, invalidate_entity_cache
+
+
+class TestEntityCache(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(bind=engine, tables=[Vendor.__table__, Customer.__table__])
+        self.db = sessionmaker(bind=engine)()
+        self.db.add_all([
+            Vendor(id="10", realm_id="r1", display_name="Home Depot", fully_qualified_name="Home Depot"),
+            Customer(id="20", realm_id="r1", display_name="Hall Properties", fully_qualified_name="Hall Properties:Unit 4"),
+            Vendor(id="30", realm_id="r2", display_name="Other Realm"),
+        ])
+        self.db.commit()
+        invalidate_entity_cache()
+
+    def tearDown(self):
+        self.db.close()
+        invalidate_entity_cache()
+
+    def test_lookups_are_realm_scoped_and_normalized(self):
+        cache = get_entity_cache(self.db, "r1")
+        self.assertEqual(cache.fully_qualified_name("20"), "Hall Properties:Unit 4")
+        self.assertEqual(cache.vendor_ref("  home   DEPOT "), {"value": "10", "name": "Home Depot"})
+        self.assertIsNone(cache.vendor_ref("Other Realm"))
+
+    def test_cache_is_reused_until_version_changes(self):
+        first = get_entity_cache(self.db, "r1")
+        self.assertIs(get_entity_cache(self.db, "r1"), first)
+
+        self.db.add(Vendor(id="11", realm_id="r1", display_name="Lowes"))
+        self.db.commit()
+        reloaded = get_entity_cache(self.db, "r1")
+        self.assertIsNot(reloaded, first)
+        self.assertEqual(reloaded.vendor_ref("lowes")["value"], "11")
+
+    def test_negative_entries_expire_and_clear_on_add(self):
+        cache = get_entity_cache(self.db, "r1")
+        cache.mark_missing("vendor", "Acme")
+        self.assertTrue(cache.is_known_missing("vendor", "ACME"))
+        cache.add_vendor("99", "Acme")
+        self.assertFalse(cache.is_known_missing("vendor", "Acme"))
+
+        cache.mark_missing("vendor", "Ghost", ttl=-1)
+        self.assertFalse(cache.is_known_missing("vendor", "Ghost"))
+
+    def test_lru_is_bounded(self):
+        original = entity_cache.MAX_CACHED_REALMS
+        entity_cache.MAX_CACHED_REALMS = 1
+        try:
+            get_entity_cache(self.db, "r1")
+            get_entity_cache(self.db, "r2")
+            self.assertEqual(list(entity_cache._cache.keys()), ["r2"])
+        finally:
+            entity_cache.MAX_CACHED_REALMS = original
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import time
+import unittest
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.db.session import Base
+from app.models.analytics import AnalyticsEvent
+from app.services.event_buffer import EventBuffer
+
+
+class TestEventBuffer(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(self.engine, tables=[AnalyticsEvent.__table__])
+        self.Session = sessionmaker(bind=self.engine)
+        self.inserts = []
+        event.listen(self.engine, "before_cursor_execute",
+                     lambda conn, cursor, statement, *args: self.inserts.append(statement) if statement.startswith("INSERT") else None)
+
+    def _stored(self):
+        with self.Session() as db:
+            return db.query(AnalyticsEvent).count()
+
+    def test_flushes_by_size_in_one_insert(self):
+        buffer = EventBuffer(self.Session, max_events=5, flush_seconds=60)
+        ids = buffer.add_many([dict(user_id="u1", event_name=f"click_{i}") for i in range(4)])
+        self.assertEqual((len(ids), self._stored()), (4, 0))
+
+        buffer.add("u1", "click_4", {"page": "feed"})
+        self.assertEqual(self._stored(), 5)
+        self.assertEqual(len(self.inserts), 1)
+        with self.Session() as db:
+            self.assertTrue(set(ids) <= {str(e.id) for e in db.query(AnalyticsEvent)})
+
+    def test_flushes_by_time(self):
+        buffer = EventBuffer(self.Session, max_events=100, flush_seconds=0.05)
+        buffer.add("u1", "view")
+        deadline = time.time() + 2
+        while self._stored() == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self._stored(), 1)
+
+    def test_failed_flush_keeps_events(self):
+        buffer = EventBuffer(self.Session, max_events=100, flush_seconds=60)
+        buffer.add_many([dict(user_id="u1", event_name="a"), dict(user_id="u1", event_name="b")])
+        with patch.object(buffer, "_sessions", side_effect=RuntimeError("db down")):
+            self.assertEqual(buffer.flush(), 0)
+        self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(self._stored(), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
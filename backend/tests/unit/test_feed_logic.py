@@ -1,6 +1,49 @@
+import random
 import unittest
 from app.core.feed_logic import FeedLogic
 
+
+def random_payload(rng: random.Random, max_lines: int = 3) -> dict:
+    """Random QBO-shaped payload touching every signal analyze() reads."""
+    data = {"SyncToken": rng.choice(["0", "1", "3"]), "Line": []}
+    if rng.random() < 0.6:
+        data["PurchaseEx"] = {"any": [{"value": {"Name": "TxnType", "Value": rng.choice(["1", "3", "11", "54"])}}]}
+    if rng.random() < 0.4:
+        data["_source_entity"] = rng.choice(["Purchase", "Deposit", "SalesReceipt", "Payment", "BillPayment"])
+    if rng.random() < 0.1:
+        data[rng.choice(["PrivateNote", "Memo"])] = rng.choice(["#Accepted", "paid cash"])
+    if rng.random() < 0.2:
+        data["VendorRef"] = {"value": "1", "name": rng.choice(["", "Acme"])}
+        if rng.random() < 0.5:
+            data[rng.choice(["CheckPayment", "CreditCardPayment"])] = {}
+    if rng.random() < 0.3:
+        data[rng.choice(["EntityRef", "CustomerRef"])] = {"name": rng.choice(["", "Bob"])}
+    if rng.random() < 0.2:
+        data["ClrStatus"] = rng.choice(["R", "C", None])
+
+    for _ in range(rng.randint(0, max_lines)):
+        line = {}
+        detail_key = rng.choice([
+            "AccountBasedExpenseLineDetail", "JournalEntryLineDetail", "DepositLineDetail",
+            "SalesItemLineDetail", "ItemBasedExpenseLineDetail", None,
+        ])
+        if detail_key:
+            detail = {}
+            if rng.random() < 0.7:
+                detail["AccountRef"] = {"name": rng.choice(["Fuel", "Uncategorized Expense", "Ask My Accountant", ""])}
+            if rng.random() < 0.2:
+                detail["ItemRef"] = {"name": rng.choice(["Widget", "Uncategorized Item"])}
+            if rng.random() < 0.3:
+                detail["Entity"] = {"name": rng.choice(["", "Carol"])}
+            line[detail_key] = detail
+        if rng.random() < 0.2:
+            line["LinkedTxn"] = rng.choice([[], [{"TxnId": "9"}]])
+        if rng.random() < 0.2:
+            line["ClrStatus"] = rng.choice(["R", "C"])
+        data["Line"].append(line)
+    return data
+
+
 class TestFeedLogic(unittest.TestCase):
     
     def test_lara_lamination_fresh_manual(self):
@@ -92,5 +135,21 @@ class TestFeedLogic(unittest.TestCase):
         matched, reason = FeedLogic.analyze(data)
         self.assertTrue(matched, f"Finalized Bank Feed should be Categorized. Reason: {reason}")
 
+
+class TestAnalyzeMany(unittest.TestCase):
+
+    def test_matches_scalar_path(self):
+        rng = random.Random(1234)
+        payloads = [random_payload(rng) for _ in range(5000)]
+        self.assertEqual(FeedLogic.analyze_many(payloads), [FeedLogic.analyze(p) for p in payloads])
+
+    def test_every_branch_is_exercised(self):
+        rng = random.Random(1234)
+        reasons = {reason for _, reason in FeedLogic.analyze_many(random_payload(rng) for _ in range(5000))}
+        self.assertGreaterEqual(len(reasons), 12)
+
+    def test_empty_batch(self):
+        self.assertEqual(FeedLogic.analyze_many([]), [])
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,63 @@
+import asyncio
+import unittest
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.session import Base
+from app.models.qbo import QBOConnection, Transaction, TransactionSplit
+from app.services.ghost_finder import GhostFinder
+
+
+class TestGhostFinder(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(engine, tables=[QBOConnection.__table__, Transaction.__table__, TransactionSplit.__table__])
+        self.db = sessionmaker(bind=engine)()
+        self.db.add_all([
+            Transaction(id="ghost", realm_id="r1", amount=120, date=datetime(2026, 5, 10), transaction_type="Check", status="pending_qbo"),
+            Transaction(id="far", realm_id="r1", amount=120, date=datetime(2026, 5, 20), transaction_type="Purchase", sync_token="0"),
+            Transaction(id="near", realm_id="r1", amount=120, date=datetime(2026, 5, 12), transaction_type="CreditCard", sync_token="3"),
+            Transaction(id="nearer-deposit", realm_id="r1", amount=120, date=datetime(2026, 5, 10), transaction_type="Deposit", sync_token="1"),
+            Transaction(id="nearer-approved", realm_id="r1", amount=120, date=datetime(2026, 5, 11), transaction_type="Purchase",
+                        sync_token="1", status="approved"),
+            Transaction(id="other-realm", realm_id="r2", amount=120, date=datetime(2026, 5, 10), transaction_type="Purchase", sync_token="1"),
+            Transaction(id="dep", realm_id="r1", amount=55, date=datetime(2026, 6, 1), transaction_type="Deposit", status="pending_qbo"),
+            Transaction(id="xfer", realm_id="r1", amount=900, date=datetime(2026, 6, 1), transaction_type="Transfer", status="pending_qbo"),
+        ])
+        self.db.commit()
+        self.client = MagicMock()
+        self.client.query = AsyncMock(return_value={"QueryResponse": {}})
+        self.finder = GhostFinder(self.db, MagicMock(realm_id="r1"), self.client)
+
+    def _tx(self, tx_id):
+        return self.db.query(Transaction).filter(Transaction.id == tx_id).one()
+
+    def test_local_mirror_match_needs_no_qbo_call(self):
+        found = asyncio.run(self.finder.find(self._tx("ghost")))
+        self.assertEqual(found, {"Id": "near", "SyncToken": "3", "TxnDate": "2026-05-12", "source": "local"})
+        self.client.query.assert_not_awaited()
+
+    def test_falls_back_to_date_bounded_qbo_query(self):
+        self.client.query.return_value = {"QueryResponse": {"Deposit": [
+            {"Id": "dep", "TxnDate": "2026-06-01", "SyncToken": "0"},
+            {"Id": "70", "TxnDate": "2026-06-04", "SyncToken": "2"},
+            {"Id": "71", "TxnDate": "2026-05-31", "SyncToken": "5"},
+        ]}}
+        found = asyncio.run(self.finder.find(self._tx("dep")))
+        self.assertEqual(found["Id"], "71")
+        self.assertEqual(found["source"], "qbo")
+        query = self.client.query.await_args.args[0]
+        self.assertIn("from Deposit where TotalAmt = '55", query)
+        self.assertIn("TxnDate >= '2026-05-28' and TxnDate <= '2026-06-05'", query)
+
+    def test_transfer_uses_amount_field(self):
+        self.assertIsNone(asyncio.run(self.finder.find(self._tx("xfer"))))
+        self.assertIn("from Transfer where Amount = '900", self.client.query.await_args.args[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.session import Base
+from app.core.description_normalizer import normalize_description
+from app.models.qbo import LearnedMapping, Transaction
+from app.services.learned_mapping_service import LearnedMappingIndex
+
+
+class TestDescriptionNormalizer(unittest.TestCase):
+
+    def test_strips_numbers_and_card_noise(self):
+        self.assertEqual(normalize_description("POS PURCHASE HOME DEPOT #4402 XXXX1234"), "home depot")
+        self.assertEqual(normalize_description("Home Depot 0417"), "home depot")
+        self.assertEqual(normalize_description("AMAZON MKTP US*2K4"), "amazon mktp us")
+        self.assertEqual(normalize_description(None), "")
+
+
+class TestLearnedMappingIndex(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(bind=engine, tables=[LearnedMapping.__table__, Transaction.__table__])
+        self.db = sessionmaker(bind=engine)()
+
+    def tearDown(self):
+        self.db.close()
+
+    def test_backfills_once_then_matches_fuzzy(self):
+        self.db.add_all([
+            Transaction(id="1", realm_id="r1", description="SHELL OIL 5744 CHECKCARD", status="approved", category_name="Fuel"),
+            Transaction(id="2", realm_id="r1", description="SHELL OIL 1120", status="approved", category_name="Fuel"),
+            Transaction(id="3", realm_id="r2", description="SHELL OIL 1120", status="approved", category_name="Other Realm"),
+        ])
+        self.db.commit()
+
+        index = LearnedMappingIndex(self.db, "r1")
+        self.assertEqual(index.lookup("Shell Oil #9931")["category_name"], "Fuel")
+        self.assertEqual(index.lookup("SHELL OIL STATION 22")["category_name"], "Fuel")  # token-set match
+        self.assertIsNone(index.lookup("Chevron 44"))
+        self.assertEqual(self.db.query(LearnedMapping).filter_by(realm_id="r1").one().hit_count, 2)
+
+    def test_learn_updates_incrementally(self):
+        index = LearnedMappingIndex(self.db, "r1")
+        index.learn("UBER *TRIP 12", "7", "Travel")
+        index.learn("Uber Trip 99", "8", "Meals")  # Last approval wins
+        self.db.commit()
+
+        self.assertEqual(index.lookup("UBER TRIP")["category_id"], "8")
+        mapping = self.db.query(LearnedMapping).one()
+        self.assertEqual((mapping.normalized_description, mapping.hit_count), ("uber trip", 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import asyncio
+import threading
+import unittest
+
+from app.services.progress_bus import ProgressBus, ProgressReporter
+
+
+class TestProgressBus(unittest.TestCase):
+
+    def test_thread_publish_reaches_subscriber_after_snapshot(self):
+        bus = ProgressBus()
+        ProgressReporter("r1", "sync", bus=bus).update("categories", done=1, total=5)
+
+        async def scenario():
+            subscription = bus.subscribe("r1")
+            first = await subscription.__anext__()  # Snapshot of the last sync event
+
+            reporter = ProgressReporter("r1", "analysis", bus=bus)
+            thread = threading.Thread(target=lambda: reporter.update("ai", done=3, total=4, pending=1))
+            thread.start()
+            second = await asyncio.wait_for(subscription.__anext__(), timeout=2)
+            thread.join()
+            await subscription.aclose()
+            return first, second
+
+        first, second = asyncio.run(scenario())
+        self.assertEqual((first["job"], first["stage"], first["percent"]), ("sync", "categories", 20.0))
+        self.assertEqual((second["job"], second["percent"], second["counters"]), ("analysis", 75.0, {"pending": 1}))
+        self.assertEqual(bus._subscribers, {})
+
+    def test_reporter_throttles_within_a_stage(self):
+        bus = ProgressBus()
+        published = []
+        bus.publish = lambda realm_id, event: published.append(event["stage"])
+
+        reporter = ProgressReporter("r1", "bulk_approve", bus=bus)
+        for i in range(50):
+            reporter.update("approving", done=i + 1, total=100)
+        reporter.done(approved=50)
+
+        self.assertEqual(published, ["approving", "done"])
+
+    def test_other_realms_are_not_delivered(self):
+        bus = ProgressBus()
+
+        async def scenario():
+            subscription = bus.subscribe("r1")
+            pending = asyncio.ensure_future(subscription.__anext__())
+            await asyncio.sleep(0)
+            ProgressReporter("r2", "sync", bus=bus).done()
+            await asyncio.sleep(0.05)
+            self.assertFalse(pending.done())
+            ProgressReporter("r1", "sync", bus=bus).done()
+            event = await asyncio.wait_for(pending, timeout=2)
+            await subscription.aclose()
+            return event
+
+        self.assertEqual(asyncio.run(scenario())["realm_id"], "r1")
+
+
+if __name__ == "__main__":
+    unittest.main()
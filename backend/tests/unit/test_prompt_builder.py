@@ -0,0 +1,55 @@
+import unittest
+from types import SimpleNamespace
+
+from app.core import prompt_builder
+from app.core.prompt_builder import AnalysisPromptBuilder, CategoryRanker, TABLE_HEADER
+
+
+def _tx(i, description, payee=None, category=None):
+    return SimpleNamespace(
+        id=str(i), transaction_type="Purchase", description=description, payee=payee,
+        account_name="Chase | Checking", amount=12.5, currency="USD", note=None,
+        suggested_category_name=category,
+    )
+
+
+CATEGORIES = [f"Misc Expense {i}" for i in range(60)] + ["Fuel", "Repairs & Maintenance", "Meals"]
+HISTORY = [("shell oil", "Fuel"), ("home depot", "Repairs & Maintenance"), ("chevron", "Fuel")]
+
+
+class TestCategoryRanker(unittest.TestCase):
+
+    def test_shortlist_is_relevant_and_keeps_required(self):
+        ranker = CategoryRanker(CATEGORIES, HISTORY)
+        top = ranker.top(["shell", "oil"], k=3, required=["Meals"])
+        self.assertEqual(top[:2], ["Meals", "Fuel"])
+        self.assertEqual(len(top), 3)
+
+    def test_small_chart_is_sent_whole(self):
+        self.assertEqual(CategoryRanker(["A", "B"]).top(["x"], k=5), ["A", "B"])
+
+
+class TestAnalysisPromptBuilder(unittest.TestCase):
+
+    def test_prompt_is_compact_and_tabular(self):
+        builder = AnalysisPromptBuilder(CATEGORIES, ["Shell", "Home Depot"], HISTORY, category_k=5)
+        [(chunk, prompt, tokens)] = builder.chunk_prompts([_tx(1, "SHELL OIL 5744", "Shell")])
+        self.assertIn(TABLE_HEADER, prompt)
+        self.assertIn("1|OUT|Purchase|SHELL OIL 5744|Shell|Chase / Checking|12.5 USD||", prompt)
+        self.assertIn("shell oil => Fuel", prompt)
+        self.assertNotIn("home depot =>", prompt)
+        self.assertNotIn("Misc Expense 59", prompt)
+        self.assertEqual(tokens, prompt_builder.estimate_tokens(prompt))
+
+    def test_chunks_adapt_to_budget(self):
+        txs = [_tx(i, f"VENDOR NUMBER {i} " + "X" * 200) for i in range(30)]
+        roomy = AnalysisPromptBuilder(CATEGORIES, input_budget=100000).chunk_prompts(txs)
+        tight = AnalysisPromptBuilder(CATEGORIES, input_budget=3000).chunk_prompts(txs)
+        self.assertEqual(len(roomy), 1)
+        self.assertGreater(len(tight), 1)
+        self.assertEqual(sum(len(c) for c, _, _ in tight), 30)
+        self.assertTrue(all(t <= 3000 for _, _, t in tight))
+
+
+if __name__ == "__main__":
+    unittest.main()
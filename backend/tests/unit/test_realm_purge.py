@@ -0,0 +1,98 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.db.session import Base
+from app.models.qbo import (
+    BankAccount, Category, ClassificationRule, Customer, LearnedMapping, QBOConnection,
+    RealmCategoryModel, SyncLog, Tag, Transaction, TransactionSplit, Vendor, VendorAlias,
+)
+from app.models.user import User
+from app.services import realm_purge
+from app.services.realm_purge import RealmPurge, pending_purges
+
+
+class TestRealmPurge(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(self.engine, tables=[
+            User.__table__, QBOConnection.__table__, Category.__table__, Customer.__table__, Vendor.__table__,
+            BankAccount.__table__, Tag.__table__, Transaction.__table__, TransactionSplit.__table__, SyncLog.__table__,
+            VendorAlias.__table__, LearnedMapping.__table__, RealmCategoryModel.__table__, ClassificationRule.__table__,
+        ])
+        self.db = sessionmaker(bind=self.engine)()
+        with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as f:
+            self.receipt = f.name
+
+        requested = datetime.now(timezone.utc) - timedelta(hours=1)
+        for realm_id in ("r1", "r2"):
+            self.db.add(QBOConnection(realm_id=realm_id, refresh_token="x",
+                                      disconnect_requested_at=requested if realm_id == "r1" else None))
+            for i in range(12):
+                self.db.add(Transaction(id=f"{realm_id}-{i:02}", realm_id=realm_id, receipt_content=b"img",
+                                        potential_duplicate_id=f"{realm_id}-{11 - i:02}" if i < 3 else None,
+                                        splits=[TransactionSplit(category_name="Meals", amount=1)]))
+            self.db.add_all([
+                Vendor(id=f"{realm_id}-v", realm_id=realm_id, display_name="Shell"),
+                VendorAlias(realm_id=realm_id, alias="SHELL OIL", vendor_id=f"{realm_id}-v"),
+                Customer(id=f"{realm_id}-c", realm_id=realm_id), Category(id=f"{realm_id}-cat", realm_id=realm_id),
+                Tag(realm_id=realm_id, name="Trip"), BankAccount(id=f"{realm_id}-b", realm_id=realm_id),
+                LearnedMapping(realm_id=realm_id, normalized_description="shell", category_name="Fuel"),
+                ClassificationRule(realm_id=realm_id, name="r", conditions={}, action={}),
+                RealmCategoryModel(realm_id=realm_id, feature_version="1", weights=b"w", labels=[]),
+                SyncLog(realm_id=realm_id, operation="sync", status="success"),
+            ])
+        self.db.commit()
+        self.db.query(Transaction).filter(Transaction.id == "r1-05").update({Transaction.receipt_url: self.receipt})
+        self.db.commit()
+
+    def tearDown(self):
+        if os.path.exists(self.receipt):
+            os.unlink(self.receipt)
+
+    def _counts(self, realm_id):
+        counts = {model.__tablename__: self.db.query(model).filter(model.realm_id == realm_id).count()
+                  for model in realm_purge.REALM_TABLES + (Transaction, QBOConnection)}
+        counts["transaction_splits"] = self.db.query(TransactionSplit).join(Transaction).filter(Transaction.realm_id == realm_id).count()
+        return counts
+
+    def test_purges_in_short_chunks_and_leaves_other_realms(self):
+        self.assertEqual(pending_purges(self.db), ["r1"])
+        commits = []
+        event.listen(self.db, "after_commit", lambda session: commits.append(1))
+
+        deleted = RealmPurge(self.db, "r1", chunk_size=5).run()
+        self.assertEqual((deleted["transactions"], deleted["transaction_splits"], deleted["vendor_aliases"]), (12, 12, 1))
+        self.assertGreaterEqual(len(commits), 3 + 1 + len(realm_purge.REALM_TABLES))  # One per transaction chunk at least
+        self.assertEqual(set(self._counts("r1").values()), {0})
+        self.assertEqual(self.db.query(TransactionSplit).count(), 12)  # r2's
+        self.assertEqual(self._counts("r2")["transactions"], 12)
+        self.assertFalse(os.path.exists(self.receipt))
+        self.assertEqual(pending_purges(self.db), [])
+
+    def test_failed_purge_resumes(self):
+        purge = RealmPurge(self.db, "r1", chunk_size=5)
+        with patch.object(purge, "_purge_table", side_effect=RuntimeError("connection lost")):
+            with self.assertRaises(RuntimeError):
+                purge.run()
+        self.assertEqual(self._counts("r1")["transactions"], 0)
+        self.assertEqual(self._counts("r1")["vendors"], 1)
+
+        RealmPurge(self.db, "r1").run()
+        self.assertEqual(set(self._counts("r1").values()), {0})
+
+    def test_reconnect_stops_the_purge(self):
+        self.db.query(QBOConnection).filter(QBOConnection.realm_id == "r1").update({QBOConnection.disconnect_requested_at: None})
+        self.db.commit()
+        RealmPurge(self.db, "r1").run()
+        self.assertEqual(self._counts("r1")["transactions"], 12)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.session import Base
+from app.models.qbo import QBOConnection, Transaction, TransactionSplit
+from app.services import receipt_stream
+from app.services.qbo_client import QBOClient
+from app.services.receipt_stream import BlobReceiptSource, FileReceiptSource, receipt_source_for
+
+PDF = b"%PDF-1.7\n" + bytes(range(256)) * 40
+
+
+async def collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
+class TestReceiptSources(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(engine, tables=[QBOConnection.__table__, Transaction.__table__, TransactionSplit.__table__])
+        self.db = sessionmaker(bind=engine)()
+        self.db.add(Transaction(id="1", realm_id="r1", receipt_url="/tmp/gone/receipt.pdf", receipt_content=PDF))
+        self.db.commit()
+
+    def test_content_hash_is_kept_in_sync(self):
+        tx = self.db.query(Transaction).one()
+        self.assertEqual(tx.receipt_sha256, hashlib.sha256(PDF).hexdigest())
+        tx.receipt_content = None
+        self.assertIsNone(tx.receipt_sha256)
+
+    def test_blob_source_streams_in_chunks(self):
+        tx = self.db.query(Transaction).one()
+        self.assertNotIn("receipt_content", tx.__dict__)  # Deferred: loading the row doesn't load the blob
+        source = receipt_source_for(self.db, tx)
+        self.assertIsInstance(source, BlobReceiptSource)
+
+        with patch.object(receipt_stream, "CHUNK_SIZE", 1000):
+            asyncio.run(source.prepare())
+            chunks = asyncio.run(collect(source.chunks()))
+        self.assertEqual((source.size, source.content_type, source.extension), (len(PDF), "application/pdf", ".pdf"))
+        self.assertEqual(len(chunks), 11)
+        self.assertEqual(b"".join(chunks), PDF)
+        self.assertEqual(b"".join(asyncio.run(collect(source.chunks()))), PDF)  # Replayable
+
+    def test_file_source_hashes_while_preparing(self):
+        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as f:
+            f.write(PDF)
+        try:
+            source = receipt_source_for(self.db, MagicMock(receipt_sha256=None, receipt_url=f.name))
+            self.assertIsInstance(source, FileReceiptSource)
+            asyncio.run(source.prepare())
+            self.assertEqual((source.sha256, source.size, source.content_type), (hashlib.sha256(PDF).hexdigest(), len(PDF), "image/png"))
+            self.assertEqual(b"".join(asyncio.run(collect(source.chunks()))), PDF)
+        finally:
+            os.unlink(f.name)
+
+
+class TestStreamingUpload(unittest.TestCase):
+
+    def setUp(self):
+        with patch("app.services.qbo_client.AuthClient"), patch("app.services.qbo_client.decrypt_token", lambda t: t):
+            self.client = QBOClient(MagicMock(), MagicMock(realm_id="r1", access_token="tok"))
+        self.requests = []
+
+        def handler(request: httpx.Request):
+            body = request.read()
+            self.requests.append((request, body))
+            return httpx.Response(200, json={"AttachableResponse": [{"Attachable": {"Id": "900"}}]})
+
+        transport = httpx.MockTransport(handler)
+        real_client = httpx.AsyncClient
+        self.patches = [
+            patch("app.services.qbo_client.decrypt_access_token", lambda realm_id, t: t),
+            patch("app.services.qbo_client.httpx.AsyncClient", lambda **kw: real_client(transport=transport, **kw)),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_multipart_body_is_generated_around_the_chunks(self):
+        async def chunks():
+            for start in range(0, len(PDF), 4096):
+                yield PDF[start:start + 4096]
+
+        ref = {"EntityRef": {"type": "Purchase", "value": "1"}}
+        result = asyncio.run(self.client.upload_attachment_stream(
+            chunks, "r.pdf", "application/pdf", ref, size=len(PDF), sha256="abc"))
+        self.assertEqual(result, {"Id": "900"})
+
+        request, body = self.requests[0]
+        boundary = request.headers["content-type"].split("boundary=")[1]
+        self.assertEqual(int(request.headers["content-length"]), len(body))
+        parts = body.split(f"--{boundary}".encode())
+        self.assertIn(b'name="file_metadata_01"', parts[1])
+        metadata = json.loads(parts[1].split(b"\r\n\r\n", 1)[1].rstrip(b"\r\n"))
+        self.assertEqual((metadata["Note"], metadata["AttachableRef"]), ("sha256:abc", [ref]))
+        self.assertIn(b'name="file_content_01"; filename="r.pdf"', parts[2])
+        self.assertEqual(parts[2].split(b"\r\n\r\n", 1)[1][:-2], PDF)
+
+    def test_bytes_wrapper_still_works(self):
+        asyncio.run(self.client.upload_attachment(b"jpeg", "r.jpg", "image/jpeg"))
+        self.assertTrue(self.requests[0][1].count(b"jpeg"))
+
+
+if __name__ == "__main__":
+    unittest.main()
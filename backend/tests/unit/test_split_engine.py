@@ -0,0 +1,106 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.db.session import Base
+from app.models.gamification import GamificationEvent, UserGamificationStats
+from app.models.qbo import Category, LearnedMapping, QBOConnection, SyncLog, Transaction, TransactionSplit
+from app.models.user import User
+from app.services import split_engine
+from app.services.split_engine import SplitValidationError
+from app.services.transaction_service import TransactionService
+
+
+class TestSplitEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(self.engine, tables=[
+            User.__table__, QBOConnection.__table__, Category.__table__, Transaction.__table__, TransactionSplit.__table__,
+            SyncLog.__table__, LearnedMapping.__table__, UserGamificationStats.__table__, GamificationEvent.__table__,
+        ])
+        self.db = sessionmaker(bind=self.engine)()
+        self.db.add(User(id="u1", email="u1@example.com"))
+        self.connection = QBOConnection(realm_id="r1", user_id="u1", refresh_token="x")
+        self.db.add(self.connection)
+        self.db.add_all([
+            Category(id="c1", realm_id="r1", name="Meals"),
+            Category(id="c2", realm_id="r1", name="Travel"),
+            Category(id="c9", realm_id="r2", name="Office"),
+        ])
+        for tx_id in ("1", "2", "3"):
+            self.db.add(Transaction(id=tx_id, realm_id="r1", status="pending_qbo", amount=100, sync_token="4",
+                                    description="Trip", transaction_type="Purchase", is_split=True, splits=[
+                TransactionSplit(category_id="c1", category_name="Meals", amount=40),
+                TransactionSplit(category_name="Travel", amount=60, description="Taxi"),
+            ]))
+        self.db.commit()
+
+    def _tx(self, tx_id):
+        return self.db.query(Transaction).filter(Transaction.id == tx_id).one()
+
+    def test_build_splits_resolves_categories_in_one_query(self):
+        statements = []
+        event.listen(self.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        submitted = [SimpleNamespace(category_name=name, amount=amount, description=None)
+                     for name, amount in (("Meals", 40), ("Travel", 30.005), ("Office", 30))]
+        splits = split_engine.build_splits(self.db, "r1", self._tx("1"), submitted)
+
+        self.assertEqual([(s.category_id, s.description) for s in splits], [("c1", "Trip"), ("c2", "Trip"), (None, "Trip")])
+        self.assertEqual(sum("FROM categories" in s for s in statements), 1)
+        submitted[0].amount = 41
+        with self.assertRaises(SplitValidationError):
+            split_engine.build_splits(self.db, "r1", self._tx("1"), submitted)
+
+    def test_payload_fills_missing_categories(self):
+        tx = self._tx("1")
+        category_ids = split_engine.resolve_categories(self.db, "r1", split_engine.missing_category_names([tx]))
+        payload = split_engine.build_payload(tx, {"value": "v1"}, "Cash", category_ids)
+
+        self.assertEqual([(l["Id"], l["Amount"], l["AccountBasedExpenseLineDetail"]["AccountRef"]["value"]) for l in payload["Line"]],
+                         [("1", 40.0, "c1"), ("2", 60.0, "c2")])
+        self.assertEqual((payload["SyncToken"], payload["EntityRef"], payload["PaymentType"]), ("4", {"value": "v1"}, "Cash"))
+        self.assertNotIn("TotalAmt", payload)
+        with self.assertRaisesRegex(SplitValidationError, "line 2 missing category"):
+            split_engine.build_payload(tx, None, None)
+
+    def test_write_batch_chunks_and_maps_faults(self):
+        client = MagicMock()
+
+        async def batch(items):
+            return [{"bId": item["bId"], "Purchase": {"Id": item["bId"], "SyncToken": "5"}} if item["bId"] != "7"
+                    else {"bId": "7", "Fault": {"type": "ValidationFault", "Error": [{"code": "5010", "Message": "Stale Object Error"}]}}
+                    for item in items]
+        client.batch = AsyncMock(side_effect=batch)
+
+        results = asyncio.run(split_engine.write_batch(client, {str(i): {"Id": str(i)} for i in range(35)}))
+        self.assertEqual([len(call.args[0]) for call in client.batch.await_args_list], [30, 5])
+        self.assertEqual(results["3"], {"Id": "3", "SyncToken": "5"})
+        self.assertIsInstance(results["7"], split_engine.BatchItemFault)
+        self.assertIn("5010", str(results["7"]))
+
+    def test_bulk_approval_sends_splits_as_one_batch(self):
+        with patch("app.services.transaction_service.QBOClient"):
+            service = TransactionService(self.db, self.connection)
+        service.client.request = AsyncMock(return_value={"Purchase": {"SyncToken": "9"}})
+        service.client.query = AsyncMock(return_value={"QueryResponse": {"Purchase": [{"Id": "2", "SyncToken": "8"}]}})
+        service.client.batch = AsyncMock(return_value=[
+            {"bId": "1", "Purchase": {"Id": "1", "SyncToken": "5"}},
+            {"bId": "2", "Fault": {"Error": [{"code": "5010", "Message": "Stale Object Error"}]}},
+            {"bId": "3", "Fault": {"Error": [{"code": "6000", "Message": "Business Validation Error"}]}},
+        ])
+
+        results = asyncio.run(service.sync_approved_batch(["1", "2", "3"]))
+        self.assertEqual([r["status"] for r in results], ["success", "success", "error"])
+        service.client.batch.assert_awaited_once()
+        self.assertEqual(service.client.request.await_args.kwargs["json_payload"]["SyncToken"], "8")  # Only the stale one is re-sent
+        self.assertEqual({tx.id: (tx.status, tx.sync_token) for tx in self.db.query(Transaction)},
+                         {"1": ("approved", "5"), "2": ("approved", "9"), "3": ("error_qbo", "4")})
+
+
+if __name__ == "__main__":
+    unittest.main()
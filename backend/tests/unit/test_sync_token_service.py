@@ -0,0 +1,103 @@
+import asyncio
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.session import Base
+from app.models.gamification import GamificationEvent, UserGamificationStats
+from app.models.qbo import LearnedMapping, QBOConnection, SyncLog, Transaction, TransactionSplit
+from app.models.user import User
+from app.services.sync_token_service import SyncTokenService, conflict_stats, is_stale_error
+from app.services.transaction_service import TransactionService
+
+
+class TestSyncTokenService(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(engine, tables=[
+            User.__table__, QBOConnection.__table__, Transaction.__table__, TransactionSplit.__table__,
+            SyncLog.__table__, LearnedMapping.__table__, UserGamificationStats.__table__, GamificationEvent.__table__,
+        ])
+        self.db = sessionmaker(bind=engine)()
+        self.db.add(User(id="u1", email="u1@example.com"))
+        self.connection = QBOConnection(realm_id="r1", user_id="u1", refresh_token="x")
+        self.db.add(self.connection)
+        self.db.add_all([
+            Transaction(id="1", realm_id="r1", status="pending_qbo", amount=1, sync_token="old", transaction_type="Expense"),
+            Transaction(id="2", realm_id="r1", status="pending_qbo", amount=1, sync_token="old", transaction_type="Purchase"),
+            Transaction(id="3", realm_id="r1", status="pending_qbo", amount=1, sync_token="5", transaction_type="Deposit"),
+        ])
+        self.db.commit()
+
+    def test_is_stale_error(self):
+        response = MagicMock(text='{"Fault": {"Error": [{"code": "5010"}]}}')
+        self.assertTrue(is_stale_error(MagicMock(response=response)))
+        self.assertTrue(is_stale_error(Exception("Stale Object Error")))
+        self.assertFalse(is_stale_error(Exception("Object Not Found")))
+
+    def test_refresh_batches_ids_per_entity(self):
+        pages = {
+            "Purchase": [{"Id": "1", "SyncToken": "7"}, {"Id": "2", "SyncToken": "8"}],
+            "Deposit": [{"Id": "3", "SyncToken": "5"}],
+        }
+        client = MagicMock()
+        client.query = AsyncMock(side_effect=lambda q: {"QueryResponse": {e: rows for e, rows in pages.items() if f"from {e} " in q}})
+        service = SyncTokenService(self.db, self.connection, client)
+
+        tokens = asyncio.run(service.refresh(self.db.query(Transaction).order_by(Transaction.id).all()))
+        self.assertEqual(tokens, {"1": "7", "2": "8", "3": "5"})
+        self.assertEqual(client.query.await_count, 2)  # Purchase (Expense + Purchase) and Deposit
+        self.assertIn("where Id in ('1', '2')", client.query.await_args_list[0].args[0])
+        self.db.expire_all()
+        self.assertEqual(dict(self.db.query(Transaction.id, Transaction.sync_token)), {"1": "7", "2": "8", "3": "5"})
+
+    def test_refresh_from_cdc(self):
+        client = MagicMock()
+        client.cdc = AsyncMock(return_value={"CDCResponse": [{"QueryResponse": [
+            {"Purchase": [{"Id": "1", "SyncToken": "9"}, {"Id": "unknown", "SyncToken": "1"}]},
+            {"Deposit": [{"Id": "3", "SyncToken": "6"}], "startPosition": 1},
+        ]}]})
+        service = SyncTokenService(self.db, self.connection, client)
+
+        self.assertEqual(asyncio.run(service.refresh_from_cdc(["Expense"])), 0)  # Never synced
+        client.cdc.assert_not_awaited()
+
+        self.db.add(SyncLog(realm_id="r1", operation="sync", entity_type="transaction", count=3, status="success",
+                            timestamp=datetime.now(timezone.utc) - timedelta(hours=1)))
+        self.db.commit()
+        self.assertEqual(asyncio.run(service.refresh_from_cdc(["Expense", "Deposit"])), 2)
+        self.assertEqual(client.cdc.await_args.args[0], ["Deposit", "Purchase"])
+
+    def test_batch_rereads_stale_tokens_together(self):
+        with patch("app.services.transaction_service.QBOClient"):
+            service = TransactionService(self.db, self.connection)
+        service.client.query = AsyncMock(return_value={"QueryResponse": {"Purchase": [
+            {"Id": "1", "SyncToken": "2"}, {"Id": "2", "SyncToken": "4"},
+        ]}})
+        sent_tokens = []
+
+        async def write(tx):
+            service._record_write()
+            sent_tokens.append((tx.id, tx.sync_token))
+            if tx.sync_token == "old":
+                service._record_conflict(tx)
+                raise AssertionError("unreachable in a batch")
+            return {"SyncToken": str(int(tx.sync_token) + 1)}
+        service._update_qbo_transaction = write
+
+        results = asyncio.run(service.sync_approved_batch(["1", "2", "3"]))
+        self.assertEqual([r["status"] for r in results], ["success"] * 3)
+        self.assertEqual(sent_tokens, [("1", "old"), ("2", "old"), ("3", "5"), ("1", "2"), ("2", "4")])
+        service.client.query.assert_awaited_once()
+        self.assertEqual({tx.id: tx.status for tx in self.db.query(Transaction)}, {"1": "approved", "2": "approved", "3": "approved"})
+
+        stats = conflict_stats(self.db, "r1")
+        self.assertEqual((stats["writes"], stats["conflicts"], stats["conflict_rate"]), (5, 2, 0.4))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.session import Base
+from app.models.user import User, TokenLedgerEntry
+from app.services.token_service import TokenService
+
+
+class TestTokenService(unittest.TestCase):
+
+    def setUp(self):
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(bind=engine, tables=[User.__table__, TokenLedgerEntry.__table__])
+        self.db = sessionmaker(bind=engine)()
+        self.db.add(User(id="u1", email="u1@example.com", token_balance=10))
+        self.db.commit()
+        self.service = TokenService(self.db)
+
+    def tearDown(self):
+        self.db.close()
+
+    def _ledger(self):
+        return [(e.entry_type, e.delta, e.balance_after)
+                for e in self.db.query(TokenLedgerEntry).order_by(TokenLedgerEntry.id)]
+
+    def test_deduct_is_conditional(self):
+        self.assertTrue(self.service.deduct_tokens("u1", 7, reason="Receipt Scan"))
+        self.assertFalse(self.service.deduct_tokens("u1", 7))  # Would go negative
+        self.assertFalse(self.service.deduct_tokens("missing", 1))
+        self.assertEqual(self.service.get_balance("u1"), 3)
+        self.assertEqual(self._ledger(), [("deduct", -7, 3)])
+
+    def test_reservation_refunds_unused(self):
+        reservation = self.service.reserve_tokens("u1", 25, "AI Analysis", allow_partial=True)
+        self.assertEqual(reservation.amount, 10)  # Only what was available
+        self.assertEqual(self.service.get_balance("u1"), 0)
+        self.assertIsNone(self.service.reserve_tokens("u1", 1, "AI Analysis", allow_partial=True))
+
+        self.assertEqual(self.service.settle_reservation(reservation, used=4), 6)
+        self.assertEqual(self.service.settle_reservation(reservation, used=0), 0)  # Idempotent
+        self.assertEqual(self.service.get_balance("u1"), 6)
+        self.assertEqual(self._ledger(), [("reserve", -10, 0), ("refund", 6, 6)])
+
+    def test_refill_records_delta(self):
+        self.service.deduct_tokens("u1", 4)
+        self.service.refill_tokens("u1", 50)
+        self.assertEqual(self.service.get_balance("u1"), 50)
+        self.assertEqual(self._ledger()[-1], ("refill", 44, 50))
+
+
+if __name__ == "__main__":
+    unittest.main()
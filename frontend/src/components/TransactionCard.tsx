@@ -65,7 +65,7 @@ interface Transaction {
     account_id?: string;
     account_name?: string;
     sync_token?: string;
-    matching_method?: 'none' | 'ai' | 'history' | 'rule';
+    matching_method?: 'none' | 'ai' | 'history' | 'rule' | 'local_model';
 }
 
 interface TransactionCardProps {
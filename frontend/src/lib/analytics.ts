@@ -12,6 +12,41 @@ declare global {
     }
 }
 
+type QueuedEvent = { event_name: AnalyticsEvent; properties?: Record<string, unknown>; user_id: string };
+
+const BATCH_SIZE = 20;
+const FLUSH_INTERVAL_MS = 2000;
+const BACKEND_URL = process.env.NEXT_PUBLIC_BACKEND_URL || 'https://ifvckinglovef1--qbo-sync-engine-fastapi-app.modal.run';
+
+let queue: QueuedEvent[] = [];
+let flushTimer: ReturnType<typeof setTimeout> | null = null;
+
+const flush = async () => {
+    if (flushTimer) {
+        clearTimeout(flushTimer);
+        flushTimer = null;
+    }
+    if (!queue.length) return;
+    const events = queue;
+    queue = [];
+    try {
+        await fetch(`${BACKEND_URL}/api/v1/analytics/track/batch`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ events }),
+            keepalive: true // Lets the last batch go out while the page unloads
+        });
+    } catch (error) {
+        console.error('[Analytics] Backend sync failed:', error);
+    }
+};
+
+if (typeof window !== 'undefined') {
+    window.addEventListener('pagehide', () => { void flush(); });
+}
+
 export const track = async (event: AnalyticsEvent, properties?: Record<string, unknown>, userId?: string) => {
     const timestamp = new Date().toISOString();
 
@@ -26,23 +61,14 @@ export const track = async (event: AnalyticsEvent, properties?: Record<string, u
         });
     }
 
-    // 3. Backend (Permanent Data Lake)
+    // 3. Backend (Permanent Data Lake), queued and sent in batches
     // We only track to backend if we have a userId to attribute it to
     if (userId) {
-        try {
-            await fetch(`${process.env.NEXT_PUBLIC_BACKEND_URL || 'https://ifvckinglovef1--qbo-sync-engine-fastapi-app.modal.run'}/api/v1/analytics/track`, {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify({
-                    event_name: event,
-                    properties: properties,
-                    user_id: userId
-                })
-            });
-        } catch (error) {
-            console.error('[Analytics] Backend sync failed:', error);
+        queue.push({ event_name: event, properties, user_id: userId });
+        if (queue.length >= BATCH_SIZE) {
+            await flush();
+        } else if (!flushTimer) {
+            flushTimer = setTimeout(flush, FLUSH_INTERVAL_MS);
         }
     }
 };